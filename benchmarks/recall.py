@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Recall benchmark for compact search vector storage.
+Compares each storage precision and reduced dimension against exact float32
+search at full dimension: recall@k of the top results, bytes per vector and
+search time.
+
+By default the vectors are synthetic clustered unit vectors shaped like
+provider embeddings. --source git embeds the current repository's history
+with the offline hashing backend instead.
+
+Usage:
+    python benchmarks/recall.py [--vectors 10000] [--dimension 3072] [--queries 200] [--k 10]
+    python benchmarks/recall.py --source git
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sayless.cli import vector_index  # noqa: E402
+
+CONFIGS = [
+    (None, 'float32'),
+    (None, 'float16'),
+    (None, 'int8'),
+    (None, 'pq'),
+    (1024, 'float32'),
+    (512, 'float32'),
+    (512, 'int8'),
+    (256, 'int8'),
+    (512, 'pq'),
+]
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int = 200, rank: int = 256, seed: int = 0) -> np.ndarray:
+    """Make unit vectors grouped around topics, like embeddings of related commits"""
+    rng = np.random.default_rng(seed)
+    # Real embeddings vary along far fewer directions than they have dimensions
+    centers = rng.standard_normal((clusters, rank))
+    latent = centers[rng.integers(0, clusters, count)] + 0.7 * rng.standard_normal((count, rank))
+    mixing = rng.standard_normal((rank, dimension)) * (1 / np.sqrt(1 + np.arange(rank)))[:, None]
+    vectors = latent @ mixing + 0.1 * rng.standard_normal((count, dimension))
+    return vector_index.normalize(vectors.astype(np.float32))
+
+
+def git_vectors(dimension: int) -> np.ndarray:
+    """Embed the commits of the current repository with the hashing backend"""
+    from sayless.cli.local_embeddings import HashingEmbedder
+
+    log = subprocess.run(['git', 'log', '-p', '--format=%x00%s'], capture_output=True, text=True).stdout
+    embedder = HashingEmbedder(dimension)
+    return np.stack([embedder.embed(commit) for commit in log.split('\0') if commit.strip()])
+
+
+def queries_from(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Make queries that resemble, but don't equal, stored vectors"""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    noise = 0.5 * rng.standard_normal(picked.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return vector_index.normalize(picked + noise)
+
+
+def build(vectors: np.ndarray, dimension, precision: str):
+    """Build an index the way CommitEmbeddings stores vectors"""
+    if dimension:
+        vectors = np.stack([vector_index.reduce_dimension(vector, dimension) for vector in vectors])
+    index = vector_index.create_index(vectors.shape[1], precision)
+    index.add(vectors)
+    return vector_index.compact(index, precision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "git"], default="synthetic", help="Where the vectors come from")
+    parser.add_argument("--vectors", type=int, default=10000, help="Synthetic vectors to index")
+    parser.add_argument("--dimension", type=int, default=3072, help="Full vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run")
+    parser.add_argument("--k", type=int, default=10, help="Results compared per query")
+    args = parser.parse_args()
+
+    if args.source == "git":
+        vectors = git_vectors(args.dimension)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimension)
+    queries = queries_from(vectors, args.queries)
+    k = min(args.k, len(vectors))
+    print(f"{len(vectors)} vectors, {args.dimension} dimensions, {len(queries)} queries, recall@{k}\n")
+
+    _, truth = build(vectors, None, 'float32').search(queries, k)
+    baseline = args.dimension * 4
+    print(f"{'dimension':>9} {'precision':>9} {'bytes/vec':>10} {'smaller':>8} {'recall':>7} {'search ms':>10}")
+    for dimension, precision in CONFIGS:
+        if dimension and dimension >= args.dimension:
+            continue
+        index = build(vectors, dimension, precision)
+        reduced = queries if not dimension else np.stack([vector_index.reduce_dimension(q, dimension) for q in queries])
+        start = time.perf_counter()
+        _, found = index.search(reduced, k)
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        size = vector_index.bytes_per_vector(index)
+        print(f"{dimension or args.dimension:>9} {vector_index.index_precision(index):>9} {size:>10} "
+              f"{baseline / size:>7.1f}x {recall:>7.3f} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
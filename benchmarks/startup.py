@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Sayless CLI.
+Measures wall time and import time for each command so regressions in
+startup cost (e.g. a heavy module imported at the top level) show up early.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Commands to time. "--help" parses the command without running it, which
+# isolates the cost of importing the CLI from the work each command does.
+COMMANDS = [
+    ["--help"],
+    ["config", "--show"],
+    ["switch", "--help"],
+    ["g", "--help"],
+    ["summary", "--help"],
+    ["since", "--help"],
+    ["search", "--help"],
+    ["branch", "--help"],
+    ["branches", "--help"],
+    ["pr", "--help"],
+    ["review", "--help"],
+]
+
+
+def run_command(args, env):
+    """Run one CLI invocation and return (wall seconds, importtime stderr)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "sayless.cli.core"] + args,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    return time.perf_counter() - start, result.stderr
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into ({module: cumulative microseconds}, total microseconds)"""
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = int(cumulative)
+        except ValueError:
+            continue  # header line
+        # Top-level imports are not indented; their cumulative times add up to the total
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports of the last command")
+    args = parser.parse_args()
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as home:
+        # Isolate from the user's real config
+        env = {**os.environ, "HOME": home, "PYTHONPATH": repo_root}
+
+        print(f"{'command':<22} {'wall ms':>9} {'import ms':>10}")
+        slowest = {}
+        for command in COMMANDS:
+            walls, imports = [], []
+            for _ in range(args.runs):
+                wall, stderr = run_command(command, env)
+                modules, total = parse_importtime(stderr)
+                walls.append(wall * 1000)
+                imports.append(total / 1000)
+                slowest = modules
+            print(f"{' '.join(command):<22} {statistics.median(walls):>9.1f} {statistics.median(imports):>10.1f}")
+
+        print("\nSlowest imports (cumulative ms, last run):")
+        ranked = sorted(slowest.items(), key=lambda item: item[1], reverse=True)
+        for name, micros in ranked[:args.top]:
+            print(f"  {micros / 1000:>8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,227 @@
 from abc import ABC, abstractmethod
-import requests
-from openai import OpenAI
+from typing import AsyncIterator, Callable, Iterator, List, Optional, TypeVar
 from rich.console import Console
-from .ollama_setup import ensure_ollama_ready
-import time
+import hashlib
+import json
+import threading
+import weakref
+
+# Provider SDKs (openai, httpx) and asyncio are imported lazily so that
+# importing this module stays cheap for commands that never call a model.
 
 console = Console()
 
+T = TypeVar('T')
+
+COMMIT_SYSTEM_PROMPT = "You are a helpful assistant that generates clear and concise git commit messages in the conventional commits format."
+
+_ready_models = set()
+_ready_lock = threading.Lock()
+
+_responses = None
+_responses_lock = threading.Lock()
+
+_json_unsupported = set()  # (endpoint, model) pairs that rejected response_format
+_context_warned = set()  # num_ctx values already warned about; chunked reviews send many requests
+
+def _response_cache():
+    """Get the shared response cache, or None when it is disabled"""
+    global _responses
+    if _responses is None:
+        from .cache import DiskCache
+        from .config import get_config
+        
+        settings = get_config()
+        with _responses_lock:
+            if _responses is None:
+                ttl = settings.get_response_cache_ttl()
+                _responses = DiskCache('responses', ttl=ttl, max_entries=settings.get_response_cache_size()) if ttl else False
+    return _responses or None
+
 class AIProvider(ABC):
+    """Async-first model provider; the sync methods wrap the async ones"""
+    name = "AI provider"
+    max_attempts = None  # attempts per request, None for the retry layer's default
+
     @abstractmethod
-    def generate_commit_message(self, diff: str, model: str) -> str:
-        """Generate commit message from diff"""
+    async def _agenerate(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                         json_mode: bool = False) -> str:
+        """Send one generate request, asking for a JSON object when json_mode is set"""
+        pass
+
+    async def _astream(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7) -> AsyncIterator[str]:
+        """Send one streaming generate request"""
+        yield await self._agenerate(prompt, model, system=system, max_tokens=max_tokens, temperature=temperature)
+
+    @abstractmethod
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        """Send one embedding request"""
         pass
+
+    def _endpoint(self) -> str:
+        """Identify the endpoint whose concurrency limit this provider shares"""
+        return type(self).__name__
+
+    def _slots(self) -> Optional[int]:
+        """Get how many requests the endpoint serves in parallel, or None to adapt to it"""
+        return None
+
+    def _limiter(self):
+        """Get the concurrency limiter shared by requests to this provider's endpoint"""
+        from .concurrency import get_limiter
+        return get_limiter(self._endpoint(), self._slots())
+
+    def _retry_options(self) -> dict:
+        """Get the options passed to the retry layer"""
+        return {'max_attempts': self.max_attempts} if self.max_attempts else {}
+
+    def _report(self, error: Exception) -> None:
+        """Show why a request failed after all retries"""
+        console.print(f"[red]Error: {self.name} request failed[/red]")
+        console.print(f"[red]Details: {str(error)}[/red]")
+
+    def _cache_key(self, prompt: str, model: str, system: str, max_tokens: int, temperature: float,
+                   json_mode: bool = False) -> str:
+        """Build the response cache key for a request"""
+        from .cache import make_key
+        
+        digest = hashlib.sha256(f"{system or ''}\0{prompt}".encode('utf-8')).hexdigest()
+        return make_key(self.name, self._endpoint(), model, temperature, max_tokens, json_mode, digest)
+
+    async def agenerate(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                        cache: bool = True, json_mode: bool = False) -> str:
+        """Generate a completion for a raw prompt, reusing a cached response unless cache is False"""
+        from .concurrency import call_with_retry
+        
+        responses = _response_cache() if cache else None
+        if responses:
+            key = self._cache_key(prompt, model, system, max_tokens, temperature, json_mode)
+            cached = responses.get(key)
+            if cached is not None:
+                return cached
+        try:
+            result = await call_with_retry(
+                lambda: self._agenerate(prompt, model, system=system, max_tokens=max_tokens, temperature=temperature,
+                                        json_mode=json_mode),
+                self._limiter(),
+                **self._retry_options()
+            )
+        except Exception as e:
+            self._report(e)
+            raise
+        if responses and result:
+            responses.set(key, result)
+        return result
+
+    async def astream(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                      cache: bool = True) -> AsyncIterator[str]:
+        """Yield the completion for a raw prompt as tokens arrive, replaying a cached response unless cache is False"""
+        from .concurrency import stream_with_retry
+        
+        responses = _response_cache() if cache else None
+        if responses:
+            key = self._cache_key(prompt, model, system, max_tokens, temperature)
+            cached = responses.get(key)
+            if cached is not None:
+                yield cached
+                return
+        chunks = []
+        try:
+            async for chunk in stream_with_retry(
+                lambda: self._astream(prompt, model, system=system, max_tokens=max_tokens, temperature=temperature),
+                self._limiter(),
+                **self._retry_options()
+            ):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            self._report(e)
+            raise
+        # Only complete responses are cached; a stream closed early never gets here
+        if responses and chunks:
+            responses.set(key, ''.join(chunks))
+
+    async def aembed(self, text: str, model: str = None) -> List[float]:
+        """Get an embedding vector for a text"""
+        from .concurrency import call_with_retry
+        
+        try:
+            return await call_with_retry(lambda: self._aembed(text, model), self._limiter(), **self._retry_options())
+        except Exception as e:
+            self._report(e)
+            raise
+
+    async def acascade(self, prompt: str, models: List[str], validate: Callable[[str], Optional[T]], **options) -> Optional[T]:
+        """Try models in order until one gives a response that validate accepts (returns non-None)"""
+        for i, model in enumerate(models):
+            try:
+                response = await self.agenerate(prompt, model, **options)
+            except Exception:
+                if i == len(models) - 1:
+                    raise
+                continue
+            result = validate(response)
+            if result is not None:
+                return result
+        return None
+
+    async def agenerate_commit_message(self, diff: str, model: str, cache: bool = True) -> str:
+        """Generate commit message from diff"""
+        return await self.agenerate(self._get_prompt(diff), model, system=COMMIT_SYSTEM_PROMPT, max_tokens=100, cache=cache)
+
+    def generate(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                 cache: bool = True, json_mode: bool = False) -> str:
+        """Generate a completion for a raw prompt"""
+        from .aio import run_sync
+        return run_sync(self.agenerate(prompt, model, system=system, max_tokens=max_tokens, temperature=temperature,
+                                       cache=cache, json_mode=json_mode))
+
+    def stream(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+               cache: bool = True) -> Iterator[str]:
+        """Yield the completion for a raw prompt as tokens arrive"""
+        from .aio import iterate_sync
+        return iterate_sync(self.astream(prompt, model, system=system, max_tokens=max_tokens, temperature=temperature, cache=cache))
+
+    def cascade(self, prompt: str, models: List[str], validate: Callable[[str], Optional[T]], **options) -> Optional[T]:
+        """Try models in order until one gives a response that validate accepts (returns non-None)"""
+        from .aio import run_sync
+        return run_sync(self.acascade(prompt, models, validate, **options))
+
+    def embed(self, text: str, model: str = None) -> List[float]:
+        """Get an embedding vector for a text"""
+        from .aio import run_sync
+        return run_sync(self.aembed(text, model))
+
+    def generate_commit_message(self, diff: str, model: str, cache: bool = True) -> str:
+        """Generate commit message from diff"""
+        from .aio import run_sync
+        return run_sync(self.agenerate_commit_message(diff, model, cache=cache))
+
+    def stream_commit_message(self, diff: str, model: str, cache: bool = True) -> Iterator[str]:
+        """Stream a commit message for a diff as tokens arrive"""
+        return self.stream(self._get_prompt(diff), model, system=COMMIT_SYSTEM_PROMPT, max_tokens=100, cache=cache)
+
+    def _client(self):
+        """Get the async HTTP client for the running event loop"""
+        import asyncio
+        
+        # Async clients are bound to the loop they were first used on
+        if '_clients' not in self.__dict__:
+            self._clients = weakref.WeakKeyDictionary()
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = self._create_client()
+        return client
+
+    def _create_client(self):
+        """Create an async HTTP client for this provider"""
+        raise NotImplementedError
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Roughly estimate the number of tokens in a text"""
+        return len(text) // 4
     
     @staticmethod
     def _get_prompt(diff: str) -> str:
@@ -35,67 +245,266 @@ Here's the diff:
 
 Generate only the commit message without any explanation."""
 
+def _ensure_ollama_ready(model: str) -> None:
+    """Make sure Ollama serves the model, checking each model once per process"""
+    from .ollama_setup import ensure_ollama_ready
+    
+    with _ready_lock:
+        if model in _ready_models:
+            return
+        try:
+            ensure_ollama_ready(model)
+        except SystemExit:
+            # Never let setup failures tear down the event loop thread
+            raise ConnectionError(f"Ollama is not available for model {model}")
+        _ready_models.add(model)
+
 class OllamaProvider(AIProvider):
+    name = "Ollama"
+
     def __init__(self):
-        self.api_url = "http://localhost:11434/api/generate"
+        self.base_url = "http://localhost:11434"
+        self.api_url = f"{self.base_url}/api/generate"
         self.timeout = 30  # seconds
+        self.connect_timeout = 10  # seconds
+
+    def _create_client(self):
+        import httpx
+        return httpx.AsyncClient(timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout))
+
+    async def _ensure_ready(self, model: str) -> None:
+        """Run the (blocking) Ollama setup check off the event loop"""
+        import asyncio
+        
+        if model not in _ready_models:
+            await asyncio.get_running_loop().run_in_executor(None, _ensure_ollama_ready, model)
+
+    @staticmethod
+    def _payload(prompt: str, model: str, system: str, max_tokens: int, temperature: float, stream: bool,
+                 json_mode: bool = False) -> dict:
+        """Build the request body for the generate endpoint"""
+        from .config import get_config
+        
+        settings = get_config()
+        # The same load options on every request, so Ollama never reloads the model to apply them
+        options = settings.get_ollama_options()
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': stream,
+            'keep_alive': settings.get_ollama_keep_alive(),
+            'options': {**options, 'temperature': temperature}
+        }
+        if system:
+            payload['system'] = system
+        if max_tokens:
+            payload['options']['num_predict'] = max_tokens
+        if json_mode:
+            payload['format'] = 'json'
+        num_ctx = options.get('num_ctx')
+        if (num_ctx and num_ctx not in _context_warned
+                and AIProvider.estimate_tokens(f"{system or ''}{prompt}") + payload['options'].get('num_predict', 0) > num_ctx):
+            # Ollama drops the start of prompts that don't fit without saying so
+            _context_warned.add(num_ctx)
+            console.print(f"[yellow]Warning: the prompt may not fit Ollama's {num_ctx}-token context and could be "
+                          f"truncated; raise ollama_num_ctx to send all of it[/yellow]")
+        return payload
 
-    def generate_commit_message(self, diff: str, model: str = "llama2") -> str:
+    def _endpoint(self) -> str:
+        return self.base_url
+
+    def _slots(self) -> Optional[int]:
+        from .config import get_config
+        return get_config().get_ollama_num_parallel()
+
+    def _report(self, error: Exception) -> None:
+        console.print("[red]Error: Failed to connect to Ollama[/red]")
+        console.print(f"[red]Details: {str(error)}[/red]")
+
+    async def _agenerate(self, prompt: str, model: str = "llama2", system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                         json_mode: bool = False) -> str:
         # Ensure Ollama is ready
-        ensure_ollama_ready(model)
+        await self._ensure_ready(model)
+        
+        response = await self._client().post(
+            self.api_url,
+            json=self._payload(prompt, model, system, max_tokens, temperature, stream=False, json_mode=json_mode)
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result['response'].strip()
 
-        prompt = self._get_prompt(diff)
+    async def _astream(self, prompt: str, model: str = "llama2", system: str = None, max_tokens: int = None, temperature: float = 0.7) -> AsyncIterator[str]:
+        await self._ensure_ready(model)
         
-        try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    'model': model,
-                    'prompt': prompt,
-                    'stream': False
-                },
-                timeout=self.timeout
-            )
+        # The read timeout applies between chunks, so long generations don't time out
+        async with self._client().stream(
+            'POST',
+            self.api_url,
+            json=self._payload(prompt, model, system, max_tokens, temperature, stream=True)
+        ) as response:
             response.raise_for_status()
-            result = response.json()
-            return result['response'].strip()
-        except requests.exceptions.RequestException as e:
-            console.print("[red]Error: Failed to connect to Ollama[/red]")
-            console.print(f"[red]Details: {str(e)}[/red]")
-            raise
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                if chunk.get('response'):
+                    yield chunk['response']
+                if chunk.get('done'):
+                    break
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        model = model or "llama2"
+        await self._ensure_ready(model)
+        
+        from .config import get_config
+        
+        settings = get_config()
+        response = await self._client().post(
+            f"{self.base_url}/api/embeddings",
+            json={'model': model, 'prompt': text, 'keep_alive': settings.get_ollama_keep_alive(),
+                  'options': settings.get_ollama_options()}
+        )
+        response.raise_for_status()
+        return response.json()['embedding']
+
+    async def awarm(self, model: str = "llama2") -> float:
+        """Load the model into memory without generating anything; returns the seconds it took"""
+        import time
+        from .config import get_config
+        
+        settings = get_config()
+        await self._ensure_ready(model)
+        start = time.monotonic()
+        # A generate request without a prompt only loads the model
+        response = await self._client().post(
+            self.api_url,
+            json={'model': model, 'keep_alive': settings.get_ollama_keep_alive(), 'options': settings.get_ollama_options()},
+            timeout=None
+        )
+        response.raise_for_status()
+        return time.monotonic() - start
+
+    def warm(self, model: str = "llama2") -> float:
+        """Load the model into memory without generating anything; returns the seconds it took"""
+        from .aio import run_sync
+        return run_sync(self.awarm(model))
 
 class OpenAIProvider(AIProvider):
+    name = "OpenAI"
+
     def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-        self.max_retries = 3
-        self.retry_delay = 1  # seconds
+        self.api_key = api_key
 
-    def generate_commit_message(self, diff: str, model: str = "gpt-4o") -> str:
-        prompt = self._get_prompt(diff)
+    def _create_client(self):
+        from openai import AsyncOpenAI
+        # Retries are handled by the shared retry layer, not the SDK
+        return AsyncOpenAI(api_key=self.api_key, max_retries=0)
+
+    def _endpoint(self) -> str:
+        return "openai"
+
+    def _report(self, error: Exception) -> None:
+        from .concurrency import is_retryable
         
-        for attempt in range(self.max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that generates clear and concise git commit messages in the conventional commits format."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=100
-                )
-                return response.choices[0].message.content.strip()
-            except ConnectionError as e:
-                if attempt < self.max_retries - 1:
-                    console.print(f"[yellow]Connection failed, retrying in {self.retry_delay} seconds... (attempt {attempt + 1}/{self.max_retries})[/yellow]")
-                    time.sleep(self.retry_delay)
-                    continue
-                console.print("[red]Error: Unable to connect to OpenAI. Check your internet connection.[/red]")
+        if is_retryable(error):
+            console.print("[red]Error: Unable to reach OpenAI. Check your internet connection or try again later.[/red]")
+        else:
+            console.print("[red]Error: Failed to generate message with OpenAI[/red]")
+        console.print(f"[red]Details: {str(error)}[/red]")
+
+    @staticmethod
+    def _messages(prompt: str, system: str = None) -> list:
+        """Build the chat messages for a prompt"""
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
+
+    async def _agenerate(self, prompt: str, model: str = "gpt-4o", system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                         json_mode: bool = False) -> str:
+        import openai
+        
+        options = {'max_tokens': max_tokens} if max_tokens else {}
+        json_format = json_mode and (self._endpoint(), model) not in _json_unsupported
+        if json_format:
+            options['response_format'] = {'type': 'json_object'}
+        try:
+            response = await self._client().chat.completions.create(
+                model=model,
+                messages=self._messages(prompt, system),
+                temperature=temperature,
+                **options
+            )
+        except openai.BadRequestError as e:
+            if not json_format or 'response_format' not in str(e):
                 raise
-            except Exception as e:
-                console.print("[red]Error: Failed to generate message with OpenAI[/red]")
-                console.print(f"[red]Details: {str(e)}[/red]")
-                raise # Modified on 2025-05-18 08:20:00
+            # Older models such as gpt-4 reject JSON mode; JSON prompts also ask for JSON in the text
+            _json_unsupported.add((self._endpoint(), model))
+            return await self._agenerate(prompt, model, system, max_tokens, temperature)
+        return response.choices[0].message.content.strip()
+
+    async def _astream(self, prompt: str, model: str = "gpt-4o", system: str = None, max_tokens: int = None, temperature: float = 0.7) -> AsyncIterator[str]:
+        options = {'max_tokens': max_tokens} if max_tokens else {}
+        response = await self._client().chat.completions.create(
+            model=model,
+            messages=self._messages(prompt, system),
+            temperature=temperature,
+            stream=True,
+            **options
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        response = await self._client().embeddings.create(
+            input=text,
+            model=model or "text-embedding-3-large"
+        )
+        return response.data[0].embedding
+
+class OpenAICompatibleProvider(OpenAIProvider):
+    """Any server with the OpenAI chat and embeddings API, e.g. llama.cpp server or vLLM"""
+    name = "OpenAI-compatible server"
+
+    def __init__(self, base_url: str, api_key: str = None, slots: int = None, embedding_model: str = None):
+        # Local servers usually ignore the key, but the SDK requires one
+        super().__init__(api_key or "none")
+        self.base_url = base_url.rstrip('/')
+        self.slots = slots
+        self.embedding_model = embedding_model
+        self.quiet = False  # set when a load balancer reports failures instead
+
+    def _create_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+
+    def _endpoint(self) -> str:
+        return self.base_url
+
+    def _slots(self) -> Optional[int]:
+        return self.slots
+
+    def _report(self, error: Exception) -> None:
+        if self.quiet:
+            return
+        console.print(f"[red]Error: Request to {self.base_url} failed[/red]")
+        console.print(f"[red]Details: {str(error)}[/red]")
+
+    def _cache_key(self, prompt: str, model: str, system: str, max_tokens: int, temperature: float,
+                   json_mode: bool = False) -> str:
+        # Servers behind one load balancer host the same model, so they share cached responses
+        from .cache import make_key
+        
+        digest = hashlib.sha256(f"{system or ''}\0{prompt}".encode('utf-8')).hexdigest()
+        return make_key(self.name, model, temperature, max_tokens, json_mode, digest)
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        from .config import get_config
+        return await super()._aembed(text, model or self.embedding_model or get_config().get_model())
 
 # Fix update: error handling - 2025-05-18 23:30
 # Feat update: testing - 2025-05-20 23:48
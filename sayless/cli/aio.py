@@ -0,0 +1,87 @@
+"""
+Bridge between the async provider API and synchronous callers.
+Coroutines run on one background event loop, so sync code in any thread
+can call them and all calls share the providers' connection pools.
+"""
+
+import asyncio
+import contextvars
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Get the shared background event loop, starting it on first use"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='sayless-aio', daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+class _Exit(Exception):
+    """Carries a sys.exit() out of the background loop to the calling thread"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+async def _guard(coro: Awaitable[T], context: contextvars.Context) -> T:
+    """Await a coroutine in the caller's context, turning SystemExit into an ordinary exception"""
+    # Tasks on the background loop don't inherit the calling thread's context
+    for var, value in context.items():
+        var.set(value)
+    # A SystemExit escaping a task would stop the shared loop for good
+    try:
+        return await coro
+    except SystemExit as e:
+        raise _Exit(e.code)
+
+
+def _result(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the background loop and wait for its result"""
+    try:
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(_guard(coro, context), _background_loop()).result()
+    except _Exit as e:
+        raise SystemExit(e.code)
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine to completion from synchronous code"""
+    return _result(coro)
+
+
+def iterate_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Iterate an async generator from synchronous code"""
+    try:
+        while True:
+            try:
+                yield _result(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Close the stream (and its HTTP response) if the caller stops early
+        if hasattr(agen, 'aclose'):
+            _result(agen.aclose())
+
+
+async def gather_limited(coros, limit: int = 4, return_exceptions: bool = True) -> list:
+    """Await coroutines concurrently, at most limit at a time, keeping their order"""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=return_exceptions)
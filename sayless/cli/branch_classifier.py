@@ -0,0 +1,219 @@
+"""
+Local branch type classification.
+Keyword rules handle the obvious cases; otherwise a multinomial Naive Bayes
+model over bag-of-words, trained on the repository's conventional commit
+subjects plus a small built-in corpus, predicts the type. Callers only ask
+the model when the prediction isn't confident.
+"""
+
+import math
+import re
+import subprocess
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+BRANCH_TYPES = ('feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore')
+CONFIDENCE_THRESHOLD = 0.8  # below this, the model is asked
+AGREEMENT_CONFIDENCE = 0.85  # when the keyword rules back the prediction
+HISTORY_LIMIT = 2000  # commit subjects used for training
+MODEL_VERSION = 1
+
+CONVENTIONAL_SUBJECT = re.compile(r'^(feat|fix|docs|style|refactor|perf|test|chore)(\([^)]*\))?!?:\s*(.+)$', re.IGNORECASE)
+
+# Leading words that settle the type on their own
+LEADING_WORDS = {
+    'fix': 'fix', 'fixes': 'fix', 'fixed': 'fix', 'bugfix': 'fix', 'hotfix': 'fix', 'repair': 'fix', 'resolve': 'fix',
+    'document': 'docs', 'docs': 'docs', 'doc': 'docs',
+    'refactor': 'refactor', 'restructure': 'refactor', 'cleanup': 'refactor', 'simplify': 'refactor',
+    'test': 'test', 'tests': 'test', 'testing': 'test',
+    'optimize': 'perf', 'speed': 'perf', 'perf': 'perf',
+    'format': 'style', 'lint': 'style', 'reformat': 'style',
+    'bump': 'chore', 'upgrade': 'chore', 'chore': 'chore',
+}
+
+# Leading verbs that mean a feature unless a keyword rule says otherwise
+FEATURE_VERBS = {'add', 'implement', 'introduce', 'support', 'create', 'enable', 'allow', 'new'}
+
+# Substring rules from the original keyword fallback, used when nothing else applies
+KEYWORD_RULES = [
+    ('fix', ['fix', 'bug', 'issue']),
+    ('docs', ['doc', 'readme']),
+    ('refactor', ['refactor', 'clean']),
+    ('test', ['test']),
+    ('style', ['style', 'format']),
+    ('perf', ['perf', 'optimize']),
+]
+
+# Seed examples so the model works in repositories without conventional commits
+SEED_CORPUS = {
+    'feat': ['add user authentication', 'implement search endpoint', 'support dark mode', 'new export command',
+             'allow custom templates', 'introduce settings page', 'create api client', 'enable notifications'],
+    'fix': ['crash when saving empty file', 'handle missing config', 'wrong error message on login',
+            'broken link in navbar', 'prevent null pointer', 'correct timezone handling', 'race condition in worker'],
+    'docs': ['update readme', 'add usage examples', 'document configuration options', 'fix typos in guide',
+             'api reference', 'contributing guidelines', 'changelog for release'],
+    'style': ['format code with black', 'fix indentation', 'lint warnings', 'whitespace and trailing commas',
+              'sort imports', 'consistent quotes'],
+    'refactor': ['extract helper functions', 'split large module', 'rename variables for clarity',
+                 'move parsing into its own class', 'remove duplicated code', 'simplify control flow'],
+    'perf': ['cache expensive lookups', 'speed up startup', 'reduce memory usage', 'faster queries with index',
+             'avoid repeated allocations', 'lazy load modules', 'batch database writes'],
+    'test': ['add unit tests for parser', 'increase coverage', 'integration tests for api', 'fix flaky test',
+             'mock network calls in tests', 'test fixtures'],
+    'chore': ['bump dependencies', 'update ci workflow', 'release version', 'configure build', 'upgrade packages',
+              'update gitignore', 'dependency updates'],
+}
+
+STOP_WORDS = {'a', 'an', 'the', 'and', 'or', 'to', 'of', 'in', 'on', 'for', 'with', 'by', 'from', 'at', 'is',
+              'be', 'it', 'this', 'that', 'as', 'into', 'when', 'so'}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase, lightly stemmed words"""
+    tokens = []
+    for word in re.findall(r'[a-z]+', text.lower()):
+        if word in STOP_WORDS or len(word) < 2:
+            continue
+        for suffix in ('ing', 'ed', 'es', 's'):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+class NaiveBayes:
+    def __init__(self, doc_counts: Dict[str, int] = None, word_counts: Dict[str, Dict[str, int]] = None):
+        """Initialize from per-type document and word counts"""
+        self.doc_counts = Counter(doc_counts or {})
+        self.word_counts = {label: Counter(counts) for label, counts in (word_counts or {}).items()}
+
+    def add(self, label: str, text: str) -> None:
+        """Count one training example"""
+        self.doc_counts[label] += 1
+        self.word_counts.setdefault(label, Counter()).update(tokenize(text))
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Get the most likely type and its posterior probability"""
+        tokens = tokenize(text)
+        vocabulary = set()
+        for counts in self.word_counts.values():
+            vocabulary.update(counts)
+        tokens = [token for token in tokens if token in vocabulary]
+        if not tokens or not self.doc_counts:
+            return None, 0.0
+
+        total_docs = sum(self.doc_counts.values())
+        scores = {}
+        for label, docs in self.doc_counts.items():
+            counts = self.word_counts.get(label, Counter())
+            total_words = sum(counts.values())
+            # Laplace smoothing over the shared vocabulary
+            score = math.log(docs / total_docs)
+            for token in tokens:
+                score += math.log((counts[token] + 1) / (total_words + len(vocabulary)))
+            scores[label] = score
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        normalizer = sum(math.exp(score - top) for score in scores.values())
+        return best, 1 / normalizer
+
+    def to_dict(self) -> Dict:
+        return {'doc_counts': dict(self.doc_counts), 'word_counts': {k: dict(v) for k, v in self.word_counts.items()}}
+
+
+def get_history_subjects(limit: int = HISTORY_LIMIT) -> List[str]:
+    """Get recent commit subjects of the current repository"""
+    try:
+        result = subprocess.run(['git', 'log', '--no-merges', f'-n{limit}', '--format=%s'],
+                                capture_output=True, text=True)
+    except OSError:
+        return []
+    return result.stdout.splitlines() if result.returncode == 0 else []
+
+
+def train(subjects: List[str]) -> NaiveBayes:
+    """Train a model on the seed corpus and conventional commit subjects"""
+    model = NaiveBayes()
+    for label, examples in SEED_CORPUS.items():
+        for example in examples:
+            model.add(label, example)
+    for subject in subjects:
+        match = CONVENTIONAL_SUBJECT.match(subject.strip())
+        if match:
+            model.add(match.group(1).lower(), match.group(3))
+    return model
+
+
+_model = None
+
+
+def get_model() -> NaiveBayes:
+    """Get the model for the current repository, retrained only when HEAD moves"""
+    global _model
+    if _model is not None:
+        return _model
+    from .cache import DiskCache, make_key
+
+    head = subprocess.run(['git', 'rev-parse', 'HEAD', '--show-toplevel'], capture_output=True, text=True)
+    key = make_key(MODEL_VERSION, head.stdout.strip()) if head.returncode == 0 else None
+    cache = DiskCache('branch_classifier', max_entries=20)
+    cached = cache.get(key) if key else None
+    if cached:
+        _model = NaiveBayes(cached['doc_counts'], cached['word_counts'])
+    else:
+        _model = train(get_history_subjects() if key else [])
+        if key:
+            cache.set(key, _model.to_dict())
+    return _model
+
+
+def keyword_type(description: str) -> Optional[str]:
+    """Get the type from the keyword rules, if one matches"""
+    desc_lower = description.lower()
+    for branch_type, words in KEYWORD_RULES:
+        if any(word in desc_lower for word in words):
+            return branch_type
+    return None
+
+
+def classify(description: str) -> Tuple[str, float]:
+    """Predict the branch type of a description with a confidence between 0 and 1"""
+    match = CONVENTIONAL_SUBJECT.match(description.strip())
+    if match:
+        return match.group(1).lower(), 1.0
+    first = re.findall(r'[a-z]+', description.lower())[:1]
+    if first and first[0] in LEADING_WORDS:
+        return LEADING_WORDS[first[0]], 0.95
+
+    keyword = keyword_type(description)
+    if first and first[0] in FEATURE_VERBS and keyword is None:
+        return 'feat', AGREEMENT_CONFIDENCE
+
+    label, confidence = get_model().predict(description)
+    if label is None:
+        return keyword or 'feat', 0.5 if keyword else 0.0
+    if keyword == label:
+        # The rules and the model agree
+        confidence = max(confidence, AGREEMENT_CONFIDENCE)
+    elif keyword:
+        # The rules and the model disagree: not confident either way
+        confidence = min(confidence, 0.5)
+    return label, confidence
+
+
+def classify_files(files: List[str]) -> Tuple[Optional[str], float]:
+    """Predict the branch type from the paths of changed files"""
+    files = [path.lower() for path in files if path]
+    if not files:
+        return None, 0.0
+    if all(path.startswith(('.github/', '.gitlab-ci', '.circleci/')) or path in (
+            'requirements.txt', 'setup.py', 'setup.cfg', 'pyproject.toml', 'package.json', 'package-lock.json',
+            'dockerfile', '.gitignore', 'makefile') for path in files):
+        return 'chore', 0.9
+    if all(path.endswith(('.md', '.rst')) or path.startswith('docs/') for path in files):
+        return 'docs', 0.95
+    if all(re.search(r'(^|/)(tests?/|test_[^/]*$|[^/]*_test\.\w+$|[^/]*\.(test|spec)\.\w+$)', path) for path in files):
+        return 'test', 0.95
+    return None, 0.0
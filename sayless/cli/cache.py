@@ -0,0 +1,87 @@
+"""
+On-disk caches for Sayless.
+Entries are stored as JSON files under ~/.sayless/cache/<namespace>/.
+A namespace can expire entries after a TTL and keep only its most
+recently used entries.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+
+def make_key(*parts) -> str:
+    """Build a cache key from several parts"""
+    return '\0'.join(str(part) for part in parts)
+
+
+class DiskCache:
+    def __init__(self, namespace: str, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """Initialize a cache namespace with optional expiry (seconds) and size limit"""
+        self.cache_dir = Path.home() / '.sayless' / 'cache' / namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> Path:
+        """Get the file path for a key"""
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a cached value, or default if missing, expired or unreadable"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            if entry['key'] != key:
+                return default
+            if self.ttl and time.time() - entry.get('created', 0) > self.ttl:
+                self.delete(key)
+                return default
+            if self.max_entries:
+                # The file's mtime records when it was last used
+                os.utime(path)
+            return entry['value']
+        except (OSError, ValueError, KeyError):
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value atomically"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'key': key, 'value': value, 'created': time.time()}, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        if self.max_entries:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries beyond max_entries"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def delete(self, key: str) -> None:
+        """Remove a cached value"""
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
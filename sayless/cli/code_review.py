@@ -0,0 +1,269 @@
+"""
+Chunked code review engine.
+Splits a diff per file (or per hunk group for large files), reviews the
+chunks in parallel and synthesizes a single review with inline comments.
+"""
+
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional
+from .ai_providers import AIProvider
+
+MAX_CHUNK_TOKENS = 12000  # per-chunk prompt budget
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+
+REVIEW_SYSTEM_PROMPT = "You are a senior engineer doing a careful, friendly code review. You follow the requested response format exactly."
+COMMENTS_MARKER = "---COMMENTS---"  # separates streamed prose from the inline comments
+
+
+def split_diff_by_file(diff: str) -> List[Dict]:
+    """Split a unified diff into per-file sections with their hunks"""
+    files = []
+    current = None
+    for line in diff.split('\n'):
+        if line.startswith('diff --git '):
+            match = re.match(r'diff --git a/(.+) b/(.+)$', line)
+            current = {
+                'path': match.group(2) if match else line.split()[-1],
+                'header': [line],
+                'hunks': []
+            }
+            files.append(current)
+        elif current is None:
+            continue
+        elif line.startswith('@@'):
+            current['hunks'].append([line])
+        elif current['hunks']:
+            current['hunks'][-1].append(line)
+        else:
+            if line.startswith('+++ b/'):
+                current['path'] = line[6:]
+            current['header'].append(line)
+    return files
+
+
+def commentable_lines(hunk: List[str]) -> List[int]:
+    """Get the new-side line numbers of a hunk that can carry review comments"""
+    match = HUNK_HEADER.match(hunk[0])
+    if not match:
+        return []
+    line_no = int(match.group(1))
+    lines = []
+    for line in hunk[1:]:
+        if line.startswith('-') or line.startswith('\\'):
+            continue
+        lines.append(line_no)
+        line_no += 1
+    return lines
+
+
+def build_chunks(diff: str, max_tokens: int = MAX_CHUNK_TOKENS) -> List[Dict]:
+    """Group the diff into review chunks that fit the token budget"""
+    # Break each file into pieces that fit the budget, splitting large files by hunk
+    pieces = []
+    for file in split_diff_by_file(diff):
+        header = '\n'.join(file['header'])
+        group = []
+        group_tokens = AIProvider.estimate_tokens(header)
+        for hunk in file['hunks']:
+            hunk_tokens = AIProvider.estimate_tokens('\n'.join(hunk))
+            if group and group_tokens + hunk_tokens > max_tokens:
+                pieces.append((file['path'], header, group))
+                group = []
+                group_tokens = AIProvider.estimate_tokens(header)
+            group.append(hunk)
+            group_tokens += hunk_tokens
+        pieces.append((file['path'], header, group))
+
+    # Pack small pieces together so tiny files don't each cost a request
+    chunks = []
+    current = None
+    for path, header, hunks in pieces:
+        text = '\n'.join([header] + ['\n'.join(h) for h in hunks])
+        if AIProvider.estimate_tokens(text) > max_tokens:
+            text = text[:max_tokens * 4] + "\n... (hunk truncated)"
+        lines = set()
+        for hunk in hunks:
+            lines.update(commentable_lines(hunk))
+        if current is None or AIProvider.estimate_tokens(current['diff'] + text) > max_tokens:
+            current = {'diff': text, 'files': [path], 'lines': {path: lines}}
+            chunks.append(current)
+        else:
+            current['diff'] += '\n' + text
+            if path not in current['files']:
+                current['files'].append(path)
+            current['lines'].setdefault(path, set()).update(lines)
+
+    # Not a git diff: review it as a single chunk without inline comments
+    if not chunks and diff.strip():
+        chunks.append({'diff': diff[:max_tokens * 4], 'files': [], 'lines': {}})
+    return chunks
+
+
+def parse_json_response(text: str) -> Dict:
+    """Extract a JSON object from a model response"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end <= start:
+        raise ValueError("Response did not contain JSON")
+    return json.loads(text[start:end + 1])
+
+
+def chunk_prompt(chunk: Dict, context: str, final: bool) -> str:
+    """Build the review prompt for a single chunk"""
+    if final:
+        # Prose first so it can be streamed, comments after the marker
+        return f"""You are reviewing a teammate's pull request.
+
+{context}
+Files changed: {', '.join(chunk['files'])}
+
+CODE CHANGES:
+{chunk['diff']}
+
+First write your casual review: a few VERY short conversational paragraphs covering what was implemented, why, and your honest thoughts.
+Then write {COMMENTS_MARKER} on its own line, followed by ONLY a JSON array of inline comments:
+[
+  {{"path": "file path", "line": <line number in the new version of the file>, "comment": "specific, actionable feedback"}}
+]
+
+Only add comments for real issues (bugs, risky logic, missing handling). Use [] if there are none.
+Do NOT repeat the commit message or PR title. Write like you're talking to a colleague."""
+
+    review_field = '"summary": "2-4 sentences: what these files change and any concerns"'
+    return f"""You are reviewing part of a teammate's pull request.
+
+{context}
+Files in this part: {', '.join(chunk['files'])}
+
+CODE CHANGES:
+{chunk['diff']}
+
+Respond with ONLY a JSON object in this format:
+{{
+  {review_field},
+  "comments": [
+    {{"path": "file path", "line": <line number in the new version of the file>, "comment": "specific, actionable feedback"}}
+  ]
+}}
+
+Only add comments for real issues (bugs, risky logic, missing handling). Use an empty list if there are none.
+Do NOT repeat the commit message or PR title. Write like you're talking to a colleague."""
+
+
+def synthesis_prompt(summaries: List[str], context: str) -> str:
+    """Build the prompt that merges chunk summaries into one review"""
+    notes = '\n\n'.join(f"Part {i + 1}:\n{summary}" for i, summary in enumerate(summaries))
+    return f"""You reviewed a teammate's pull request in parts. Here are your notes for each part:
+
+{context}
+{notes}
+
+Now write the final review. First explain what was implemented and why, then give your honest thoughts about the changes.
+Use natural, VERY short paragraphs, written like you're sitting next to a teammate, with insane clarity.
+DO NOT repeat commit messages or use any formatting. Keep it concise so it can be read with a couple of glances.
+Your casual review:"""
+
+
+def stream_until_marker(chunks, on_token: Callable[[str], None], marker: str = COMMENTS_MARKER) -> str:
+    """Forward streamed text to on_token up to the marker and return the full text"""
+    text = ""
+    sent = 0
+    for chunk in chunks:
+        text += chunk
+        if sent is None:
+            continue
+        end = text.find(marker)
+        if end != -1:
+            on_token(text[sent:end])
+            sent = None
+        elif len(text) - len(marker) > sent:
+            # Hold back a possible partial marker at the end
+            on_token(text[sent:len(text) - len(marker)])
+            sent = len(text) - len(marker)
+    if sent is not None and sent < len(text):
+        on_token(text[sent:])
+    return text
+
+
+def parse_final_response(text: str) -> Dict:
+    """Split a final review response into prose and raw inline comments"""
+    if COMMENTS_MARKER in text:
+        prose, _, rest = text.partition(COMMENTS_MARKER)
+        start = rest.find('[')
+        end = rest.rfind(']')
+        try:
+            comments = json.loads(rest[start:end + 1]) if start != -1 and end > start else []
+        except ValueError:
+            comments = []
+        return {'review': prose.strip(), 'comments': comments if isinstance(comments, list) else []}
+    try:
+        return parse_json_response(text)
+    except ValueError:
+        # Keep the prose if the model ignored the format
+        return {'review': text.strip(), 'comments': []}
+
+
+def review_chunk(ai: AIProvider, model: str, chunk: Dict, context: str, final: bool,
+                 on_token: Optional[Callable[[str], None]] = None) -> Dict:
+    """Review a single chunk and validate its inline comments"""
+    prompt = chunk_prompt(chunk, context, final)
+    if final:
+        if on_token:
+            response = stream_until_marker(
+                ai.stream(prompt, model, system=REVIEW_SYSTEM_PROMPT, temperature=0.3), on_token
+            )
+        else:
+            response = ai.generate(prompt, model, system=REVIEW_SYSTEM_PROMPT, temperature=0.3)
+        result = parse_final_response(response)
+    else:
+        response = ai.generate(prompt, model, system=REVIEW_SYSTEM_PROMPT, temperature=0.3)
+        try:
+            result = parse_json_response(response)
+        except ValueError:
+            # Keep the prose if the model ignored the JSON format
+            result = {'summary': response.strip(), 'comments': []}
+
+    comments = []
+    for comment in result.get('comments') or []:
+        try:
+            path = comment['path']
+            line = int(comment['line'])
+            body = comment['comment'].strip()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        # GitHub only accepts comments on lines that are part of the diff
+        if body and line in chunk['lines'].get(path, ()):
+            comments.append({'path': path, 'line': line, 'side': 'RIGHT', 'body': body})
+
+    return {
+        'text': str(result.get('review' if final else 'summary', '')).strip(),
+        'comments': comments
+    }
+
+
+def run_chunked_review(ai: AIProvider, model: str, diff: str, context: str, max_workers: int = 4,
+                       on_token: Optional[Callable[[str], None]] = None) -> Dict:
+    """Review a diff chunk by chunk in parallel and synthesize the final review"""
+    chunks = build_chunks(diff)
+    if not chunks:
+        raise ValueError("No file changes found in diff")
+
+    if len(chunks) == 1:
+        result = review_chunk(ai, model, chunks[0], context, final=True, on_token=on_token)
+        return {'review': result['text'], 'comments': result['comments'], 'chunks': 1}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(lambda chunk: review_chunk(ai, model, chunk, context, final=False), chunks))
+
+    summaries = [result['text'] for result in results if result['text']]
+    if on_token:
+        review = ""
+        for token in ai.stream(synthesis_prompt(summaries, context), model):
+            review += token
+            on_token(token)
+    else:
+        review = ai.generate(synthesis_prompt(summaries, context), model)
+    comments = [comment for result in results for comment in result['comments']]
+    return {'review': review.strip(), 'comments': comments, 'chunks': len(chunks)}
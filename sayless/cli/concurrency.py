@@ -0,0 +1,303 @@
+"""
+Adaptive concurrency and retries for model requests.
+An AIMD limiter per endpoint grows concurrency while requests succeed and
+halves it on rate limits, overload and latency spikes. Failed requests are
+retried with jittered exponential backoff that honors Retry-After, within
+an optional per-command deadline.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+CONGESTION_STATUSES = {429, 503}
+# Exception class names from openai and httpx, matched by name so neither SDK is imported here
+TRANSIENT_ERRORS = {'APIConnectionError', 'APITimeoutError', 'TransportError', 'TimeoutException'}
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 0.5  # seconds
+MAX_DELAY = 20  # seconds
+
+_deadline: ContextVar[Optional[float]] = ContextVar('sayless_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a command runs out of time for model requests"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Give up on model requests that cannot finish within seconds from now"""
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Get the seconds left before the current deadline, or None without one"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16, cooldown: float = 1.0):
+        """Initialize an AIMD limiter that starts at initial concurrent requests"""
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.cooldown = cooldown  # seconds between two decreases
+        self.in_flight = 0
+        self.latency = None  # moving average of successful request latency
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for a request slot"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+            # The slot was handed over just as we were cancelled; a cancelled
+            # future gives it back in _grant, a resolved one must do it here
+            if not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Free a request slot and wake waiters that now fit under the limit"""
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiting requests, in order"""
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            # Waiters may belong to other event loops
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future) -> None:
+        """Resolve a waiter, returning the slot if it was cancelled meanwhile"""
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """Grow the limit by about one request per round of successes"""
+        with self._lock:
+            if latency is not None:
+                average = self.latency
+                self.latency = latency if average is None else 0.8 * average + 0.2 * latency
+                # A request much slower than usual means the endpoint is queueing
+                if average is not None and latency > 3 * average:
+                    self._decrease()
+                    return
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_congestion(self) -> None:
+        """Halve the limit after a rate limit, overload or timeout"""
+        with self._lock:
+            self._decrease()
+
+    def _decrease(self) -> None:
+        """Multiplicative decrease, at most once per cooldown"""
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str, slots: Optional[int] = None) -> AdaptiveLimiter:
+    """Get the shared limiter for an endpoint, capped at slots when it serves a known number of requests at once"""
+    with _limiters_lock:
+        if key not in _limiters:
+            if slots:
+                # More requests than slots only queue on the server
+                _limiters[key] = AdaptiveLimiter(initial=slots, maximum=slots)
+            else:
+                from .config import get_config
+                settings = get_config()
+                _limiters[key] = AdaptiveLimiter(
+                    initial=settings.get_llm_concurrency(),
+                    maximum=settings.get_llm_max_concurrency()
+                )
+        return _limiters[key]
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """Get the HTTP status of an SDK error, if it has one"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_timeout(error: Exception) -> bool:
+    """Check whether an error is a timeout"""
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or any(
+        'Timeout' in cls.__name__ for cls in type(error).__mro__
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed request may succeed if sent again"""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, ConnectionError) or is_timeout(error):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    return status_code(error) in RETRY_STATUSES
+
+
+def is_outage(error: Exception) -> bool:
+    """Check whether an error means the provider is unreachable or failing, rather than the request being wrong"""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, ConnectionError) or is_timeout(error):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    status = status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def is_congestion(error: Exception) -> bool:
+    """Check whether an error means the endpoint is overloaded"""
+    return status_code(error) in CONGESTION_STATUSES or is_timeout(error)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Get the server-requested delay from Retry-After headers, in seconds"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, error: Exception) -> float:
+    """Get the delay before the next attempt"""
+    delay = retry_after(error)
+    if delay is None:
+        # Full jitter keeps many clients from retrying in lockstep
+        delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    return min(delay, MAX_DELAY * 3)
+
+
+def _check_deadline(delay: float, error: Exception = None) -> None:
+    """Raise DeadlineExceeded if waiting delay seconds would pass the deadline"""
+    left = time_left()
+    if left is not None and left <= delay:
+        raise DeadlineExceeded("Ran out of time waiting for the model") from error
+
+
+async def _bounded(call: Awaitable[T]) -> T:
+    """Await a request, cut short by the current deadline"""
+    left = time_left()
+    if left is None:
+        return await call
+    try:
+        return await asyncio.wait_for(call, timeout=left)
+    except asyncio.TimeoutError as e:
+        if time_left() > 0:
+            raise  # the request's own timeout, which may be retried
+        raise DeadlineExceeded("Ran out of time waiting for the model") from e
+
+
+async def call_with_retry(request: Callable[[], Awaitable[T]], limiter: AdaptiveLimiter,
+                          max_attempts: int = MAX_ATTEMPTS) -> T:
+    """Send a request under the limiter, retrying transient failures"""
+    for attempt in range(max_attempts):
+        _check_deadline(0)
+        async with limiter:
+            start = time.monotonic()
+            try:
+                result = await _bounded(request())
+                limiter.on_success(time.monotonic() - start)
+                return result
+            except Exception as e:
+                if not is_retryable(e) or attempt == max_attempts - 1:
+                    raise
+                if is_congestion(e):
+                    limiter.on_congestion()
+                error = e
+        # Back off without holding a slot
+        delay = backoff(attempt, error)
+        _check_deadline(delay, error)
+        await asyncio.sleep(delay)
+
+
+async def stream_with_retry(stream: Callable[[], AsyncIterator[str]], limiter: AdaptiveLimiter,
+                            max_attempts: int = MAX_ATTEMPTS) -> AsyncIterator[str]:
+    """Stream a response under the limiter, retrying only until the first token"""
+    for attempt in range(max_attempts):
+        _check_deadline(0)
+        started = False
+        async with limiter:
+            try:
+                async for chunk in stream():
+                    if not started:
+                        started = True
+                        limiter.on_success()
+                    yield chunk
+                return
+            except Exception as e:
+                # Once tokens were shown, a retry would repeat them
+                if started or not is_retryable(e) or attempt == max_attempts - 1:
+                    raise
+                if is_congestion(e):
+                    limiter.on_congestion()
+                error = e
+        delay = backoff(attempt, error)
+        _check_deadline(delay, error)
+        await asyncio.sleep(delay)
@@ -6,43 +6,127 @@ Handles provider settings, API keys, and user preferences.
 
 import os
 import json
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from rich.console import Console
 
 console = Console()
 
+DEFAULT_CONFIG = {
+    'provider': 'openai',
+    'model': 'gpt-4o',
+    'openai_api_key': None,
+    'github_token': None,
+    'log_level': 'INFO'
+}
+
+PROVIDERS = ('openai', 'ollama', 'openai-compatible')
+
+# Fast, cheap models tried first for small tasks, per provider
+SMALL_MODELS = {
+    'openai': 'gpt-4o-mini'
+}
+
+# Tasks whose output is short and easy to validate
+SMALL_TASKS = ('branch_type', 'branch_name', 'pr_insights', 'commit_tags')
+
+# Environment variables that override config values
+ENV_OVERRIDES = {
+    'openai_api_key': 'OPENAI_API_KEY',
+    'github_token': 'GITHUB_TOKEN'
+}
+
+# Set for background jobs and git hooks: they use a running Ollama but never install, start or pull
+NO_SETUP_ENV = 'SAYLESS_NO_SETUP'
+
 class Config:
     def __init__(self):
-        """Initialize configuration"""
+        """Initialize configuration paths; the file is read on first use"""
         self.config_dir = os.path.expanduser("~/.sayless")
         self.config_file = os.path.join(self.config_dir, "config.json")
-        
-        # Create config directory if it doesn't exist
-        if not os.path.exists(self.config_dir):
-            os.makedirs(self.config_dir)
-        
-        # Load or create config file
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r') as f:
-                self.config = json.load(f)
-        else:
-            self.config = {
-                'provider': 'openai',
-                'model': 'gpt-4o',
-                'openai_api_key': None,
-                'github_token': None,
-                'log_level': 'INFO'
-            }
-            self.save_config(self.config)
-
-    def save_config(self, config):
-        """Save configuration to file"""
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=4)
+        self._config = None
+        self._env = {}
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+
+    @property
+    def config(self):
+        """Get the configuration, loading it on first access"""
+        if self._config is None:
+            self._load()
+        return self._config
+
+    @config.setter
+    def config(self, value):
+        self._config = value
+
+    def _load(self):
+        """Load the config file and resolve environment overrides once"""
+        with self._lock:
+            if self._config is not None:
+                return
+            self._env = {key: os.getenv(var) for key, var in ENV_OVERRIDES.items()}
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r') as f:
+                    self._config = json.load(f)
+            else:
+                self._config = dict(DEFAULT_CONFIG)
+                self.save_config(self._config)
+
+    def _env_override(self, key):
+        """Get the environment override for a config key, if any"""
+        if self._config is None:
+            self._load()
+        return self._env.get(key)
+
+    def save_config(self, config=None):
+        """Save configuration to file, deferring the write inside batch()"""
+        with self._lock:
+            if config is not None:
+                self._config = config
+            if self._batch_depth:
+                self._dirty = True
+                return
+            self._write()
+
+    def _write(self):
+        """Atomically replace the config file so readers never see a partial write"""
+        os.makedirs(self.config_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.config_dir, prefix='.config.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def batch(self):
+        """Group several setters into a single write of the config file"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                # Leave the file untouched if the batch failed part-way
+                self._dirty = False
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self._write()
 
     def get_openai_api_key(self):
         """Get OpenAI API key from config or environment"""
-        return os.getenv('OPENAI_API_KEY') or self.config.get('openai_api_key')
+        return self._env_override('openai_api_key') or self.config.get('openai_api_key')
 
     def set_openai_api_key(self, api_key):
         """Set OpenAI API key in config and environment"""
@@ -50,10 +134,11 @@ class Config:
         self.save_config(self.config)
         # Also set it for the current session
         os.environ['OPENAI_API_KEY'] = api_key
+        self._env['openai_api_key'] = api_key
 
     def get_github_token(self):
         """Get GitHub token from config or environment"""
-        return os.getenv('GITHUB_TOKEN') or self.config.get('github_token')
+        return self._env_override('github_token') or self.config.get('github_token')
 
     def set_github_token(self, token):
         """Set GitHub token in config and environment"""
@@ -61,11 +146,12 @@ class Config:
         self.save_config(self.config)
         # Also set it for the current session
         os.environ['GITHUB_TOKEN'] = token
+        self._env['github_token'] = token
 
     def set_provider(self, provider):
-        """Set the AI provider (openai or ollama)"""
-        if provider not in ['ollama', 'openai']:
-            raise ValueError(f"Provider must be 'openai' or 'ollama', got '{provider}'")
+        """Set the AI provider (openai, ollama or openai-compatible)"""
+        if provider not in PROVIDERS:
+            raise ValueError(f"Provider must be one of {', '.join(PROVIDERS)}, got '{provider}'")
         self.config['provider'] = provider
         # Set appropriate default model when switching providers
         if provider == 'openai' and self.config.get('model') == 'llama2':
@@ -78,6 +164,61 @@ class Config:
         """Get current AI provider"""
         return self.config.get('provider', 'openai')
 
+    def get_base_urls(self):
+        """Get the OpenAI-compatible server URLs, e.g. http://localhost:8080/v1"""
+        urls = self.config.get('base_urls') or self.config.get('base_url') or []
+        return [urls] if isinstance(urls, str) else list(urls)
+
+    def set_base_urls(self, urls):
+        """Set the OpenAI-compatible server URLs"""
+        self.config['base_urls'] = list(urls)
+        self.config.pop('base_url', None)
+        self.save_config(self.config)
+
+    def get_endpoint_concurrency(self, url):
+        """Get how many requests an OpenAI-compatible server takes at once, or None to adapt to it"""
+        value = self.config.get('endpoint_concurrency')
+        if isinstance(value, dict):
+            value = value.get(url)
+        return int(value) if value else None
+
+    def get_compatible_api_key(self):
+        """Get the API key sent to OpenAI-compatible servers, if they need one"""
+        return self.config.get('compatible_api_key')
+
+    def get_embedding_model(self):
+        """Get the embedding model for OpenAI-compatible servers (default: the chat model)"""
+        return self.config.get('embedding_model')
+
+    def get_embedding_backend(self):
+        """Get what embeds commits for search: provider, hashing (offline) or onnx (local model)"""
+        return self.config.get('embedding_backend', 'provider')
+
+    def get_embedding_dimension(self):
+        """Get the size search vectors are stored at, or None for the backend's default"""
+        value = self.config.get('embedding_dimension')
+        return int(value) if value else None
+
+    def get_embedding_precision(self):
+        """Get how search vectors are stored: float32, float16, int8 or pq (product quantization)"""
+        return self.config.get('embedding_precision', 'float32')
+
+    def get_embedding_granularity(self):
+        """Get what each search vector covers: a whole commit, one file or a group of hunks"""
+        return self.config.get('embedding_granularity', 'commit')
+
+    def get_search_pooling(self):
+        """Get how file and hunk matches rank their commit: by the best match (max) or by all of them (sum)"""
+        return self.config.get('search_pooling', 'max')
+
+    def get_onnx_model(self):
+        """Get the directory of the ONNX embedding model"""
+        return self.config.get('onnx_model')
+
+    def get_index_tags(self):
+        """Get whether indexed commits are tagged by the model (default: only when it also embeds them)"""
+        return bool(self.config.get('index_tags', self.get_embedding_backend() == 'provider'))
+
     def set_model(self, model):
         """Set the model name"""
         self.config['model'] = model
@@ -87,6 +228,17 @@ class Config:
         """Get current model name"""
         return self.config.get('model', 'gpt-4o') 
 
+    def get_task_models(self, task):
+        """Get the models tried in order for a task; later models are used when earlier output fails validation"""
+        configured = (self.config.get('task_models') or {}).get(task)
+        if configured:
+            return [configured] if isinstance(configured, str) else list(configured)
+        model = self.get_model()
+        small = SMALL_MODELS.get(self.get_provider())
+        if task in SMALL_TASKS and small and small != model:
+            return [small, model]
+        return [model]
+
     def get_log_level(self):
         """Get current log level"""
         return self.config.get('log_level', 'INFO')
@@ -99,6 +251,64 @@ class Config:
         self.config['log_level'] = level.upper()
         self.save_config(self.config)
 
+    def get_review_concurrency(self):
+        """Get the maximum number of diff chunks reviewed in parallel"""
+        return int(self.config.get('review_concurrency', 4))
+
+    def get_llm_concurrency(self):
+        """Get the number of model requests sent at once before adapting to the endpoint"""
+        return int(self.config.get('llm_concurrency', 4))
+
+    def get_llm_max_concurrency(self):
+        """Get the upper bound for adaptive model request concurrency"""
+        return int(self.config.get('llm_max_concurrency', 16))
+
+    def get_command_deadline(self):
+        """Get the time budget in seconds for model requests in bulk commands (0 disables it)"""
+        return float(self.config.get('command_deadline', 300))
+
+    def get_circuit_cooldown(self):
+        """Get how long in seconds a failing provider is skipped before it is tried again"""
+        return float(self.config.get('circuit_cooldown', 60))
+
+    def get_hedge_percentile(self):
+        """Get the latency percentile after which the fallback provider is also asked (0 disables hedging)"""
+        return float(self.config.get('hedge_percentile', 0))
+
+    def get_response_cache_ttl(self):
+        """Get how long in seconds model responses are reused for identical prompts (0 disables the cache)"""
+        return float(self.config.get('response_cache_ttl', 7 * 24 * 3600))
+
+    def get_response_cache_size(self):
+        """Get the number of model responses kept before the least recently used are evicted"""
+        return int(self.config.get('response_cache_size', 1000))
+
+    def get_ollama_keep_alive(self):
+        """Get how long Ollama keeps the model loaded after a request (e.g. "30m", -1 for forever)"""
+        return self.config.get('ollama_keep_alive', '30m')
+
+    def get_ollama_options(self):
+        """Get the Ollama model options sent with every request"""
+        options = {'num_ctx': int(self.config.get('ollama_num_ctx', 8192))}
+        for key in ('num_predict', 'num_thread'):
+            value = self.config.get(f'ollama_{key}')
+            if value:
+                options[key] = int(value)
+        # 0 keeps the model's own default context size
+        return {key: value for key, value in options.items() if value}
+
+    def get_ollama_num_parallel(self):
+        """Get the number of requests Ollama serves in parallel, or None when unknown"""
+        value = self.config.get('ollama_num_parallel') or os.getenv('OLLAMA_NUM_PARALLEL')
+        try:
+            return int(value) if value else None
+        except ValueError:
+            return None
+
+    def get_hook_timeout(self):
+        """Get how long in seconds the prepare-commit-msg hook may spend generating a message"""
+        return float(self.config.get('hook_timeout', 10))
+
     def reset_to_defaults(self):
         """Reset configuration to default values"""
         self.config = {
@@ -109,6 +319,18 @@ class Config:
         }
         self.save_config(self.config) # Modified on 2025-05-17 12:30:00
 
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_config() -> Config:
+    """Get the process-wide configuration, created on first use"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = Config()
+    return _instance
+
 # Refactor update: config - 2025-05-23 02:23
 # Fix update: caching - 2025-05-23 08:49
 # Style update: debugging - 2025-05-23 13:51
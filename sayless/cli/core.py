@@ -7,27 +7,22 @@ from rich.console import Console
 from rich import print
 from rich.panel import Panel
 from rich.table import Table
-from rich.live import Live
-from rich.spinner import Spinner
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
-from typing import Optional, Tuple
+from rich.progress import Progress, SpinnerColumn, TextColumn
+from typing import List, Optional, Tuple
 import os
 import time
-from .config import Config
-from .ai_providers import OllamaProvider, OpenAIProvider
+from .config import PROVIDERS, get_config
 import datetime
-from dateutil.parser import parse as parse_date
-from dateutil.relativedelta import relativedelta
-import asyncio
-from .embeddings import CommitEmbeddings
-from .git_ops import create_branch, list_branches, run_git_command
-from .github_ops import create_pr, list_prs
+from .git_ops import run_git_command
+
+# Heavy modules (embeddings, GitHub client, dateutil, asyncio) are imported
+# inside the commands that use them to keep CLI startup fast.
 
 app = typer.Typer(help="AI Git Copilot / Autopilot")
 console = Console()
-settings = Config()
+settings = get_config()
 
-VALID_PROVIDERS = ["openai", "ollama"]
+VALID_PROVIDERS = list(PROVIDERS)
 MAX_COMMIT_MESSAGE_LENGTH = 72
 DEBUG_MODE = os.getenv('SAYLESS_DEBUG', 'false').lower() == 'true'
 
@@ -103,6 +98,8 @@ def show_config_status():
     
     table.add_row("Provider", f"[green]{provider}[/green] {'(default)' if provider == 'openai' else '(local AI)'}")
     table.add_row("Model", f"[green]{settings.get_model()}[/green]")
+    if provider == 'openai-compatible':
+        table.add_row("Servers", f"[green]{', '.join(settings.get_base_urls()) or 'not configured'}[/green]")
     if provider == 'openai':
         table.add_row("OpenAI API Key", f"[{'green' if has_openai_key else 'red'}]{'configured' if has_openai_key else 'not configured'}[/{'green' if has_openai_key else 'red'}]")
     table.add_row("GitHub Token", f"[{'green' if has_github_token else 'red'}]{'configured' if has_github_token else 'not configured'}[/{'green' if has_github_token else 'red'}]")
@@ -191,32 +188,20 @@ def create_commit(message: str):
             sys.exit(1)
 
 def get_ai_provider():
-    """Get the configured AI provider"""
-    provider = settings.get_provider()
+    """Get the configured AI provider, routed to the Ollama fallback when it is down"""
+    from .router import create_provider
     
-    if provider == 'openai':
-        api_key = settings.get_openai_api_key()
-        if not api_key:
-            ensure_openai_configured()
-        return OpenAIProvider(api_key)
-    else:
-        return OllamaProvider()
+    if settings.get_provider() == 'openai' and not settings.get_openai_api_key():
+        ensure_openai_configured()
+    return create_provider()
 
 def generate_commit_message(diff: str, provider, model: str) -> str:
     """Generate commit message with fallback handling"""
     try:
         return provider.generate_commit_message(diff, model)
     except Exception as e:
-        if isinstance(provider, OpenAIProvider):
-            console.print("\n[yellow]OpenAI failed. Trying Ollama as fallback...[/yellow]")
-            try:
-                with console.status("[bold yellow]Initializing Ollama fallback...[/bold yellow]"):
-                    fallback_provider = OllamaProvider()
-                return fallback_provider.generate_commit_message(diff, "llama2")
-            except Exception:
-                console.print(Panel(f"[red]Both OpenAI and Ollama failed.\nOriginal error: {str(e)}[/red]", title="Error", border_style="red"))
-                sys.exit(1)
-        raise
+        console.print(Panel(f"[red]All AI providers failed.\nError: {str(e)}[/red]", title="Error", border_style="red"))
+        sys.exit(1)
 
 def get_commit_range(since=None, until=None):
     """Get commit range based on dates"""
@@ -244,11 +229,8 @@ def get_commit_details(commit_hash):
     except subprocess.CalledProcessError:
         return None
 
-def generate_summary(commits, provider, model):
-    """Generate a summary of changes from commits"""
-    if not commits:
-        return "No changes found in the specified period."
-    
+def build_summary_prompt(commits):
+    """Build the prompt that summarizes a list of commits"""
     # Get all commit messages and diffs
     commit_details = []
     for commit in commits[:10]:  # Limit to last 10 commits for reasonable context
@@ -277,21 +259,20 @@ Generate a summary in this format:
 - (bug fixes and improvements)
 
 Keep each bullet point concise and clear."""
+    return prompt
 
-    try:
-        return provider.generate_commit_message(prompt, model)
-    except Exception as e:
-        if isinstance(provider, OpenAIProvider):
-            console.print("[yellow]OpenAI failed, trying Ollama fallback...[/yellow]")
-            try:
-                fallback_provider = OllamaProvider()
-                return fallback_provider.generate_commit_message(prompt, "llama2")
-            except Exception:
-                raise Exception(f"Both providers failed. Original error: {str(e)}")
-        raise
+def generate_summary(commits, provider, model):
+    """Generate a summary of changes from commits"""
+    if not commits:
+        return "No changes found in the specified period."
+    
+    return provider.generate(build_summary_prompt(commits), model).strip()
 
 def parse_time_interval(interval):
     """Parse time interval string into timedelta"""
+    from dateutil.parser import parse as parse_date
+    from dateutil.relativedelta import relativedelta
+    
     if not interval:
         return relativedelta(days=1)  # Default to last 24 hours
         
@@ -324,6 +305,8 @@ def parse_time_interval(interval):
 
 def format_date(date_str):
     """Convert date string to human readable format"""
+    from dateutil.parser import parse as parse_date
+    
     try:
         if isinstance(date_str, str):
             date = parse_date(date_str)
@@ -388,13 +371,18 @@ def get_commit_details_for_hash(commit_hash: str) -> Tuple[str, str, str]:
         error_msg = e.stderr.decode('utf-8') if e.stderr else str(e)
         raise Exception(f"Failed to get commit details: {error_msg}")
 
-async def index_commit(commit_hash: str, progress=None):
+async def index_commit(commit_hash: str, progress=None, embeddings=None, save: bool = True):
     """Index a single commit"""
+    import asyncio
+    from .embeddings import CommitEmbeddings
+    
     try:
-        message, diff, date = get_commit_details_for_hash(commit_hash)
-        embeddings = CommitEmbeddings()
-        tags = embeddings.get_commit_tags(message, diff)
-        await embeddings.add_commit(commit_hash, message, diff, date, tags)
+        message, diff, date = await asyncio.get_running_loop().run_in_executor(
+            None, get_commit_details_for_hash, commit_hash
+        )
+        embeddings = embeddings or CommitEmbeddings()
+        tags = await embeddings.aget_commit_tags(message, diff) if embeddings.tag_commits else []
+        await embeddings.add_commit(commit_hash, message, diff, date, tags, save=save)
         return True
     except Exception as e:
         if progress:
@@ -403,11 +391,12 @@ async def index_commit(commit_hash: str, progress=None):
 
 @app.command()
 def switch(
-    provider: str = typer.Argument(..., help="AI provider to use (openai or ollama)"),
+    provider: str = typer.Argument(..., help="AI provider to use (openai, ollama or openai-compatible)"),
     key: Optional[str] = typer.Option(None, "--key", help="OpenAI API key (required for OpenAI)"),
     model: Optional[str] = typer.Option(None, "--model", help="Model to use (optional)"),
+    url: Optional[List[str]] = typer.Option(None, "--url", help="OpenAI-compatible server URL; repeat to balance over several"),
 ):
-    """Quickly switch between AI providers (OpenAI/Ollama)"""
+    """Quickly switch between AI providers (OpenAI/Ollama/OpenAI-compatible servers)"""
     
     # Validate provider
     provider = provider.lower()
@@ -427,36 +416,53 @@ def switch(
     ) as progress:
         task = progress.add_task(f"Switching to {provider}...", total=None)
         
-        if provider == "openai":
-            # Check for API key
-            api_key = key or os.getenv("OPENAI_API_KEY") or settings.get_openai_api_key()
-            if not api_key:
-                progress.update(task, completed=True)
-                console.print(Panel(
-                    "[red]OpenAI API key required[/red]\n"
-                    "[yellow]Provide it using one of these methods:[/yellow]\n"
-                    "[blue]1. With the switch command:[/blue]\n"
-                    "   sayless switch openai --key YOUR_API_KEY\n"
-                    "[blue]2. Environment variable:[/blue]\n"
-                    "   export OPENAI_API_KEY=your_api_key",
-                    title="Error",
-                    border_style="red"
-                ))
-                sys.exit(1)
+        # Apply all changes with a single write of the config file
+        with settings.batch():
+            if provider == "openai":
+                # Check for API key
+                api_key = key or os.getenv("OPENAI_API_KEY") or settings.get_openai_api_key()
+                if not api_key:
+                    progress.update(task, completed=True)
+                    console.print(Panel(
+                        "[red]OpenAI API key required[/red]\n"
+                        "[yellow]Provide it using one of these methods:[/yellow]\n"
+                        "[blue]1. With the switch command:[/blue]\n"
+                        "   sayless switch openai --key YOUR_API_KEY\n"
+                        "[blue]2. Environment variable:[/blue]\n"
+                        "   export OPENAI_API_KEY=your_api_key",
+                        title="Error",
+                        border_style="red"
+                    ))
+                    sys.exit(1)
+            
+                # Configure OpenAI
+                settings.set_openai_api_key(api_key)
+                settings.set_provider('openai')
+                if not model:
+                    settings.set_model('gpt-4o')  # Set default OpenAI model
             
-            # Configure OpenAI
-            settings.set_openai_api_key(api_key)
-            settings.set_provider('openai')
-            if not model:
-                settings.set_model('gpt-4')  # Set default OpenAI model
+            elif provider == "ollama":
+                settings.set_provider('ollama')
+                if not model:
+                    settings.set_model('llama2')  # Set default Ollama model
             
-        elif provider == "ollama":
-            settings.set_provider('ollama')
-            if not model:
-                settings.set_model('llama2')  # Set default Ollama model
+            elif provider == "openai-compatible":
+                if not url and not settings.get_base_urls():
+                    progress.update(task, completed=True)
+                    console.print(Panel(
+                        "[red]Server URL required[/red]\n"
+                        "[yellow]Point Sayless at your llama.cpp, vLLM or other OpenAI-compatible server:[/yellow]\n"
+                        "   sayless switch openai-compatible --url http://localhost:8080/v1 --model MODEL",
+                        title="Error",
+                        border_style="red"
+                    ))
+                    sys.exit(1)
+                if url:
+                    settings.set_base_urls(url)
+                settings.set_provider('openai-compatible')
         
-        if model:
-            settings.set_model(model)
+            if model:
+                settings.set_model(model)
         
         time.sleep(0.5)  # Add a small delay for better UX
         progress.update(task, completed=True)
@@ -465,6 +471,38 @@ def switch(
     console.print(f"\n[bold green]✓[/bold green] Successfully switched to {provider}!")
     show_config_status()
 
+@app.command()
+def warm(
+    model: Optional[str] = typer.Option(None, "--model", "-m", help="Ollama model to load (default: the configured model)"),
+):
+    """Load the Ollama model into memory so the next command skips the cold start"""
+    from .ai_providers import OllamaProvider
+    from .router import FALLBACK_MODEL
+    
+    if settings.get_provider() == 'ollama':
+        model = model or settings.get_model()
+    else:
+        # With OpenAI, Ollama only serves as the fallback
+        model = model or FALLBACK_MODEL
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console,
+        transient=True
+    ) as progress:
+        progress.add_task(f"Loading {model}...", total=None)
+        try:
+            seconds = OllamaProvider().warm(model)
+        except Exception as e:
+            console.print(Panel(f"[red]Failed to load {model}\nDetails: {str(e)}[/red]", title="Error", border_style="red"))
+            sys.exit(1)
+    
+    console.print(f"[green]✓[/green] {model} loaded in {seconds:.1f}s and kept for {settings.get_ollama_keep_alive()}")
+    slots = settings.get_ollama_num_parallel()
+    if slots:
+        console.print(f"[blue]Sending up to {slots} requests at once (OLLAMA_NUM_PARALLEL)[/blue]")
+
 @app.command()
 def config(
     openai_key: Optional[str] = typer.Option(None, "--openai-key", help="Set OpenAI API key"),
@@ -507,34 +545,36 @@ def config(
     ) as progress:
         task = progress.add_task("Updating configuration...", total=None)
 
-        if openai_key:
-            settings.set_openai_api_key(openai_key)
-            settings.set_provider('openai')  # Automatically switch to OpenAI when key is provided
+        # Apply all changes with a single write of the config file
+        with settings.batch():
+            if openai_key:
+                settings.set_openai_api_key(openai_key)
+                settings.set_provider('openai')  # Automatically switch to OpenAI when key is provided
         
-        if github_token:
-            settings.set_github_token(github_token)
-
-        if use_openai and use_ollama:
-            progress.update(task, completed=True)
-            console.print(Panel("[red]Cannot use both OpenAI and Ollama at the same time[/red]", title="Error", border_style="red"))
-            sys.exit(1)
+            if github_token:
+                settings.set_github_token(github_token)
 
-        if use_openai:
-            settings.set_provider('openai')
-            if not settings.get_openai_api_key():
+            if use_openai and use_ollama:
                 progress.update(task, completed=True)
-                console.print(Panel(
-                    "[yellow]OpenAI API key not configured[/yellow]\n"
-                    "[blue]Quick setup:[/blue]\n"
-                    "  sayless switch openai --key YOUR_API_KEY",
-                    title="Warning",
-                    border_style="yellow"
-                ))
-        elif use_ollama:
-            settings.set_provider('ollama')
+                console.print(Panel("[red]Cannot use both OpenAI and Ollama at the same time[/red]", title="Error", border_style="red"))
+                sys.exit(1)
+
+            if use_openai:
+                settings.set_provider('openai')
+                if not settings.get_openai_api_key():
+                    progress.update(task, completed=True)
+                    console.print(Panel(
+                        "[yellow]OpenAI API key not configured[/yellow]\n"
+                        "[blue]Quick setup:[/blue]\n"
+                        "  sayless switch openai --key YOUR_API_KEY",
+                        title="Warning",
+                        border_style="yellow"
+                    ))
+            elif use_ollama:
+                settings.set_provider('ollama')
 
-        if model:
-            settings.set_model(model)
+            if model:
+                settings.set_model(model)
 
         time.sleep(0.5)  # Add a small delay for better UX
         progress.update(task, completed=True)
@@ -546,19 +586,37 @@ def config(
 def generate(
     preview: bool = typer.Option(False, help="Preview the commit message without creating the commit"),
     auto_add: bool = typer.Option(False, "-a", help="Automatically run 'git add .' before generating commit"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model for a new message instead of reusing a cached one"),
 ):
     """Generate a commit message for staged changes and create the commit"""
-    _generate_command(preview, auto_add)
+    _generate_command(preview, auto_add, no_cache)
 
 @app.command("g")
 def generate_alias(
     preview: bool = typer.Option(False, help="Preview the commit message without creating the commit"),
     auto_add: bool = typer.Option(False, "-a", help="Automatically run 'git add .' before generating commit"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ask the model for a new message instead of reusing a cached one"),
 ):
     """Generate a commit message for staged changes and create the commit (alias for generate)"""
-    _generate_command(preview, auto_add)
+    _generate_command(preview, auto_add, no_cache)
 
-def _generate_command(preview: bool, auto_add: bool):
+def _take_speculative_message() -> Optional[str]:
+    """Get the message a background job generated for the staged tree, if any"""
+    from . import speculative
+    
+    key = speculative.staged_key()
+    if key is None:
+        return None
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console,
+        transient=True
+    ) as progress:
+        progress.add_task("Checking for a precomputed message...", total=None)
+        return speculative.take(key)
+
+def _generate_command(preview: bool, auto_add: bool, no_cache: bool = False):
     """Internal function that implements the generate command logic"""
     show_welcome_message()
     ensure_openai_configured()
@@ -607,47 +665,44 @@ def _generate_command(preview: bool, auto_add: bool):
             task_diff = progress.add_task("Getting staged changes...", total=None)
             diff = get_staged_diff()
             progress.update(task_diff, completed=True)
-            
-            # Generate message
-            task_gen = progress.add_task("Generating commit message...", total=None)
-            provider = get_ai_provider()
-            model = settings.get_model()
-            
-            try:
-                message = provider.generate_commit_message(diff, model)
-                progress.update(task_gen, completed=True)
-            except Exception as e:
-                if isinstance(provider, OpenAIProvider):
-                    progress.update(task_gen, description="OpenAI failed, trying Ollama fallback...")
-                    try:
-                        fallback_provider = OllamaProvider()
-                        message = fallback_provider.generate_commit_message(diff, "llama2")
-                        progress.update(task_gen, completed=True)
-                    except Exception:
-                        progress.update(task_gen, visible=False)
-                        console.print(Panel(
-                            f"[red]Both OpenAI and Ollama failed.\nOriginal error: {str(e)}[/red]",
-                            title="Error",
-                            border_style="red"
-                        ))
-                        sys.exit(1)
-                else:
-                    progress.update(task_gen, visible=False)
-                    raise
         except Exception as e:
             # Ensure all tasks are properly marked as completed or hidden
             for task_id in progress.task_ids:
                 progress.update(task_id, visible=False)
             raise e
 
-    if message:
-        # Show the generated message in a panel
+    # Stream the message into its panel as it is generated
+    from .streaming import stream_to_panel
+    from .file_summaries import should_summarize_files, stream_commit_message
+    provider = get_ai_provider()
+    model = settings.get_model()
+    try:
+        precomputed = None if no_cache else _take_speculative_message()
+        if precomputed:
+            # A background job already generated the message for this staged tree
+            chunks = iter([precomputed])
+        elif should_summarize_files(diff):
+            # Large change sets are summarized per file, reusing summaries of unchanged files
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                console=console,
+                transient=True
+            ) as summary_progress:
+                summary_progress.add_task("Summarizing changed files...", total=None)
+                chunks = stream_commit_message(diff, provider, model, cache=not no_cache)
+        else:
+            chunks = provider.stream_commit_message(diff, model, cache=not no_cache)
+        message = stream_to_panel(chunks, title="Generated Commit Message", style="yellow")
+    except Exception as e:
         console.print(Panel(
-            f"[yellow]{message}[/yellow]",
-            title="Generated Commit Message",
-            border_style="green"
+            f"[red]Failed to generate commit message.\nDetails: {str(e)}[/red]",
+            title="Error",
+            border_style="red"
         ))
+        sys.exit(1)
 
+    if message:
         if preview:
             console.print("\n[blue]Preview mode: Commit not created[/blue]")
             return
@@ -679,6 +734,7 @@ def _generate_command(preview: bool, auto_add: bool):
                     # Index the commit
                     task_index = commit_progress.add_task("Indexing commit for search...", total=None)
                     try:
+                        import asyncio
                         success = asyncio.run(index_commit(commit_hash))
                         if success:
                             commit_progress.update(task_index, completed=True)
@@ -712,6 +768,8 @@ def summary(
     detailed: bool = typer.Option(False, "--detailed", "-d", help="Show a more detailed analysis"),
 ):
     """Generate an AI-powered summary of a specific commit"""
+    from dateutil.parser import parse as parse_date
+    
     show_welcome_message()
     ensure_openai_configured()
     
@@ -779,19 +837,17 @@ Example good summary:
 
 Keep it clear and practical, focusing on what developers need to know."""
 
-            # Get AI summary with fallback
-            try:
-                provider = get_ai_provider()
-                summary_text = provider.generate_commit_message(prompt, settings.get_model())
-            except Exception as e:
-                if "Connection" in str(e) and isinstance(provider, OpenAIProvider):
-                    progress.update(task, description="OpenAI connection failed, using local Ollama...")
-                    fallback_provider = OllamaProvider()
-                    summary_text = fallback_provider.generate_commit_message(prompt, "llama2")
-                else:
-                    raise
-            
+            # Stream the AI summary while it is written, then show it formatted
+            from .streaming import stream_to_panel
             progress.update(task, completed=True)
+            progress.stop()
+            provider = get_ai_provider()
+            summary_text = stream_to_panel(
+                provider.stream(prompt, settings.get_model()),
+                title=f"[yellow]commit {commit_hash[:8]}[/yellow]",
+                border_style="yellow",
+                transient=True
+            )
             
             # Format date
             formatted_date = format_date(parse_date(date))
@@ -924,30 +980,29 @@ def since(
             ))
             return
         
-        # Generate summary
-        task_summary = progress.add_task("Generating summary...", total=None)
-        provider = get_ai_provider()
-        model = settings.get_model()
-        
-        try:
-            summary_text = generate_summary(commits, provider, model)
-            progress.update(task_summary, completed=True)
-        except Exception as e:
-            progress.update(task_summary, visible=False)
-            console.print(Panel(
-                f"[red]Failed to generate summary\nError: {str(e)}[/red]",
-                title="Error",
-                border_style="red"
-            ))
-            return
+        task_prompt = progress.add_task("Reading commit details...", total=None)
+        prompt = build_summary_prompt(commits)
+        progress.update(task_prompt, completed=True)
     
-    # Show the summary
+    # Stream the summary into its panel as it is generated
+    from .streaming import stream_to_panel
     title = f"Changes Summary (From {since_display} to {until_display})"
-    console.print(Panel(
-        f"[green]{summary_text}[/green]",
-        title=title,
-        border_style="cyan"
-    ))
+    provider = get_ai_provider()
+    model = settings.get_model()
+    try:
+        summary_text = stream_to_panel(
+            provider.stream(prompt, model),
+            title=title,
+            border_style="cyan",
+            style="green"
+        )
+    except Exception as e:
+        console.print(Panel(
+            f"[red]Failed to generate summary\nError: {str(e)}[/red]",
+            title="Error",
+            border_style="red"
+        ))
+        return
     
     if save:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -967,13 +1022,17 @@ def search(
     index_all: bool = typer.Option(False, help="Re-index all commits before searching"),
 ):
     """Search for similar commits using AI-powered semantic search"""
+    import asyncio
+    from dateutil.parser import parse as parse_date
+    from . import daemon
+    
     show_welcome_message()
     ensure_openai_configured()
     
-    embeddings = CommitEmbeddings()
-    
     # Re-index all commits if requested
     if index_all:
+        from .embeddings import CommitEmbeddings
+        embeddings = CommitEmbeddings()
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -988,15 +1047,23 @@ def search(
                     stderr=subprocess.PIPE
                 ).decode('utf-8').strip().split('\n')
                 
-                # Process each commit
-                indexed_count = 0
-                for commit_hash in commits:
-                    success = asyncio.run(index_commit(commit_hash, progress))
-                    if success:
-                        indexed_count += 1
+                # Process commits concurrently into the shared index
+                from .aio import gather_limited
+                from .concurrency import deadline
+                # Waits for a background migration's current batch, then builds on what it saved
+                with embeddings.writing(), deadline(settings.get_command_deadline()):
+                    results = asyncio.run(gather_limited(
+                        [index_commit(commit_hash, progress, embeddings, save=False) for commit_hash in commits],
+                        limit=settings.get_llm_max_concurrency()
+                    ))
+                    embeddings.save_index()
+                indexed_count = sum(1 for success in results if success is True)
                 
                 progress.update(task, completed=True)
                 console.print(f"\n[green]✨ Repository indexed! Found and processed {indexed_count} commits[/green]")
+                # Commits of other repositories in the previous index are re-embedded in the background
+                from .embeddings import start_migration
+                start_migration()
                 
             except Exception as e:
                 progress.update(task, visible=False)
@@ -1016,7 +1083,16 @@ def search(
         task = progress.add_task("🔍 Finding relevant commits...", total=None)
         
         try:
-            results = asyncio.run(embeddings.search_commits(query, limit))
+            # The daemon keeps the index loaded; without it, load it here
+            from .embeddings import get_search_index, needs_migration, start_migration
+            if needs_migration():
+                # The previous index answers until the configured one is complete
+                start_migration()
+                progress.console.print("[dim]Re-embedding history for the new embedding model in the background; "
+                                       "searching the previous index meanwhile[/dim]")
+            results = daemon.search(query, limit)
+            if results is None:
+                results = asyncio.run(get_search_index().search_commits(query, limit))
             progress.update(task, completed=True)
             
             if not results:
@@ -1049,36 +1125,37 @@ def search(
             console.print(f"[dim]Found {len(results)} relevant commits in your repository[/dim]\n")
             
             # Function to get AI-augmented summary with fallback
+            provider = get_ai_provider()
+            
             async def get_commit_summary(message: str, score: float) -> str:
                 try:
-                    provider = get_ai_provider()
-                    try:
-                        prompt = f"""Given this commit message, provide a one-line natural explanation of its relevance:
-                        Message: {message}
-                        
-                        Respond in this format:
-                        <relevance>Brief explanation of how this commit relates to the search</relevance>"""
-                        
-                        summary = await provider.generate_commit_message(prompt, settings.get_model())
-                        # Extract content between relevance tags
-                        if '<relevance>' in summary and '</relevance>' in summary:
-                            summary = summary.split('<relevance>')[1].split('</relevance>')[0].strip()
-                        return summary
-                    except Exception as e:
-                        if "Connection" in str(e) and isinstance(provider, OpenAIProvider):
-                            console.print("[yellow]Connection error with OpenAI, falling back to local Ollama...[/yellow]")
-                            fallback_provider = OllamaProvider()
-                            summary = await asyncio.get_event_loop().run_in_executor(
-                                None, 
-                                lambda: fallback_provider.generate_commit_message(prompt, "llama2")
-                            )
-                            if '<relevance>' in summary and '</relevance>' in summary:
-                                summary = summary.split('<relevance>')[1].split('</relevance>')[0].strip()
-                            return summary
-                        raise
+                    prompt = f"""Given this commit message, provide a one-line natural explanation of its relevance:
+                    Message: {message}
+                    
+                    Respond in this format:
+                    <relevance>Brief explanation of how this commit relates to the search</relevance>"""
+                    
+                    summary = await provider.agenerate(prompt, settings.get_model())
+                    # Extract content between relevance tags
+                    if '<relevance>' in summary and '</relevance>' in summary:
+                        summary = summary.split('<relevance>')[1].split('</relevance>')[0].strip()
+                    return summary
                 except:
                     return None
 
+            # Explain every result concurrently before printing
+            from .aio import gather_limited
+            from .concurrency import deadline
+            with deadline(settings.get_command_deadline()):
+                explanations = asyncio.run(gather_limited(
+                    [get_commit_summary(result['message'], 1 - result['score']) for result in results],
+                    limit=settings.get_llm_max_concurrency()
+                ))
+            summaries = {
+                result['commit_hash']: explanation if isinstance(explanation, str) else None
+                for result, explanation in zip(results, explanations)
+            }
+            
             # Function to format commit info
             def format_commit_info(result, summary: str = None):
                 message = result['message'].split('\n')[0]  # First line only
@@ -1089,6 +1166,10 @@ def search(
                 # Add the main message
                 info.append(f"[bold white]{message}[/bold white]")
                 
+                # Show where file and hunk level matches were found
+                if result.get('files'):
+                    info.append(f"[cyan]{', '.join(result['files'][:3])}[/cyan]")
+                
                 # Add AI summary if available
                 if summary:
                     info.append(f"[dim italic]{summary}[/dim italic]")
@@ -1101,8 +1182,8 @@ def search(
                 for result in high_relevance:
                     date = format_date(parse_date(result['date']))
                     hash_short = result['commit_hash'][:8]
-                    # Get AI summary for high relevance commits
-                    summary = asyncio.run(get_commit_summary(result['message'], 1 - result['score']))
+                    # AI summary for high relevance commits
+                    summary = summaries.get(result['commit_hash'])
                     console.print(Panel(
                         format_commit_info(result, summary=summary),
                         border_style="green",
@@ -1117,8 +1198,8 @@ def search(
                 for result in medium_relevance:
                     date = format_date(parse_date(result['date']))
                     hash_short = result['commit_hash'][:8]
-                    # Get AI summary for medium relevance commits
-                    summary = asyncio.run(get_commit_summary(result['message'], 1 - result['score']))
+                    # AI summary for medium relevance commits
+                    summary = summaries.get(result['commit_hash'])
                     console.print(Panel(
                         format_commit_info(result, summary=summary),
                         border_style="yellow",
@@ -1133,8 +1214,8 @@ def search(
                 for result in low_relevance:
                     date = format_date(parse_date(result['date']))
                     hash_short = result['commit_hash'][:8]
-                    # Get AI summary for low relevance commits
-                    summary = asyncio.run(get_commit_summary(result['message'], 1 - result['score']))
+                    # AI summary for low relevance commits
+                    summary = summaries.get(result['commit_hash'])
                     console.print(Panel(
                         format_commit_info(result, summary=summary),
                         border_style="blue",
@@ -1164,6 +1245,8 @@ def branch_command(
     auto_add: bool = typer.Option(False, "-a", help="Automatically run 'git add .' before operation"),
 ):
     """Create a new branch with an AI-generated name"""
+    from .git_ops import create_branch
+    
     show_welcome_message()
     ensure_openai_configured()
     create_branch(description=description, checkout=not no_checkout, generate=generate, auto_add=auto_add)
@@ -1173,6 +1256,8 @@ def branches_command(
     details: bool = typer.Option(False, "--details", "-d", help="Show AI-generated summary of changes"),
 ):
     """List branches with optional AI-generated summaries"""
+    from .git_ops import list_branches
+    
     show_welcome_message()
     ensure_openai_configured()
     list_branches(show_details=details)
@@ -1185,6 +1270,8 @@ def pr_command(
     no_push: bool = typer.Option(False, "--no-push", help="Don't automatically push branch to GitHub"),
 ):
     """Manage pull requests with AI assistance"""
+    from .github_ops import create_pr, list_prs
+    
     show_welcome_message()
     ensure_openai_configured()
     
@@ -1197,6 +1284,206 @@ def pr_command(
         console.print("Valid actions: create, list")
         sys.exit(1)
 
+@app.command("review")
+def review_command(
+    pr: Optional[int] = typer.Option(None, "--pr", help="PR number to review (default: current branch)"),
+    auto_comment: bool = typer.Option(False, "--auto-comment", help="Post the review to the PR on GitHub"),
+    full: bool = typer.Option(False, "--full", help="Re-review the whole PR instead of only new commits"),
+):
+    """Review code changes with AI assistance"""
+    from .github_ops import review_current_branch, review_pr
+    
+    show_welcome_message()
+    ensure_openai_configured()
+    
+    if pr:
+        review_pr(pr, auto_comment=auto_comment, full=full)
+    else:
+        review_current_branch(auto_comment=auto_comment)
+
+@app.command("daemon")
+def daemon_command(
+    action: str = typer.Argument("status", help="Action to perform: start, stop, status, run"),
+):
+    """Keep models, connections and the search index warm in a background process"""
+    from . import daemon
+    
+    if not daemon.is_supported():
+        console.print("[red]The daemon needs Unix domain sockets, which this platform doesn't support[/red]")
+        sys.exit(1)
+    
+    if action == "start":
+        info = daemon.start()
+        if not info:
+            console.print(Panel(
+                f"[red]The daemon did not start.[/red]\n\nSee [blue]{daemon.LOG_PATH}[/blue] for details.",
+                title="Error",
+                border_style="red"
+            ))
+            sys.exit(1)
+        console.print(f"[green]✓[/green] Sayless daemon running (pid {info['pid']})")
+    elif action == "stop":
+        if daemon.stop():
+            console.print("[green]✓[/green] Sayless daemon stopped")
+        else:
+            console.print("[yellow]Sayless daemon is not running[/yellow]")
+    elif action == "status":
+        info = daemon.status()
+        if info:
+            console.print(f"[green]Sayless daemon running[/green] (pid {info['pid']}, "
+                          f"up {int(info['uptime'])}s, {info['requests']} requests served)")
+        else:
+            console.print("[yellow]Sayless daemon is not running[/yellow]")
+    elif action == "run":
+        # Serve in the foreground, e.g. under a service manager
+        daemon.run_server()
+    else:
+        console.print(f"[red]Unknown action: {action}[/red]")
+        console.print("Valid actions: start, stop, status, run")
+        sys.exit(1)
+
+@app.command("speculate")
+def speculate_command(
+    action: str = typer.Argument("status", help="Action to perform: install, uninstall, watch, run, status"),
+    force: bool = typer.Option(False, "--force", help="Replace an existing post-index-change hook"),
+):
+    """Generate commit messages in the background whenever the staged changes change"""
+    from . import speculative
+    from .hooks import install_hook, uninstall_hook, hooks_dir, is_sayless_hook
+    
+    if not check_git_repo():
+        console.print("[red]Not in a git repository[/red]")
+        sys.exit(1)
+    
+    if action == "install":
+        try:
+            path = install_hook(speculative.HOOK_NAME, speculative.hook_body(), force=force)
+        except ValueError as e:
+            console.print(Panel(f"[red]{str(e)}[/red]", title="Error", border_style="red"))
+            sys.exit(1)
+        console.print(f"[green]✓[/green] Installed [blue]{path}[/blue]")
+        console.print("Commit messages are now generated in the background as you stage changes")
+    elif action == "uninstall":
+        if uninstall_hook(speculative.HOOK_NAME):
+            console.print("[green]✓[/green] Removed the post-index-change hook")
+        else:
+            console.print("[yellow]No sayless post-index-change hook is installed[/yellow]")
+    elif action == "watch":
+        # For setups where hooks can't be installed, e.g. a shared core.hooksPath
+        console.print("[blue]Watching the index for staged changes (Ctrl+C to stop)...[/blue]")
+        try:
+            speculative.watch(on_change=lambda: console.print("[dim]Staged changes changed, generating...[/dim]"))
+        except KeyboardInterrupt:
+            pass
+    elif action == "run":
+        speculative.spawn()
+    elif action == "status":
+        hook = hooks_dir() / speculative.HOOK_NAME
+        console.print(f"Hook: {'[green]installed[/green]' if is_sayless_hook(hook) else '[yellow]not installed[/yellow]'}")
+        key = speculative.staged_key()
+        job = speculative.get_job()
+        if key and speculative.get_message(key):
+            console.print("Message for the staged changes: [green]ready[/green]")
+        elif job and job['key'] == key:
+            console.print(f"Message for the staged changes: [yellow]generating[/yellow] (pid {job['pid']})")
+        else:
+            console.print("Message for the staged changes: [dim]none[/dim]")
+    else:
+        console.print(f"[red]Unknown action: {action}[/red]")
+        console.print("Valid actions: install, uninstall, watch, run, status")
+        sys.exit(1)
+
+@app.command("hooks")
+def hooks_command(
+    action: str = typer.Argument("status", help="Action to perform: install, uninstall, status"),
+    speculate: bool = typer.Option(False, "--speculate", help="Also generate messages in the background while staging"),
+    force: bool = typer.Option(False, "--force", help="Replace existing hooks that sayless didn't install"),
+):
+    """Fill in commit messages for plain `git commit` from a git hook"""
+    from . import speculative
+    from .hooks import COMMIT_MSG_HOOK, commit_msg_hook_body, hooks_dir, install_hook, is_sayless_hook, uninstall_hook
+    
+    if not check_git_repo():
+        console.print("[red]Not in a git repository[/red]")
+        sys.exit(1)
+    
+    if action == "install":
+        hooks = [(COMMIT_MSG_HOOK, commit_msg_hook_body())]
+        if speculate:
+            hooks.append((speculative.HOOK_NAME, speculative.hook_body()))
+        for name, body in hooks:
+            try:
+                path = install_hook(name, body, force=force)
+            except ValueError as e:
+                console.print(Panel(f"[red]{str(e)}[/red]", title="Error", border_style="red"))
+                sys.exit(1)
+            console.print(f"[green]✓[/green] Installed [blue]{path}[/blue]")
+        console.print(f"`git commit` now fills in a generated message, giving up after "
+                      f"{settings.get_hook_timeout():g}s (hook_timeout)")
+    elif action == "uninstall":
+        removed = [name for name in (COMMIT_MSG_HOOK, speculative.HOOK_NAME) if uninstall_hook(name)]
+        if removed:
+            console.print(f"[green]✓[/green] Removed {', '.join(removed)}")
+        else:
+            console.print("[yellow]No sayless hooks are installed[/yellow]")
+    elif action == "status":
+        for name in (COMMIT_MSG_HOOK, speculative.HOOK_NAME):
+            installed = is_sayless_hook(hooks_dir() / name)
+            console.print(f"{name}: {'[green]installed[/green]' if installed else '[yellow]not installed[/yellow]'}")
+    else:
+        console.print(f"[red]Unknown action: {action}[/red]")
+        console.print("Valid actions: install, uninstall, status")
+        sys.exit(1)
+
+@app.command("index")
+def index_command(
+    action: str = typer.Argument("status", help="Action to perform: status, migrate"),
+):
+    """Show search index versions, or migrate to the configured embedding model"""
+    from . import embeddings
+
+    if action == "status":
+        configured = embeddings.version_id(embeddings.embedding_identity())
+        searched = embeddings.search_version()
+        meta = embeddings.read_meta(configured) or {}
+        console.print(f"Configured index: [blue]{configured}[/blue]")
+        console.print(f"Searched index: [blue]{searched}[/blue]")
+        if searched != configured:
+            state = 'running' if embeddings.migration_running() else 'not running (sl index migrate)'
+            console.print(f"Migration: {meta.get('migrated', 0)}/{meta.get('total', '?')} commits, {state}")
+            if meta.get('error'):
+                console.print(f"[red]{meta['error']}[/red]")
+            if meta.get('failed'):
+                console.print(f"[yellow]{meta['failed']} commits failed to re-embed and are retried on the next run:[/yellow]")
+                for failure in meta.get('failures', []):
+                    console.print(f"  [dim]{failure['hash'][:8]}[/dim] {failure['error']}")
+    elif action == "migrate":
+        if not embeddings.needs_migration():
+            console.print("[green]✓[/green] The configured index is complete")
+            return
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console
+        ) as progress:
+            task = progress.add_task("Re-embedding indexed commits...", total=None)
+            added = embeddings.migrate(on_batch=lambda done, total: progress.update(
+                task, description=f"Re-embedding indexed commits... {done}/{total}"))
+        if embeddings.needs_migration():
+            meta = embeddings.read_meta(embeddings.version_id(embeddings.embedding_identity())) or {}
+            console.print(Panel(
+                f"[yellow]Migrated {added} commits, but {meta.get('error') or str(meta.get('failed', 0)) + ' failed'}.\n"
+                "Searches keep using the previous index; see sl index status and run sl index migrate to retry.[/yellow]",
+                title="Migration Incomplete",
+                border_style="yellow"
+            ))
+            sys.exit(1)
+        console.print(f"[green]✓[/green] Migrated {added} commits; searches now use the new index")
+    else:
+        console.print(f"[red]Unknown action: {action}[/red]")
+        console.print("Valid actions: status, migrate")
+        sys.exit(1)
+
 if __name__ == "__main__":
     app()
 
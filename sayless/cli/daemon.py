@@ -0,0 +1,313 @@
+"""
+Optional background daemon for Sayless.
+`sayless daemon start` runs a process that keeps the provider clients,
+connection pools and the search index in memory and serves requests over
+a Unix domain socket (~/.sayless/daemon.sock). CLI commands talk to it
+when it is running and fall back to doing the work in-process when not.
+
+The protocol is one JSON request line per connection, answered with JSON
+lines: {"chunk": ...} while streaming, then {"result": ...} or {"error": ...}.
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from .ai_providers import AIProvider
+from .config import get_config
+
+settings = get_config()
+
+SOCKET_PATH = Path.home() / '.sayless' / 'daemon.sock'
+PID_PATH = Path.home() / '.sayless' / 'daemon.pid'
+LOG_PATH = Path.home() / '.sayless' / 'daemon.log'
+LINE_LIMIT = 32 * 1024 * 1024  # embedding vectors are sent as single JSON lines
+START_TIMEOUT = 10  # seconds to wait for a started daemon to answer
+NO_DAEMON_ENV = 'SAYLESS_NO_DAEMON'
+
+
+class DaemonUnavailable(ConnectionError):
+    """Raised when the daemon can't be reached"""
+
+
+def is_supported() -> bool:
+    """Check whether this platform has Unix domain sockets"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def is_enabled() -> bool:
+    """Check whether CLI commands should try the daemon"""
+    return is_supported() and not os.getenv(NO_DAEMON_ENV) and SOCKET_PATH.exists()
+
+
+async def _request(request: Dict) -> AsyncIterator[Dict]:
+    """Send a request to the daemon and yield its response messages"""
+    import asyncio
+
+    try:
+        reader, writer = await asyncio.open_unix_connection(str(SOCKET_PATH), limit=LINE_LIMIT)
+    except (OSError, ValueError) as e:
+        raise DaemonUnavailable(str(e))
+    try:
+        writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Sayless daemon closed the connection")
+            message = json.loads(line)
+            if 'error' in message:
+                raise RuntimeError(message['error'])
+            yield message
+            if 'result' in message:
+                return
+    finally:
+        writer.close()
+
+
+async def call(op: str, **params):
+    """Send a request to the daemon and return its result"""
+    async for message in _request({'op': op, **params}):
+        if 'result' in message:
+            return message['result']
+
+
+def call_sync(op: str, **params):
+    """Send a request to the daemon from synchronous code"""
+    from .aio import run_sync
+    return run_sync(call(op, **params))
+
+
+class DaemonProvider(AIProvider):
+    """Forwards model requests to the daemon, or to the local provider when it isn't running"""
+
+    def __init__(self, local_factory):
+        """Initialize with a function that creates the in-process provider"""
+        self._local_factory = local_factory
+        self._local = None
+        self._available = True
+
+    @property
+    def local(self) -> AIProvider:
+        if self._local is None:
+            self._local = self._local_factory()
+        return self._local
+
+    @property
+    def name(self) -> str:
+        return self.local.name if self._local is not None else "Sayless daemon"
+
+    def _endpoint(self) -> str:
+        return 'daemon'
+
+    async def _agenerate(self, prompt: str, model: str, **options) -> str:
+        return await self.agenerate(prompt, model, **options)
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        return await self.aembed(text, model)
+
+    async def agenerate(self, prompt: str, model: str, **options) -> str:
+        if self._available:
+            try:
+                return await call('generate', prompt=prompt, model=model, options=options)
+            except DaemonUnavailable:
+                self._available = False
+        return await self.local.agenerate(prompt, model, **options)
+
+    async def astream(self, prompt: str, model: str, **options) -> AsyncIterator[str]:
+        if self._available:
+            try:
+                async for message in _request({'op': 'stream', 'prompt': prompt, 'model': model, 'options': options}):
+                    if 'chunk' in message:
+                        yield message['chunk']
+                return
+            except DaemonUnavailable:
+                self._available = False
+        async for chunk in self.local.astream(prompt, model, **options):
+            yield chunk
+
+    async def aembed(self, text: str, model: str = None) -> List[float]:
+        if self._available:
+            try:
+                return await call('embed', text=text, model=model)
+            except DaemonUnavailable:
+                self._available = False
+        return await self.local.aembed(text, model)
+
+
+def search(query: str, limit: int) -> Optional[List[Dict]]:
+    """Search commits with the daemon's in-memory index, or None when it isn't running"""
+    if not is_enabled():
+        return None
+    try:
+        return call_sync('search', query=query, limit=limit)
+    except DaemonUnavailable:
+        return None
+
+
+class DaemonServer:
+    def __init__(self):
+        """Initialize the daemon state; the provider and index are built on first use"""
+        self.provider = None
+        self.embeddings = None
+        self.server = None
+        self.config_mtime = None
+        self.started = time.time()
+        self.requests = 0
+
+    def _refresh(self) -> None:
+        """Rebuild the provider when the config file changed since it was built"""
+        try:
+            mtime = os.path.getmtime(settings.config_file)
+        except OSError:
+            mtime = None
+        if self.provider is None or mtime != self.config_mtime:
+            from .router import create_local_provider
+            settings.config = None  # re-read the file
+            self.provider = create_local_provider()
+            self.embeddings = None
+            self.config_mtime = mtime
+
+    def _index(self):
+        """Get the search index, reloading it when another process wrote it"""
+        from .embeddings import get_search_index, search_version
+
+        # Switch over once a migration to the configured version completes
+        if self.embeddings is None or self.embeddings.version != search_version():
+            self.embeddings = get_search_index()
+        else:
+            self.embeddings.reload_if_changed()
+        return self.embeddings
+
+    async def handle(self, reader, writer) -> None:
+        """Serve one request"""
+        async def send(message: Dict) -> None:
+            writer.write(json.dumps(message).encode('utf-8') + b'\n')
+            await writer.drain()
+
+        try:
+            request = json.loads(await reader.readline())
+            op = request.get('op')
+            self.requests += 1
+            self._refresh()
+            if op == 'ping':
+                await send({'result': {'pid': os.getpid(), 'uptime': time.time() - self.started,
+                                       'requests': self.requests}})
+            elif op == 'generate':
+                await send({'result': await self.provider.agenerate(request['prompt'], request['model'],
+                                                                    **request.get('options', {}))})
+            elif op == 'stream':
+                async for chunk in self.provider.astream(request['prompt'], request['model'],
+                                                         **request.get('options', {})):
+                    await send({'chunk': chunk})
+                await send({'result': None})
+            elif op == 'embed':
+                await send({'result': list(map(float, await self.provider.aembed(request['text'], request.get('model'))))})
+            elif op == 'search':
+                await send({'result': await self._index().search_commits(request['query'], request.get('limit', 5))})
+            elif op == 'shutdown':
+                await send({'result': True})
+                import asyncio
+                asyncio.get_running_loop().call_soon(self.stop)
+            else:
+                await send({'error': f"Unknown request: {op}"})
+        except Exception as e:
+            try:
+                await send({'error': str(e) or type(e).__name__})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    def stop(self) -> None:
+        """Stop serving"""
+        if self.server is not None:
+            self.server.close()
+
+    async def serve(self) -> None:
+        """Listen on the socket until stopped"""
+        import asyncio
+
+        SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+        if SOCKET_PATH.exists():
+            SOCKET_PATH.unlink()
+        # Bind with a private umask: a chmod afterwards leaves a window where other users could connect
+        umask = os.umask(0o077)
+        try:
+            self.server = await asyncio.start_unix_server(self.handle, path=str(SOCKET_PATH), limit=LINE_LIMIT)
+        finally:
+            os.umask(umask)
+        os.chmod(SOCKET_PATH, 0o600)
+        PID_PATH.write_text(str(os.getpid()))
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+        try:
+            async with self.server:
+                await self.server.wait_closed()
+        finally:
+            for path in (SOCKET_PATH, PID_PATH):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def run_server() -> None:
+    """Run the daemon in the current process"""
+    import asyncio
+
+    # Providers created in here must not route back through the daemon
+    os.environ[NO_DAEMON_ENV] = '1'
+    asyncio.run(DaemonServer().serve())
+
+
+def status() -> Optional[Dict]:
+    """Get the running daemon's pid, uptime and request count, or None"""
+    if not is_supported() or not SOCKET_PATH.exists():
+        return None
+    try:
+        return call_sync('ping')
+    except (DaemonUnavailable, ConnectionError, RuntimeError):
+        return None
+
+
+def start() -> Optional[Dict]:
+    """Start the daemon in the background and wait until it answers"""
+    if status():
+        return status()
+    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_PATH, 'a') as log:
+        subprocess.Popen(
+            [sys.executable, '-m', 'sayless.cli.daemon'],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+            start_new_session=True,
+            env={**os.environ, NO_DAEMON_ENV: '1'}
+        )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        info = status()
+        if info:
+            return info
+    return None
+
+
+def stop() -> bool:
+    """Ask the daemon to shut down"""
+    if not status():
+        return False
+    try:
+        call_sync('shutdown')
+    except (ConnectionError, RuntimeError):
+        pass
+    return True
+
+
+if __name__ == "__main__":
+    run_server()
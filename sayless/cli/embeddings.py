@@ -1,52 +1,261 @@
 import os
+import re
+import sys
 import json
+import subprocess
 import numpy as np
 import faiss
 import hashlib
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from rich.console import Console
 import pickle
-from .config import Config
-import asyncio
-import aiohttp
-import requests
-from openai import AsyncOpenAI, OpenAI
+from .config import NO_SETUP_ENV, get_config
 from datetime import datetime
-from .ai_providers import OpenAIProvider
+from .router import create_provider, create_embedding_provider
+from .file_summaries import split_diff
+from .local_embeddings import PROVIDER_EMBEDDING_MODELS, create_embedder, embedding_identity
+from . import vector_index
+from .aio import run_sync
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers aren't serialized
+    fcntl = None
 
 console = Console()
-settings = Config()
+settings = get_config()
+
+MAX_TAGS = 5
+MAX_TAG_LENGTH = 30
+
+EMBEDDINGS_DIR = Path.home() / '.sayless' / 'embeddings'
+ACTIVE_PATH = EMBEDDINGS_DIR / 'active.json'  # the complete index that searches use
+LEGACY_FILES = ('faiss_index.idx', 'commits.pkl', 'dimension.txt', 'hashing_df.npy')
+LEGACY_PROVIDERS = {3072: 'openai', 4096: 'ollama'}  # unversioned indexes held the provider's native vectors
+MIGRATION_BATCH = 64  # commits re-embedded between two saves of a migrating index
+MAX_RECORDED_FAILURES = 20  # failed commits listed in version.json; all are retried on the next run
+
+GRANULARITIES = ('commit', 'file', 'hunk')
+MAX_FILE_CHUNK = 4000  # characters of a file's diff in one vector; bigger files are split by hunks
+MAX_HUNK_GROUP = 1500  # characters of adjacent hunks grouped into one vector
+MAX_CHUNKS = 64  # vectors per commit, so vendored or generated files can't flood the index
+SEARCH_OVERSAMPLE = 10  # file or hunk vectors searched per commit result
+SUM_POOL_RATIO = 0.8  # sum pooling only adds hits at least this similar, relative to the best hit
+SUM_POOL_HITS = 3  # most hits sum pooling adds per commit
+_HUNK = re.compile(r'^(?=@@ )', re.MULTILINE)
+
+def parse_tags(response: str) -> Optional[List[str]]:
+    """Get the tags from a model response, or None if it doesn't look like a tag list"""
+    response = response.strip()
+    if response.lower().startswith('tags:'):
+        response = response[5:]
+    tags = [tag.strip().strip('.#"\'').lower() for tag in response.replace('\n', ',').split(',')]
+    tags = [tag for tag in tags if tag]  # Remove empty tags
+    if not tags or any(len(tag) > MAX_TAG_LENGTH for tag in tags):
+        return None
+    return tags[:MAX_TAGS]
+
+def group_hunks(file_diff: str, limit: int) -> List[str]:
+    """Split one file's diff into groups of adjacent hunks of at most about limit characters"""
+    header, *hunks = _HUNK.split(file_diff)
+    if not hunks:
+        return [file_diff[:limit]]
+    groups, current = [], ''
+    for hunk in hunks:
+        if current and len(current) + len(hunk) > limit:
+            groups.append(current)
+            current = ''
+        current += hunk
+    groups.append(current)
+    # A single huge hunk is cut rather than sent whole
+    return [group[:limit] for group in groups]
+
+
+def chunk_commit(message: str, diff: str, granularity: str) -> List[Tuple[Optional[str], str]]:
+    """Get the (file, text) pieces of a commit that are embedded as separate vectors"""
+    if granularity not in GRANULARITIES[1:]:
+        return [(None, f"Message: {message}\n\nChanges:\n{diff}")]
+    # index_commit passes "Stats:...Details:<diff>"; only the diff is split
+    details = diff.split('\n\nDetails:\n', 1)[-1]
+    limit = MAX_HUNK_GROUP if granularity == 'hunk' else MAX_FILE_CHUNK
+    chunks = []
+    for file in split_diff(details):
+        parts = [file['diff']] if len(file['diff']) <= limit else group_hunks(file['diff'], limit)
+        # The message gives every piece the intent of the change
+        chunks.extend((file['path'], f"Message: {message}\n\nFile: {file['path']}\n\nChanges:\n{part}")
+                      for part in parts)
+    return chunks[:MAX_CHUNKS] or [(None, f"Message: {message}")]
+
+
+def version_id(identity: Dict) -> str:
+    """Get the directory name of the index for an embedding identity"""
+    name = f"{identity['provider'] or identity['backend']}-{os.path.basename(str(identity['model']))}-{identity['dimension'] or 'native'}"
+    if identity.get('granularity'):
+        name += f"-{identity['granularity']}"
+    digest = hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return f"{re.sub(r'[^A-Za-z0-9._-]+', '_', name)[:60]}-{digest}"
+
+
+def read_meta(version: Optional[str]) -> Optional[Dict]:
+    """Get an index version's identity and migration state"""
+    if not version:
+        return None
+    try:
+        with open(EMBEDDINGS_DIR / version / 'version.json', 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_active_version() -> Optional[str]:
+    """Get the version searches use while another one is being migrated to"""
+    try:
+        with open(ACTIVE_PATH, 'r') as f:
+            return json.load(f)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def set_active_version(version: str) -> None:
+    """Make a complete version the one searches use"""
+    EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = ACTIVE_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps({'version': version}))
+    os.replace(tmp_path, ACTIVE_PATH)
+
+
+def search_version() -> str:
+    """Get the version searches should use: the configured one once complete, else the active one"""
+    target = version_id(embedding_identity())
+    meta = read_meta(target)
+    active = get_active_version()
+    if (meta and meta.get('complete')) or not active or active == target or read_meta(active) is None:
+        return target
+    return active
+
+
+def legacy_identity() -> Optional[Dict]:
+    """Get the embedding identity an index from before versioning was built with, told by its vector size"""
+    try:
+        dimension = faiss.read_index(str(EMBEDDINGS_DIR / 'faiss_index.idx')).d
+    except Exception:
+        try:
+            dimension = int((EMBEDDINGS_DIR / 'dimension.txt').read_text().strip())
+        except (OSError, ValueError):
+            return None
+    provider = LEGACY_PROVIDERS.get(dimension)
+    return {'backend': 'provider', 'provider': provider, 'model': PROVIDER_EMBEDDING_MODELS.get(provider),
+            'dimension': None if provider else dimension}
+
+
+def needs_migration() -> bool:
+    """Check whether the configured version is still being built from the active one"""
+    return search_version() != version_id(embedding_identity())
+
 
 class CommitEmbeddings:
-    def __init__(self):
-        self.cache_dir = Path.home() / '.sayless' / 'embeddings'
+    def __init__(self, identity: Dict = None):
+        """Open the index of an embedding identity, by default the configured one"""
+        configured = identity is None
+        self.identity = identity or embedding_identity()
+        self.version = version_id(self.identity)
+        self.cache_dir = EMBEDDINGS_DIR / self.version
+        if configured:
+            self._adopt_legacy_index()
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         self.index_path = self.cache_dir / 'faiss_index.idx'
         self.commits_path = self.cache_dir / 'commits.pkl'
         self.dimension_path = self.cache_dir / 'dimension.txt'
+        self.meta_path = self.cache_dir / 'version.json'
         
-        # Initialize OpenAI clients
-        api_key = settings.get_openai_api_key()
-        if api_key:
-            self.async_client = AsyncOpenAI(api_key=api_key)
-            self.sync_client = OpenAI(api_key=api_key)
+        # Tags come from the configured provider; embeddings too unless a local backend is configured
+        if configured:
+            self.provider = create_provider()
+        else:
+            self.provider = create_embedding_provider(self.identity['provider']) if self.identity['provider'] else None
+        self.embedder = create_embedder(self.identity, self.provider, self.cache_dir)
+        self.tag_commits = settings.get_index_tags()
+        self.precision = settings.get_embedding_precision()
+        self.target_dimension = self.identity['dimension']
+        self.granularity = self.identity.get('granularity', 'commit')
+        self.repo = None
+        self.meta = self._load_meta()
         
         # Load or determine dimension
         self.dimension = self.load_or_determine_dimension()
         
         self.index = None
         self.commits_data = {}
+        self.index_mtime = None
+        self._writing = 0
         self.load_or_create_index()
 
+    def _adopt_legacy_index(self) -> None:
+        """Move an index from before versioning into the version of the provider that built it"""
+        if not (EMBEDDINGS_DIR / 'faiss_index.idx').exists():
+            return
+        identity = legacy_identity()
+        if identity is None:
+            return
+        version = version_id(identity)
+        legacy_dir = EMBEDDINGS_DIR / version
+        if legacy_dir.exists():
+            return
+        legacy_dir.mkdir(parents=True)
+        for name in LEGACY_FILES:
+            if (EMBEDDINGS_DIR / name).exists():
+                os.replace(EMBEDDINGS_DIR / name, legacy_dir / name)
+        meta = {'identity': identity, 'complete': True, 'created': datetime.now().isoformat()}
+        (legacy_dir / 'version.json').write_text(json.dumps(meta))
+        # Searches keep using it; when another model is configured, the migration re-embeds its commits
+        set_active_version(version)
+
+    def _write_meta(self, meta: Dict) -> None:
+        tmp_path = self.cache_dir / 'version.json.tmp'
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self.cache_dir / 'version.json')
+
+    def _load_meta(self) -> Dict:
+        """Load the version's state, starting a new version as complete when there is nothing to migrate"""
+        meta = read_meta(self.version)
+        if meta is None:
+            active = get_active_version()
+            complete = active is None or read_meta(active) is None
+            meta = {'identity': self.identity, 'complete': complete, 'created': datetime.now().isoformat()}
+            self._write_meta(meta)
+        if meta.get('complete') and get_active_version() != self.version:
+            set_active_version(self.version)
+        return meta
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.meta.get('complete'))
+
+    def mark_complete(self) -> None:
+        """Make this version the one searches use"""
+        self.meta['complete'] = True
+        self._write_meta(self.meta)
+        set_active_version(self.version)
+
     def load_or_determine_dimension(self) -> int:
         """Load saved dimension or determine based on provider"""
+        local_dimension = getattr(self.embedder, 'dimension', None)
+        if local_dimension:
+            # Local backends know their vector size up front
+            self.dimension_path.write_text(str(local_dimension))
+            return local_dimension
+        if self.target_dimension:
+            # Provider vectors are reduced to the configured size
+            self.dimension_path.write_text(str(self.target_dimension))
+            return self.target_dimension
         if self.dimension_path.exists():
             return int(self.dimension_path.read_text().strip())
         
         # Default dimensions for different providers
-        if settings.get_provider() == 'openai':
+        if self.identity['provider'] == 'openai':
             dimension = 3072  # text-embedding-3-large dimension
         else:
             dimension = 4096  # Default Ollama dimension
@@ -63,56 +272,101 @@ class CommitEmbeddings:
                 with open(self.commits_path, 'rb') as f:
                     self.commits_data = pickle.load(f)
                 
+                self.index_mtime = self._index_mtime()
+                
                 # Check if dimensions match
                 if self.index.d != self.dimension:
-                    self._create_new_index()
+                    if self.index.ntotal:
+                        # Keep indexed commits; the stored vectors tell the real size
+                        self.dimension = self.index.d
+                        self.dimension_path.write_text(str(self.dimension))
+                    else:
+                        self._create_new_index()
+                elif not vector_index.matches(self.index, self.precision):
+                    # Stored vectors are re-encoded, not re-embedded
+                    self.index = vector_index.convert(self.index, self.precision)
+                    self.save_index()
             except Exception:
                 self._create_new_index()
         else:
             self._create_new_index()
 
+    def _index_mtime(self) -> Optional[float]:
+        """Get when the index was last written to disk"""
+        try:
+            return self.commits_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        """Reload the index if another process wrote it since it was loaded"""
+        if self._index_mtime() != self.index_mtime:
+            self.load_or_create_index()
+
+    @contextmanager
+    def writing(self):
+        """Hold the version's write lock, starting from what other processes saved before it"""
+        if self._writing or fcntl is None:
+            self._writing += 1
+            try:
+                yield self
+            finally:
+                self._writing -= 1
+            return
+        # `sl search --index-all` and a background migration may build the same version
+        with open(self.cache_dir / 'write.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._writing += 1
+            try:
+                self.reload_if_changed()
+                yield self
+            finally:
+                self._writing -= 1
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
     def _create_new_index(self):
         """Create a new FAISS index"""
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = vector_index.create_index(self.dimension, self.precision)
         self.commits_data = {}
         self.save_index()
 
     def save_index(self):
         """Save the FAISS index and commits data"""
+        self.index = vector_index.compact(self.index, self.precision)
         faiss.write_index(self.index, str(self.index_path))
         with open(self.commits_path, 'wb') as f:
             pickle.dump(self.commits_data, f)
+        if hasattr(self.embedder, 'save'):
+            self.embedder.save()
+        self.index_mtime = self._index_mtime()
 
-    async def get_embedding_openai(self, text: str) -> np.ndarray:
-        """Get embedding using OpenAI's API"""
-        response = await self.async_client.embeddings.create(
-            input=text,
-            model="text-embedding-3-large"
-        )
-        embedding = np.array(response.data[0].embedding, dtype=np.float32)
-        
-        if embedding.shape[0] != self.dimension:
-            self.dimension = embedding.shape[0]
-            self.dimension_path.write_text(str(self.dimension))
-            self._create_new_index()
-        
-        return embedding
+    def _repo(self) -> Optional[str]:
+        """Get the top level of the repository commits are indexed from"""
+        if self.repo is None:
+            try:
+                self.repo = subprocess.run(['git', 'rev-parse', '--show-toplevel'], capture_output=True,
+                                           text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                self.repo = ''
+        return self.repo or None
 
-    def get_embedding_local(self, text: str) -> np.ndarray:
-        """Get embedding using local model (Ollama)"""
-        response = requests.post(
-            'http://localhost:11434/api/embeddings',
-            json={
-                'model': 'llama2',
-                'prompt': text
-            },
-            timeout=30
-        )
-        
-        response.raise_for_status()
-        embedding = np.array(response.json()['embedding'], dtype=np.float32)
+    async def get_embedding(self, text: str) -> np.ndarray:
+        """Get an embedding from the configured backend"""
+        embedding = np.array(await self.embedder.aembed(text), dtype=np.float32)
+        if self.target_dimension and embedding.shape[0] > self.target_dimension:
+            # text-embedding-3 vectors can simply be shortened; others are projected
+            truncate = self.identity['backend'] == 'provider' and self.identity['provider'] == 'openai'
+            embedding = vector_index.reduce_dimension(embedding, self.target_dimension, truncate=truncate)
+        elif self.precision != 'float32' or self.granularity != 'commit':
+            # Quantized storage and pooling file or hunk matches assume unit vectors
+            embedding = vector_index.normalize(embedding)
         
         if embedding.shape[0] != self.dimension:
+            if self.index.ntotal:
+                # Never drop indexed commits; a different model gets its own version
+                raise ValueError(f"Embedding size changed from {self.dimension} to {embedding.shape[0]} "
+                                 f"within one index version ({self.version})")
+            # The first vector tells the provider's real size
             self.dimension = embedding.shape[0]
             self.dimension_path.write_text(str(self.dimension))
             self._create_new_index()
@@ -120,104 +374,254 @@ class CommitEmbeddings:
         return embedding
 
     async def add_commit(self, commit_hash: str, commit_message: str, commit_diff: str, 
-                        date: str, tags: List[str] = None):
-        """Add a commit to the index"""
-        # Combine commit information for embedding
-        commit_text = f"Message: {commit_message}\n\nChanges:\n{commit_diff}"
+                        date: str, tags: List[str] = None, save: bool = True, repo: str = None):
+        """Add a commit to the index, writing it to disk unless save is False"""
+        import asyncio
+        
+        # The whole commit, or its files or hunk groups, each with the commit message
+        chunks = chunk_commit(commit_message, commit_diff, self.granularity)
         
         try:
-            # Get embedding based on provider
-            if settings.get_provider() == 'openai':
-                embedding = await self.get_embedding_openai(commit_text)
+            embeddings = await asyncio.gather(*[self.get_embedding(text) for _, text in chunks])
+            if save:
+                with self.writing():
+                    self._store_commit(commit_hash, commit_message, date, tags, repo, chunks, embeddings)
+                    self.save_index()
             else:
-                embedding = await asyncio.get_event_loop().run_in_executor(
-                    None, self.get_embedding_local, commit_text
-                )
-            
-            # Add to FAISS index
-            self.index.add(embedding.reshape(1, -1))
-            
-            # Store commit data
-            commit_id = self.index.ntotal - 1
-            self.commits_data[commit_id] = {
-                'hash': commit_hash,
-                'message': commit_message,
-                'date': date,
-                'tags': tags or []
-            }
-            
-            # Save updated index
-            self.save_index()
+                # Bulk indexing holds the write lock and saves once at the end
+                self._store_commit(commit_hash, commit_message, date, tags, repo, chunks, embeddings)
             
         except Exception as e:
             console.print(f"[red]Failed to add commit {commit_hash}: {str(e)}[/red]")
             raise
 
+    def _store_commit(self, commit_hash: str, commit_message: str, date: str, tags: Optional[List[str]],
+                      repo: Optional[str], chunks: List[Tuple[Optional[str], str]], embeddings: List[np.ndarray]):
+        """Add a commit's vectors to the index in memory"""
+        # Add to FAISS index
+        first_id = self.index.ntotal
+        self.index.add(np.stack(embeddings))
+        if hasattr(self.embedder, 'observe'):
+            for embedding in embeddings:
+                self.embedder.observe(embedding)
+        
+        # Store commit data; every vector maps back to its commit
+        commit = {
+            'hash': commit_hash,
+            'message': commit_message,
+            'date': date,
+            'tags': tags or [],
+            'repo': repo or self._repo()  # lets a migration re-embed it from any directory
+        }
+        for offset, (path, _) in enumerate(chunks):
+            self.commits_data[first_id + offset] = {**commit, 'file': path} if path else commit
+
     async def search_commits(self, query: str, k: int = 5) -> List[Dict]:
         """Search for similar commits"""
         try:
             # Get query embedding
-            if settings.get_provider() == 'openai':
-                query_embedding = await self.get_embedding_openai(query)
-            else:
-                query_embedding = await asyncio.get_event_loop().run_in_executor(
-                    None, self.get_embedding_local, query
-                )
+            query_embedding = await self.get_embedding(query)
+            if hasattr(self.embedder, 'weight_query'):
+                query_embedding = self.embedder.weight_query(query_embedding)
             
-            # Search in FAISS index
-            D, I = self.index.search(query_embedding.reshape(1, -1), k)
+            # Search in FAISS index; file and hunk vectors are oversampled, several can share a commit
+            searched = k if self.granularity == 'commit' else k * SEARCH_OVERSAMPLE
+            D, I = vector_index.search(self.index, query_embedding.reshape(1, -1), searched)
             
-            # Get commit details
-            results = []
+            # Get commit details, pooling the matches of each commit
+            results = {}
             for i, idx in enumerate(I[0]):
                 if idx != -1 and idx in self.commits_data:  # -1 means no result
                     commit = self.commits_data[idx]
-                    results.append({
-                        'score': float(D[0][i]),
+                    result = results.setdefault(commit['hash'], {
+                        'score': float(D[0][i]),  # the closest match, as with whole commits
                         'commit_hash': commit['hash'],
                         'message': commit['message'],
                         'date': commit['date'],
-                        'tags': commit['tags']
+                        'tags': commit['tags'],
+                        'files': [],
+                        'similarities': []
                     })
+                    if commit.get('file') and commit['file'] not in result['files']:
+                        result['files'].append(commit['file'])
+                    # File and hunk vectors are unit length, so squared L2 distance is 2 - 2 * cosine similarity
+                    result['similarities'].append(1 - float(D[0][i]) / 2)
             
-            return results
+            results = list(results.values())
+            if settings.get_search_pooling() == 'sum' and results:
+                # Commits that match closely in several places rank above a single close match;
+                # weak hits are left out so a commit's many unrelated pieces can't outweigh it
+                threshold = SUM_POOL_RATIO * max(results[0]['similarities'][0], 0.0)
+                for result in results:
+                    close = [similarity for similarity in result['similarities'] if similarity >= threshold]
+                    result['pooled'] = sum(close[:SUM_POOL_HITS])
+                results.sort(key=lambda result: (result['pooled'], result['similarities'][0]), reverse=True)
+            for result in results:
+                result.pop('pooled', None)
+                del result['similarities']
+            return results[:k]
         
         except Exception as e:
             console.print(f"[red]Failed to search commits: {str(e)}[/red]")
             raise
 
-    def get_commit_tags(self, commit_message: str, diff: str) -> List[str]:
+    async def aget_commit_tags(self, commit_message: str, diff: str) -> List[str]:
         """Generate tags for a commit using LLM"""
         try:
-            provider = settings.get_provider()
-            if provider == 'openai':
-                response = self.sync_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that generates relevant tags for git commits. Generate up to 5 concise tags that capture the key aspects of the changes."},
-                        {"role": "user", "content": f"Generate tags for this commit:\n\nMessage: {commit_message}\n\nChanges:\n{diff}"}
-                    ],
-                    temperature=0.3,
-                    max_tokens=50
-                )
-                tags_text = response.choices[0].message.content
-            else:
-                response = requests.post(
-                    'http://localhost:11434/api/generate',
-                    json={
-                        'model': 'llama2',
-                        'prompt': f"Generate up to 5 concise tags for this git commit, separated by commas:\n\nMessage: {commit_message}\n\nChanges:\n{diff}\n\nTags:",
-                        'stream': False
-                    },
-                    timeout=30
-                )
-                response.raise_for_status()
-                tags_text = response.json()['response']
-            
-            # Process tags
-            tags = [tag.strip().lower() for tag in tags_text.split(',')]
-            return [tag for tag in tags if tag]  # Remove empty tags
+            tags = await self.provider.acascade(
+                f"Generate up to 5 concise tags for this git commit, separated by commas:\n\nMessage: {commit_message}\n\nChanges:\n{diff}\n\nTags:",
+                settings.get_task_models('commit_tags'),
+                parse_tags,
+                system="You are a helpful assistant that generates relevant tags for git commits. Generate up to 5 concise tags that capture the key aspects of the changes.",
+                max_tokens=50,
+                temperature=0.3
+            )
+            return tags or []
             
         except Exception as e:
             console.print(f"[yellow]Failed to generate tags: {str(e)}[/yellow]")
-            return []  # Return empty list if tag generation fails 
\ No newline at end of file
+            return []  # Return empty list if tag generation fails
+
+    def get_commit_tags(self, commit_message: str, diff: str) -> List[str]:
+        """Generate tags for a commit using LLM"""
+        return run_sync(self.aget_commit_tags(commit_message, diff))
+
+
+def get_search_index() -> CommitEmbeddings:
+    """Get the index searches use, the previous version while the configured one is migrating"""
+    version = search_version()
+    meta = read_meta(version)
+    if version != version_id(embedding_identity()) and meta:
+        try:
+            return CommitEmbeddings(meta['identity'])
+        except Exception as e:
+            console.print(f"[yellow]Couldn't open the previous index, searching the new one: {str(e)}[/yellow]")
+    return CommitEmbeddings()
+
+
+def _migration_pid_path() -> Path:
+    return EMBEDDINGS_DIR / version_id(embedding_identity()) / 'migrate.pid'
+
+
+def migration_running() -> bool:
+    """Check whether a background migration is building the configured version"""
+    try:
+        pid = int(_migration_pid_path().read_text())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def start_migration() -> bool:
+    """Start re-embedding the active version's commits into the configured version in the background"""
+    if not needs_migration() or migration_running():
+        return False
+    subprocess.Popen(
+        [sys.executable, '-m', 'sayless.cli.embeddings', 'migrate'],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        env={**os.environ, NO_SETUP_ENV: '1'}
+    )
+    return True
+
+
+def _commit_text(commit_hash: str, repo: Optional[str]) -> Tuple[str, str]:
+    """Get a commit's message and diff the way `sl search --index-all` embeds them"""
+    git = ['git'] + (['-C', repo] if repo else [])
+
+    def show(*args: str) -> str:
+        return subprocess.run(git + ['show', *args, commit_hash], capture_output=True, text=True,
+                              check=True).stdout.strip()
+
+    message = show('-s', '--format=%B')
+    diff = f"Stats:\n{show('--stat')}\n\nDetails:\n{show('--no-color', '--format=')}"
+    return message, diff
+
+
+async def amigrate(batch_size: int = MIGRATION_BATCH, on_batch=None) -> int:
+    """Re-embed the active version's commits into the configured version; returns how many were added"""
+    import asyncio
+    from .aio import gather_limited
+
+    source_version = get_active_version()
+    source = read_meta(source_version)
+    target = CommitEmbeddings()
+    if source is None or source_version == target.version or target.complete:
+        return 0
+    try:
+        with open(EMBEDDINGS_DIR / source_version / 'commits.pkl', 'rb') as f:
+            # File and hunk indexes have several vectors per commit
+            commits = list({commit['hash']: commit for commit in pickle.load(f).values()}.values())
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        # Searches stay on the previous index; an empty one must not replace it
+        target.meta['error'] = f"Couldn't read the previous index: {str(e)}"
+        target._write_meta(target.meta)
+        return 0
+
+    def indexed() -> set:
+        return {commit['hash'] for commit in target.commits_data.values()}
+
+    sources = {commit['hash'] for commit in commits}
+    done = indexed()
+    pending = [commit for commit in commits if commit['hash'] not in done]
+    target.meta['total'] = len(commits)
+    loop = asyncio.get_running_loop()
+
+    async def migrate_one(commit: Dict) -> bool:
+        message, diff = await loop.run_in_executor(None, _commit_text, commit['hash'], commit.get('repo'))
+        # Stored tags are kept, so migrating makes no model calls besides embeddings
+        await target.add_commit(commit['hash'], message, diff, commit['date'], commit['tags'], save=False,
+                                repo=commit.get('repo'))
+        return True
+
+    added = 0
+    failures = []
+    for start in range(0, len(pending), batch_size):
+        # The lock is released between batches so other writers don't wait for the whole migration
+        with target.writing():
+            # Another writer, such as `sl search --index-all`, may have added some of these meanwhile
+            done = indexed()
+            batch = [commit for commit in pending[start:start + batch_size] if commit['hash'] not in done]
+            results = await gather_limited([migrate_one(commit) for commit in batch],
+                                           limit=settings.get_llm_max_concurrency(), return_exceptions=True)
+            added += sum(1 for result in results if result is True)
+            failures.extend({'hash': commit['hash'], 'error': str(result) or type(result).__name__}
+                            for commit, result in zip(batch, results) if result is not True)
+            # Saving each batch lets an interrupted migration resume where it stopped
+            target.save_index()
+            migrated = len(sources & indexed())
+            target.meta['migrated'] = migrated
+            target._write_meta(target.meta)
+        if on_batch:
+            on_batch(migrated, len(commits))
+
+    target.meta['failed'] = len(failures)
+    target.meta['failures'] = failures[:MAX_RECORDED_FAILURES]
+    target.meta.pop('error', None)
+    with target.writing():
+        # Only an index holding every previous commit may replace the active one
+        if failures or sources - indexed():
+            # Left incomplete, so searches keep the previous index and the next run retries these commits
+            target._write_meta(target.meta)
+        else:
+            target.mark_complete()
+    return added
+
+
+def migrate(batch_size: int = MIGRATION_BATCH, on_batch=None) -> int:
+    """Re-embed the active version's commits into the configured version"""
+    return run_sync(amigrate(batch_size, on_batch))
+
+
+if __name__ == "__main__" and sys.argv[1:] == ['migrate']:
+    pid_path = _migration_pid_path()
+    pid_path.parent.mkdir(parents=True, exist_ok=True)
+    pid_path.write_text(str(os.getpid()))
+    try:
+        migrate()
+    finally:
+        try:
+            pid_path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,133 @@
+"""
+Incremental commit message generation for large staged changes.
+The staged diff is split per file and each file is summarized once; the
+summary is cached by the file's old and new blob SHAs, so re-running after
+touching one file only re-summarizes that file. The commit message is then
+written from the short per-file summaries instead of the whole diff.
+"""
+
+import hashlib
+import re
+from typing import Dict, Iterator, List
+from .ai_providers import COMMIT_SYSTEM_PROMPT
+from .config import get_config
+
+settings = get_config()
+
+INCREMENTAL_THRESHOLD = 6000  # characters of diff before files are summarized separately
+MAX_FILE_DIFF = 12000  # characters of one file's diff sent for its summary
+CACHE_SIZE = 5000  # file summaries kept on disk
+
+FILE_SYSTEM_PROMPT = "You are a helpful assistant that summarizes code changes for commit messages."
+
+_INDEX_LINE = re.compile(r'^index ([0-9a-f]+)\.\.([0-9a-f]+)', re.MULTILINE)
+
+
+def split_diff(diff: str) -> List[Dict[str, str]]:
+    """Split a git diff into per-file parts with their path and blob SHAs"""
+    files = []
+    for part in re.split(r'^(?=diff --git )', diff, flags=re.MULTILINE):
+        if not part.startswith('diff --git '):
+            continue
+        path = None
+        for line in part.splitlines():
+            if line.startswith('@@'):
+                break
+            if line.startswith('+++ b/'):
+                path = line[6:].rstrip('\t')
+                break
+            # Deleted files only name the old path
+            if line.startswith('--- a/'):
+                path = line[6:].rstrip('\t')
+            elif line.startswith('rename to '):
+                path = line[10:]
+        if path is None:
+            path = part.splitlines()[0].rsplit(' b/', 1)[-1]
+        match = _INDEX_LINE.search(part)
+        if match:
+            old, new = match.groups()
+        else:
+            # Mode-only changes and pure renames have no index line
+            old = new = hashlib.sha256(part.encode('utf-8')).hexdigest()
+        files.append({'path': path, 'old': old, 'new': new, 'diff': part})
+    return files
+
+
+def should_summarize_files(diff: str) -> bool:
+    """Check whether a staged diff is large enough to be summarized per file"""
+    return len(diff) > INCREMENTAL_THRESHOLD and len(split_diff(diff)) > 1
+
+
+def get_file_summary_prompt(file: Dict[str, str]) -> str:
+    """Build the prompt that summarizes one file's staged changes"""
+    diff = file['diff']
+    if len(diff) > MAX_FILE_DIFF:
+        diff = diff[:MAX_FILE_DIFF] + "\n... (diff truncated)"
+    return f"""Summarize the following change to {file['path']} in one or two short sentences.
+Describe what changed and why it matters, not line-by-line edits.
+
+{diff}
+
+Respond with the summary only."""
+
+
+def get_commit_prompt(files: List[Dict[str, str]], summaries: List[str]) -> str:
+    """Build the commit message prompt from per-file summaries"""
+    changes = "\n".join(f"- {file['path']}: {summary}" for file, summary in zip(files, summaries))
+    return f"""Based on the following summaries of staged changes, generate a clear and concise commit message that follows conventional commits format.
+The message should be in the format: <type>(<scope>): <description>
+
+Types can be:
+- feat: A new feature
+- fix: A bug fix
+- docs: Documentation only changes
+- style: Changes that do not affect the meaning of the code
+- refactor: A code change that neither fixes a bug nor adds a feature
+- perf: A code change that improves performance
+- test: Adding missing tests or correcting existing tests
+- chore: Changes to the build process or auxiliary tools
+
+Changed files:
+
+{changes}
+
+Generate only the commit message without any explanation."""
+
+
+async def get_file_summaries(files: List[Dict[str, str]], provider, model: str) -> List[str]:
+    """Summarize files concurrently, reusing summaries cached by blob SHA"""
+    from .aio import gather_limited
+    from .cache import DiskCache, make_key
+
+    cache = DiskCache('file_summaries', max_entries=CACHE_SIZE)
+    summaries = [None] * len(files)
+    pending = []
+    for i, file in enumerate(files):
+        # The same old and new blob always produce the same change
+        key = make_key(file['old'], file['new'], settings.get_provider(), model)
+        summaries[i] = cache.get(key)
+        if summaries[i] is None:
+            pending.append((i, key))
+
+    if pending:
+        results = await gather_limited(
+            [provider.agenerate(get_file_summary_prompt(files[i]), model, system=FILE_SYSTEM_PROMPT,
+                                max_tokens=120, temperature=0.3) for i, _ in pending],
+            limit=settings.get_llm_max_concurrency(),
+            return_exceptions=False
+        )
+        for (i, key), result in zip(pending, results):
+            summaries[i] = ' '.join(result.split())
+            cache.set(key, summaries[i])
+
+    return summaries
+
+
+def stream_commit_message(diff: str, provider, model: str, cache: bool = True) -> Iterator[str]:
+    """Summarize the files of a staged diff, then stream a commit message written from the summaries"""
+    from .aio import run_sync
+
+    files = split_diff(diff)
+    summaries = run_sync(get_file_summaries(files, provider, model))
+    return provider.stream(get_commit_prompt(files, summaries), model, system=COMMIT_SYSTEM_PROMPT,
+                           max_tokens=100, cache=cache)
@@ -1,16 +1,20 @@
 import subprocess
 import sys
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 import re
-from .ai_providers import OpenAIProvider, OllamaProvider
-from .config import Config
+from .router import create_provider
+from .branch_classifier import BRANCH_TYPES, CONFIDENCE_THRESHOLD, classify, classify_files
+from .config import get_config
 
 console = Console()
-settings = Config()
+settings = get_config()
+
+COMMIT_DIFF_BUDGET = 6000  # characters of a commit's patch sent for its summary
+COMMIT_SUMMARY_STORE_SIZE = 5000  # commit summaries kept on disk
 
 def run_git_command(command: List[str], check=True, capture_output=True) -> subprocess.CompletedProcess:
     """Run a git command and handle errors"""
@@ -94,10 +98,16 @@ def sanitize_branch_name(name: str) -> str:
         name = '-'.join(shortened)
     return name
 
+def parse_branch_type(response: str) -> Optional[str]:
+    """Get the branch type from a model response, or None if it isn't a valid type"""
+    branch_type = response.strip().strip('.\'"`').lower()
+    return branch_type if branch_type in BRANCH_TYPES else None
+
 def get_branch_type(description: str) -> str:
-    """Use AI to determine the branch type based on description"""
-    provider = settings.get_provider()
-    model = settings.get_model()
+    """Determine the branch type locally, asking the model only when the classifier is unsure"""
+    branch_type, confidence = classify(description)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return branch_type
     
     prompt = f"""Based on this feature description, determine the most appropriate branch type prefix.
 Choose one of: feat, fix, docs, style, refactor, perf, test, chore
@@ -107,53 +117,88 @@ Description: {description}
 Respond with ONLY the type (e.g., 'feat' or 'fix'). No explanation needed."""
 
     try:
-        if provider == 'openai':
-            api_key = settings.get_openai_api_key()
-            ai = OpenAIProvider(api_key)
-        else:
-            ai = OllamaProvider()
-        
-        branch_type = ai.generate_commit_message(prompt, model).strip().lower()
-        
-        # Validate the response
-        valid_types = {'feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore'}
-        if branch_type not in valid_types:
-            # Try to infer from description
-            desc_lower = description.lower()
-            if any(word in desc_lower for word in ['fix', 'bug', 'issue']):
-                return 'fix'
-            elif any(word in desc_lower for word in ['doc', 'readme']):
-                return 'docs'
-            elif any(word in desc_lower for word in ['refactor', 'clean']):
-                return 'refactor'
-            elif any(word in desc_lower for word in ['test']):
-                return 'test'
-            elif any(word in desc_lower for word in ['style', 'format']):
-                return 'style'
-            elif any(word in desc_lower for word in ['perf', 'optimize']):
-                return 'perf'
-            return 'feat'  # Default to feat if no match
-        
+        ai = create_provider()
+        # Small models answer first; an invalid answer escalates to the next model
+        return ai.cascade(prompt, settings.get_task_models('branch_type'), parse_branch_type) or branch_type
+    except Exception:
+        # If AI fails, use the classifier's best guess
         return branch_type
-    except:
-        # If AI fails, try to infer from description
-        desc_lower = description.lower()
-        if any(word in desc_lower for word in ['fix', 'bug', 'issue']):
-            return 'fix'
-        elif any(word in desc_lower for word in ['doc', 'readme']):
-            return 'docs'
-        elif any(word in desc_lower for word in ['refactor', 'clean']):
-            return 'refactor'
-        elif any(word in desc_lower for word in ['test']):
-            return 'test'
-        elif any(word in desc_lower for word in ['style', 'format']):
-            return 'style'
-        elif any(word in desc_lower for word in ['perf', 'optimize']):
-            return 'perf'
-        return 'feat'  # Default to feat if all else fails
+
+def parse_branch_description(response: str) -> Optional[str]:
+    """Clean up a generated branch name, or return None if the response isn't one"""
+    # Validate and clean up the response
+    description = response.strip().lower()
+    
+    # Remove any conventional commit format if AI included it
+    if '(' in description and '):' in description:
+        description = description.split('):')[1].strip()
+    
+    # Reject refusals and explanations
+    error_phrases = ['sorry', 'apologize', 'need', 'please', 'could you', 'i am', "i'm", 'cannot', 'can not']
+    if not description or any(phrase in description for phrase in error_phrases):
+        return None
+    
+    # Limit words and length
+    words = description.split()
+    description = ' '.join(words[:4])  # Limit to 4 words
+    
+    # Final validation
+    if len(description) > 40:
+        words = description.split('-')
+        description = '-'.join(words[:3])  # Take first 3 parts if still too long
+    
+    return description
+
+def parse_branch_info(response: str) -> Optional[Tuple[str, str]]:
+    """Get the branch type and name from a JSON model response, or None if either is invalid"""
+    from .code_review import parse_json_response
+    
+    try:
+        data = parse_json_response(response)
+    except ValueError:
+        return None
+    branch_type = parse_branch_type(str(data.get('type', '')))
+    name = parse_branch_description(str(data.get('name', '')))
+    return (branch_type, name) if branch_type and name else None
+
+def get_branch_name_prompt(files_context: str, diff: str, with_type: bool = False) -> str:
+    """Build the prompt that names a branch after staged changes, optionally choosing its type too"""
+    if with_type:
+        response_format = """Also choose the branch type, one of: feat, fix, docs, style, refactor, perf, test, chore
+
+Respond with ONLY a JSON object like {"type": "feat", "name": "add-user-auth"}."""
+    else:
+        response_format = "Respond with ONLY the branch name, no other text."
+    return f"""You are a branch name generator. Create a short, descriptive branch name based on these changes.
+Rules:
+1. Use 2-4 words maximum
+2. Focus on the main feature or purpose
+3. Be specific but concise
+4. Use only lowercase letters, numbers, and hyphens
+5. Keep total length under 40 characters
+6. NEVER include words like 'sorry', 'apologize', or 'need'
+7. NEVER explain or ask for more information
+
+Files changed: {files_context}
+
+Example good branch names:
+- add-user-auth
+- fix-login-bug
+- update-api-endpoints
+- improve-error-handling
+- refactor-db-queries
+
+Changes:
+{diff}
+
+{response_format}"""
 
 def get_staged_changes_description() -> str:
     """Get a description of staged changes using AI"""
+    return get_staged_branch_info()[1]
+
+def get_staged_branch_info() -> Tuple[Optional[str], str]:
+    """Get the branch type (None if undecided) and a description of staged changes"""
     try:
         # First check for staged changes
         diff = run_git_command(['diff', '--cached', '--no-color']).stdout
@@ -167,10 +212,10 @@ def get_staged_changes_description() -> str:
                 
                 if latest_commit:
                     # Extract the commit type if it follows conventional commit format
-                    commit_type = 'feat'  # default
+                    commit_type = None
                     if '(' in latest_commit and '):' in latest_commit:
                         type_part = latest_commit.split('(')[0].strip().lower()
-                        if type_part in ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore']:
+                        if type_part in BRANCH_TYPES:
                             commit_type = type_part
                     
                     # Use the commit message as the branch name
@@ -181,7 +226,7 @@ def get_staged_changes_description() -> str:
                     # Limit length
                     words = description.split()
                     description = ' '.join(words[:4])  # Limit to 4 words
-                    return description
+                    return commit_type, description
                 
             except Exception:
                 pass
@@ -195,55 +240,23 @@ def get_staged_changes_description() -> str:
             
             raise ValueError(f"No staged changes. Stage changes with 'git add' first.\n{file_context}")
 
-        provider = settings.get_provider()
-        model = settings.get_model()
-        
         # Get list of modified files
         modified_files = run_git_command(['diff', '--cached', '--name-only']).stdout.strip().split('\n')
         files_context = ", ".join(modified_files[:3])
         
-        prompt = f"""You are a branch name generator. Create a short, descriptive branch name based on these changes.
-Rules:
-1. Use 2-4 words maximum
-2. Focus on the main feature or purpose
-3. Be specific but concise
-4. Use only lowercase letters, numbers, and hyphens
-5. Keep total length under 40 characters
-6. NEVER include words like 'sorry', 'apologize', or 'need'
-7. NEVER explain or ask for more information
-
-Files changed: {files_context}
-
-Example good branch names:
-- add-user-auth
-- fix-login-bug
-- update-api-endpoints
-- improve-error-handling
-- refactor-db-queries
-
-Changes:
-{diff}
-
-Respond with ONLY the branch name, no other text."""
-        
-        if provider == 'openai':
-            api_key = settings.get_openai_api_key()
-            ai = OpenAIProvider(api_key)
+        # Files alone often settle the type (docs, tests, CI); otherwise the
+        # model picks the type in the same call that names the branch
+        branch_type, confidence = classify_files(modified_files)
+        ai = create_provider()
+        models = settings.get_task_models('branch_name')
+        if confidence >= CONFIDENCE_THRESHOLD:
+            # A response that fails validation escalates to the next model
+            description = ai.cascade(get_branch_name_prompt(files_context, diff), models, parse_branch_description)
         else:
-            ai = OllamaProvider()
-        
-        description = ai.generate_commit_message(prompt, model).strip()
-        
-        # Validate and clean up the response
-        description = description.lower()
-        
-        # Remove any conventional commit format if AI included it
-        if '(' in description and '):' in description:
-            description = description.split('):')[1].strip()
-        
-        # Remove common error phrases
-        error_phrases = ['sorry', 'apologize', 'need', 'please', 'could you', 'i am', "i'm", 'cannot', 'can not']
-        if any(phrase in description.lower() for phrase in error_phrases):
+            info = ai.cascade(get_branch_name_prompt(files_context, diff, with_type=True), models,
+                              parse_branch_info, json_mode=True)
+            branch_type, description = info or (None, None)
+        if description is None:
             # Fall back to using modified files for branch name
             if modified_files and modified_files[0]:
                 main_file = modified_files[0].split('/')[-1].split('.')[0]
@@ -252,19 +265,10 @@ Respond with ONLY the branch name, no other text."""
                     action = 'add-tests'
                 elif 'doc' in main_file.lower() or 'readme' in main_file.lower():
                     action = 'update-docs'
-                return f"{action}-{main_file}"
-            return "update-codebase"
-        
-        # Limit words and length
-        words = description.split()
-        description = ' '.join(words[:4])  # Limit to 4 words
-        
-        # Final validation
-        if len(description) > 40:
-            words = description.split('-')
-            description = '-'.join(words[:3])  # Take first 3 parts if still too long
+                return branch_type, f"{action}-{main_file}"
+            return branch_type, "update-codebase"
         
-        return description
+        return branch_type, description
     except Exception as e:
         raise ValueError(f"Failed to generate branch name: {str(e)}")
 
@@ -298,15 +302,18 @@ def create_branch(description: str = None, checkout: bool = True, generate: bool
             if generate:
                 # Generate description from staged changes or latest commit
                 task_desc = progress.add_task("Analyzing changes...", total=None)
-                description = get_staged_changes_description()
+                branch_type, description = get_staged_branch_info()
                 progress.update(task_desc, completed=True)
             elif not description:
                 raise ValueError("Either provide a description or use --generate (-g)")
+            else:
+                branch_type = None
             
             # Determine branch type
-            task_type = progress.add_task("Determining branch type...", total=None)
-            branch_type = get_branch_type(description)
-            progress.update(task_type, completed=True)
+            if not branch_type:
+                task_type = progress.add_task("Determining branch type...", total=None)
+                branch_type = get_branch_type(description)
+                progress.update(task_type, completed=True)
             
             # Generate branch name
             task_name = progress.add_task("Generating branch name...", total=None)
@@ -347,6 +354,23 @@ def create_branch(description: str = None, checkout: bool = True, generate: bool
             ))
             sys.exit(1)
 
+def get_base_branch() -> str:
+    """Get the repository's base branch (main or master)"""
+    return 'main' if run_git_command(['rev-parse', '--verify', 'main'], check=False).returncode == 0 else 'master'
+
+def get_branch_refs() -> List[Dict[str, str]]:
+    """Get every local branch with its tip commit in a single git call"""
+    result = run_git_command([
+        'for-each-ref', 'refs/heads',
+        '--format=%(refname:short)%00%(objectname)%00%(objectname:short) %(contents:subject)'
+    ])
+    refs = []
+    for line in result.stdout.splitlines():
+        parts = line.split('\0')
+        if len(parts) == 3:
+            refs.append({'name': parts[0], 'tip': parts[1], 'last_commit': parts[2].strip()})
+    return refs
+
 def list_branches(show_details: bool = False) -> List[Dict[str, str]]:
     """List all branches with optional AI-generated summaries"""
     with Progress(
@@ -356,12 +380,11 @@ def list_branches(show_details: bool = False) -> List[Dict[str, str]]:
     ) as progress:
         task = progress.add_task("Getting branches...", total=None)
         
-        # Get all branches
-        result = run_git_command(['branch', '--format=%(refname:short)'])
-        branches = [b.strip() for b in result.stdout.splitlines()]
+        # Get all branches and their last commits
+        branch_info = get_branch_refs()
         progress.update(task, completed=True)
         
-        if not branches:
+        if not branch_info:
             console.print("[yellow]No branches found[/yellow]")
             return []
         
@@ -372,70 +395,171 @@ def list_branches(show_details: bool = False) -> List[Dict[str, str]]:
         if show_details:
             table.add_column("Summary", style="green")
         
-        branch_info = []
-        for branch in branches:
-            # Get last commit info
-            commit_info = run_git_command(['log', '-1', '--format=%h %s', branch])
-            last_commit = commit_info.stdout.strip()
-            
-            info = {
-                'name': branch,
-                'last_commit': last_commit,
-            }
-            
-            if show_details:
-                # Get branch summary using AI
-                task_summary = progress.add_task(f"Analyzing branch {branch}...", total=None)
-                try:
-                    summary = get_branch_summary(branch)
-                    progress.update(task_summary, completed=True)
-                    info['summary'] = summary
-                except Exception as e:
-                    progress.update(task_summary, visible=False)
-                    info['summary'] = "[red]Failed to generate summary[/red]"
-            
-            branch_info.append(info)
-            
+        if show_details:
+            # Summarize all branches concurrently
+            task_summary = progress.add_task(f"Analyzing {len(branch_info)} branches...", total=None)
+            from .aio import run_sync
+            from .concurrency import deadline
+            with deadline(settings.get_command_deadline()):
+                summaries = run_sync(get_branch_summaries(branch_info))
+            progress.update(task_summary, completed=True)
+            for info, summary in zip(branch_info, summaries):
+                info['summary'] = summary if isinstance(summary, str) else "[red]Failed to generate summary[/red]"
+        
+        for info in branch_info:
             # Add to table
             if show_details:
-                table.add_row(branch, last_commit, info.get('summary', ''))
+                table.add_row(info['name'], info['last_commit'], info.get('summary', ''))
             else:
-                table.add_row(branch, last_commit)
+                table.add_row(info['name'], info['last_commit'])
         
         console.print(table)
         return branch_info
 
-def get_branch_summary(branch: str) -> str:
-    """Generate an AI summary of the branch's changes"""
-    # Get branch changes
-    try:
-        # Find the merge base with main/master
-        base_branch = 'main' if run_git_command(['rev-parse', '--verify', 'main'], check=False).returncode == 0 else 'master'
-        merge_base = run_git_command(['merge-base', base_branch, branch]).stdout.strip()
-        
-        # Get diff summary
-        diff = run_git_command(['diff', '--stat', merge_base, branch]).stdout
-        commits = run_git_command(['log', '--oneline', f'{merge_base}..{branch}']).stdout
-        
-        provider = settings.get_provider()
-        model = settings.get_model()
-        
-        prompt = f"""Provide a one-line summary of these branch changes:
+def get_branch_changes(branch: str, base_branch: str) -> Optional[Dict[str, str]]:
+    """Get the merge base, diff stats and commits of a branch against the base"""
+    # Errors are returned as None: this runs in worker threads where sys.exit would be lost
+    merge_base = run_git_command(['merge-base', base_branch, branch], check=False)
+    if merge_base.returncode != 0:
+        return None
+    merge_base = merge_base.stdout.strip()
+    
+    diff = run_git_command(['diff', '--stat', merge_base, branch], check=False)
+    commits = run_git_command(['log', '--oneline', f'{merge_base}..{branch}'], check=False)
+    return {
+        'merge_base': merge_base,
+        'diff': diff.stdout if diff.returncode == 0 else '',
+        'commits': commits.stdout if commits.returncode == 0 else ''
+    }
+
+def get_branch_summary_prompt(changes: Dict[str, str]) -> str:
+    """Build the prompt that summarizes a branch's changes"""
+    return f"""Provide a one-line summary of these branch changes:
 
 Commits:
-{commits}
+{changes['commits']}
 
 Changes:
-{diff}
+{changes['diff']}
 
 Keep the summary concise and focused on the main purpose of the changes."""
 
-        if provider == 'openai':
-            api_key = settings.get_openai_api_key()
-            ai = OpenAIProvider(api_key)
+async def get_branch_summaries(refs: List[Dict[str, str]]) -> List[str]:
+    """Summarize several branches concurrently, reusing cached summaries"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from .aio import gather_limited
+    from .cache import DiskCache, make_key
+    
+    cache = DiskCache('branch_summaries')
+    model = settings.get_model()
+    base_branch = get_base_branch()
+    
+    # Collect git stats for all branches in parallel
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=min(8, len(refs)) or 1) as executor:
+        changes = await asyncio.gather(*(
+            loop.run_in_executor(executor, get_branch_changes, ref['name'], base_branch)
+            for ref in refs
+        ))
+    
+    summaries = [None] * len(refs)
+    pending = []
+    for i, (ref, change) in enumerate(zip(refs, changes)):
+        if change is None:
+            summaries[i] = "No changes or unable to generate summary"
+        elif change['merge_base'] == ref['tip']:
+            summaries[i] = f"No changes compared to {base_branch}"
         else:
-            ai = OllamaProvider()
+            # A summary only changes when the branch tip or its base moves
+            key = make_key(ref['tip'], change['merge_base'], settings.get_provider(), model)
+            summaries[i] = cache.get(key)
+            if summaries[i] is None:
+                pending.append((i, key, get_branch_summary_prompt(change)))
+    
+    if pending:
+        ai = create_provider()
         
-        return ai.generate_commit_message(prompt, model).strip()
-    except:
-        return "No changes or unable to generate summary" 
\ No newline at end of file
+        results = await gather_limited(
+            [ai.agenerate(prompt, model) for _, _, prompt in pending],
+            limit=settings.get_llm_max_concurrency()
+        )
+        for (i, key, _), result in zip(pending, results):
+            if isinstance(result, str):
+                summaries[i] = result.strip()
+                cache.set(key, summaries[i])
+            else:
+                summaries[i] = "No changes or unable to generate summary"
+    
+    return summaries
+
+def get_branch_summary(branch: str) -> str:
+    """Generate an AI summary of the branch's changes"""
+    from .aio import run_sync
+    
+    tip = run_git_command(['rev-parse', branch], check=False)
+    if tip.returncode != 0:
+        return "No changes or unable to generate summary"
+    return run_sync(get_branch_summaries([{'name': branch, 'tip': tip.stdout.strip()}]))[0]
+
+def get_commit_changes(commit: str) -> Optional[str]:
+    """Get a commit's message, stats and patch, truncated to the summary budget"""
+    result = run_git_command(['show', '--stat', '--patch', '--no-color', '--format=%s%n%n%b', commit], check=False)
+    if result.returncode != 0:
+        return None
+    changes = result.stdout
+    if len(changes) > COMMIT_DIFF_BUDGET:
+        changes = changes[:COMMIT_DIFF_BUDGET] + "\n... (diff truncated)"
+    return changes
+
+def get_commit_summary_prompt(changes: str) -> str:
+    """Build the prompt that summarizes one commit"""
+    return f"""Summarize what this commit does and why in one or two sentences:
+
+{changes}
+
+Respond with the summary only."""
+
+async def get_commit_summaries(commits: List[Dict[str, str]]) -> List[str]:
+    """Summarize commits concurrently, reusing summaries from the persistent store"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from .aio import gather_limited
+    from .cache import DiskCache, make_key
+    
+    store = DiskCache('commit_summaries', max_entries=COMMIT_SUMMARY_STORE_SIZE)
+    model = settings.get_model()
+    
+    summaries = [None] * len(commits)
+    missing = []
+    for i, commit in enumerate(commits):
+        # Commits never change, so a summary stays valid for the same model
+        key = make_key(commit['sha'], settings.get_provider(), model)
+        summaries[i] = store.get(key)
+        if summaries[i] is None:
+            missing.append((i, key))
+    if not missing:
+        return summaries
+    
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+        changes = await asyncio.gather(*(
+            loop.run_in_executor(executor, get_commit_changes, commits[i]['sha'])
+            for i, _ in missing
+        ))
+    
+    ai = create_provider()
+    results = await gather_limited(
+        [ai.agenerate(get_commit_summary_prompt(change or commits[i]['subject']), model, temperature=0.3)
+         for (i, _), change in zip(missing, changes)],
+        limit=settings.get_llm_max_concurrency()
+    )
+    for (i, key), result in zip(missing, results):
+        if isinstance(result, str) and result.strip():
+            summaries[i] = ' '.join(result.split())
+            store.set(key, summaries[i])
+        else:
+            # Fall back to the commit subject, without storing it
+            summaries[i] = commits[i]['subject']
+    
+    return summaries
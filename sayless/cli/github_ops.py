@@ -6,15 +6,36 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+import re
 import typer
-from .ai_providers import OpenAIProvider, OllamaProvider
-from .config import Config
-from .git_ops import run_git_command, get_current_branch
+from .router import create_provider
+from .cache import DiskCache, make_key
+from .code_review import run_chunked_review, split_diff_by_file, parse_json_response
+from .aio import gather_limited, run_sync
+from .concurrency import deadline
+from .config import get_config
+from .git_ops import run_git_command, get_current_branch, get_base_branch, get_commit_summaries
+from .streaming import LivePanel
 
 console = Console()
-settings = Config()
+settings = get_config()
+review_cache = DiskCache('reviews')
+
+REVIEW_HISTORY_LIMIT = 10  # reviewed head SHAs kept per PR
+REVIEW_SUMMARY_CHARS = 1500  # characters of the latest review carried into the next incremental review
+REVIEW_SUMMARY_POINTS = 8  # open inline points carried into the next incremental review
+GITHUB_POOL_SIZE = 10  # pooled connections to the GitHub API
+PR_DIFF_BUDGET = 8000  # characters of diff sent along with the commit summaries
+PR_EXCERPT_FILES = 8  # most changed files considered for the diff excerpt
+PR_STAT_FILES = 50  # changed files listed by name
+PR_COMMIT_LINES = 30  # most commits listed with their summaries; the largest are kept
+PR_COMMIT_CHARS = 6000  # characters of commit summary lines in the prompt
+PR_COMMIT_LINE_CHARS = 300  # characters of one commit summary line
+GENERATED_FILES = ('.lock', '-lock.json', '.min.js', '.min.css', '.svg', '.map')
 
 class GitHubAPI:
     def __init__(self):
@@ -38,6 +59,10 @@ class GitHubAPI:
             "Accept": "application/vnd.github.v3+json"
         }
         
+        # Share one pooled connection across requests, including concurrent ones
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=GITHUB_POOL_SIZE))
+        
         # Get repository info
         try:
             self.repo_url = run_git_command(['config', '--get', 'remote.origin.url']).stdout.strip()
@@ -64,7 +89,7 @@ class GitHubAPI:
     def get_pr_by_number(self, pr_number: int) -> Dict:
         """Get PR details by number"""
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers)
         if response.status_code != 200:
             raise Exception(f"PR #{pr_number} not found or inaccessible")
         return response.json()
@@ -73,19 +98,43 @@ class GitHubAPI:
         """Get the diff for a specific PR"""
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}"
         headers = {**self.headers, "Accept": "application/vnd.github.v3.diff"}
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
         if response.status_code != 200:
             raise Exception(f"Failed to get diff for PR #{pr_number}")
         return response.text
 
     def get_pr_files(self, pr_number: int) -> List[Dict]:
-        """Get list of files changed in a PR"""
+        """Get list of files changed in a PR, following pagination"""
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}/files"
-        response = requests.get(url, headers=self.headers)
+        params = {"per_page": 100}
+        files = []
+        while url:
+            response = self.session.get(url, headers=self.headers, params=params)
+            if response.status_code != 200:
+                raise Exception(f"Failed to get files for PR #{pr_number}")
+            files.extend(response.json())
+            # The next link already carries the query parameters
+            url = response.links.get('next', {}).get('url')
+            params = None
+        return files
+
+    def get_compare(self, base_sha: str, head_sha: str) -> Dict:
+        """Get the comparison between two commits"""
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/compare/{base_sha}...{head_sha}"
+        response = self.session.get(url, headers=self.headers)
         if response.status_code != 200:
-            raise Exception(f"Failed to get files for PR #{pr_number}")
+            raise Exception(f"Failed to compare {base_sha[:7]}...{head_sha[:7]}")
         return response.json()
 
+    def get_compare_diff(self, base_sha: str, head_sha: str) -> str:
+        """Get the diff between two commits"""
+        url = f"{self.api_url}/repos/{self.owner}/{self.repo}/compare/{base_sha}...{head_sha}"
+        headers = {**self.headers, "Accept": "application/vnd.github.v3.diff"}
+        response = self.session.get(url, headers=headers)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get diff for {base_sha[:7]}...{head_sha[:7]}")
+        return response.text
+
     def post_pr_review(self, pr_number: int, body: str, event: str = "COMMENT", comments: List[Dict] = None) -> Dict:
         """Post a review on a PR"""
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls/{pr_number}/reviews"
@@ -96,7 +145,7 @@ class GitHubAPI:
         if comments:
             data["comments"] = comments
         
-        response = requests.post(url, headers=self.headers, json=data)
+        response = self.session.post(url, headers=self.headers, json=data)
         if response.status_code != 200:
             raise Exception(f"Failed to post review: {response.json().get('message', 'Unknown error')}")
         return response.json()
@@ -105,7 +154,7 @@ class GitHubAPI:
         """Post a general comment on a PR"""
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/issues/{pr_number}/comments"
         data = {"body": body}
-        response = requests.post(url, headers=self.headers, json=data)
+        response = self.session.post(url, headers=self.headers, json=data)
         if response.status_code != 201:
             raise Exception(f"Failed to post comment: {response.json().get('message', 'Unknown error')}")
         return response.json()
@@ -115,7 +164,7 @@ class GitHubAPI:
         current_branch = get_current_branch()
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls"
         params = {"head": f"{self.owner}:{current_branch}", "state": "open"}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         if response.status_code == 200 and response.json():
             return response.json()[0]
         return None
@@ -125,20 +174,20 @@ class GitHubAPI:
         try:
             # Check if base branch exists
             url = f"{self.api_url}/repos/{self.owner}/{self.repo}/branches/{base}"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=self.headers)
             if response.status_code != 200:
                 raise ValueError(f"Base branch '{base}' not found")
             
             # Check if head branch exists and has commits
             url = f"{self.api_url}/repos/{self.owner}/{self.repo}/branches/{head}"
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=self.headers)
             if response.status_code != 200:
                 raise ValueError(f"Current branch '{head}' not found on GitHub. Push your changes first:\n[blue]git push -u origin {head}[/blue]")
             
             # Check if PR already exists
             url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls"
             params = {"head": f"{self.owner}:{head}", "base": base, "state": "open"}
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             if response.status_code == 200 and response.json():
                 existing_pr = response.json()[0]
                 raise ValueError(
@@ -167,7 +216,7 @@ class GitHubAPI:
                 "base": base
             }
             
-            response = requests.post(url, headers=self.headers, json=data)
+            response = self.session.post(url, headers=self.headers, json=data)
             if response.status_code != 201:
                 error_data = response.json()
                 error_msg = error_data.get('message', '')
@@ -187,7 +236,7 @@ class GitHubAPI:
             # Add labels if provided
             if labels:
                 labels_url = f"{self.api_url}/repos/{self.owner}/{self.repo}/issues/{pr['number']}/labels"
-                requests.post(labels_url, headers=self.headers, json=labels)
+                self.session.post(labels_url, headers=self.headers, json=labels)
             
             return pr
             
@@ -199,7 +248,7 @@ class GitHubAPI:
         url = f"{self.api_url}/repos/{self.owner}/{self.repo}/pulls"
         params = {"state": state}
         
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         if response.status_code != 200:
             raise Exception(f"Failed to list PRs: {response.json().get('message', '')}")
         
@@ -248,64 +297,140 @@ def infer_labels_from_content(title: str, body: str) -> List[str]:
     
     return list(labels)
 
-def parse_ai_response(response: str) -> Dict[str, str]:
-    """Parse AI response with robust error handling"""
+PR_SYSTEM_PROMPT = "You are a helpful assistant that writes clear pull request descriptions. Respond with a single JSON object."
+CHANGE_TYPES = ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore']
+PR_LABELS = ['feature', 'bug', 'documentation', 'enhancement', 'refactor', 'performance', 'testing', 'maintenance']
+
+def get_pr_diff_excerpt(merge_base: str, branch: str) -> str:
+    """List the changed files and excerpt the diffs of the most changed ones within the budget"""
+    numstat = run_git_command(['diff', '--numstat', '--no-renames', merge_base, branch]).stdout
+    files = []
+    for line in numstat.splitlines():
+        parts = line.split('\t', 2)
+        if len(parts) != 3:
+            continue
+        added, deleted, path = parts
+        # Binary files report '-' and have no text diff
+        size = int(added) + int(deleted) if added.isdigit() and deleted.isdigit() else 0
+        files.append({'path': path, 'added': added, 'deleted': deleted, 'size': size})
+    
+    stats = [f"- {f['path']} (+{f['added']} -{f['deleted']})" for f in files[:PR_STAT_FILES]]
+    if len(files) > PR_STAT_FILES:
+        stats.append(f"- ... and {len(files) - PR_STAT_FILES} more files")
+    
+    significant = sorted(
+        (f for f in files if f['size'] and not f['path'].endswith(GENERATED_FILES)),
+        key=lambda f: f['size'], reverse=True
+    )[:PR_EXCERPT_FILES]
+    excerpts = []
+    budget = PR_DIFF_BUDGET
+    for f in significant:
+        if budget < 500:
+            break
+        diff = run_git_command(['diff', '--no-color', '--no-renames', merge_base, branch, '--', f['path']]).stdout
+        if len(diff) > budget:
+            diff = diff[:budget] + "\n... (diff truncated)"
+        excerpts.append(diff)
+        budget -= len(diff)
+    
+    return "Files changed:\n" + "\n".join(stats) + "\n\nDiff excerpt (most changed files):\n" + "\n".join(excerpts)
+
+def get_branch_commits(merge_base: str, branch: str) -> List[Dict]:
+    """Get a branch's commits, oldest first, with their subjects and number of changed lines"""
+    log = run_git_command(['log', '--reverse', '--shortstat', '--format=%x01%H%x00%s', f'{merge_base}..{branch}']).stdout
+    commits = []
+    for entry in log.split('\x01'):
+        header, _, stat = entry.partition('\n')
+        if '\0' not in header:
+            continue
+        sha, subject = header.split('\0', 1)
+        size = sum(int(count) for count in re.findall(r'(\d+) (?:insertion|deletion)', stat))
+        commits.append({'sha': sha, 'subject': subject, 'size': size})
+    return commits
+
+def select_pr_commits(commits: List[Dict]) -> List[Dict]:
+    """Keep the largest commits, in branch order, when there are too many to list"""
+    if len(commits) <= PR_COMMIT_LINES:
+        return commits
+    largest = set(sorted(range(len(commits)), key=lambda i: commits[i]['size'], reverse=True)[:PR_COMMIT_LINES])
+    return [commit for i, commit in enumerate(commits) if i in largest]
+
+def format_pr_commits(commits: List[Dict], summaries: List[str], total: int) -> str:
+    """List commit summaries within the prompt budget, collapsing the rest into a count"""
+    lines = []
+    used = 0
+    for commit, summary in zip(commits, summaries):
+        line = f"- {commit['sha'][:7]} {commit['subject']}: {summary}"
+        if len(line) > PR_COMMIT_LINE_CHARS:
+            line = line[:PR_COMMIT_LINE_CHARS - 3] + "..."
+        if used + len(line) > PR_COMMIT_CHARS:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    if total > len(lines):
+        lines.append(f"- ... and {total - len(lines)} smaller commits")
+    return "\n".join(lines)
+
+def get_pr_prompt(commits: str, changes: str) -> str:
+    """Build the prompt that generates a whole pull request in one pass"""
+    return f"""Generate a pull request for these changes.
+
+Commits (oldest first, with summaries):
+{commits}
+
+{changes}
+
+Respond with a JSON object with exactly these keys:
+- "change_type": one of {', '.join(CHANGE_TYPES)}
+- "scope": the main component affected, one or two words
+- "breaking": true if the changes break existing behavior or APIs, otherwise false
+- "title": a conventional commit style title: <change_type>(<scope>): brief description
+- "body": the description in markdown with these sections:
+  ## Overview (2-3 sentences about the main changes and their purpose)
+  ## Changes (bullet points of specific changes, focusing on what and why, not how)
+  ## Testing (specific steps to test the changes and expected outcomes)
+  ## Notes (breaking changes, dependencies and migration steps, if any)
+- "labels": a list chosen from {', '.join(PR_LABELS)} (relevant ones only)"""
+
+def parse_pr_response(response: str) -> Dict:
+    """Validate the JSON pull request returned by the model"""
     try:
-        # Extract title
-        title_parts = response.split('<title>')
-        if len(title_parts) < 2:
-            # Try to get first line as title
-            lines = response.strip().split('\n')
-            title = lines[0].strip()
-            if not title:
-                raise ValueError("Could not find title section")
-        else:
-            title = title_parts[1].split('</title>')[0].strip()
-        
-        # Extract body
-        body_parts = response.split('<body>')
-        if len(body_parts) < 2:
-            # Try to extract markdown sections as body
-            body_lines = []
-            in_section = False
-            for line in response.split('\n'):
-                if line.startswith('##'):
-                    in_section = True
-                if in_section:
-                    body_lines.append(line)
-            body = '\n'.join(body_lines).strip()
-            if not body:
-                body = "## Changes\n" + response.strip()  # Use full response as changes
-        else:
-            body = body_parts[1].split('</body>')[0].strip()
-        
-        # Extract or infer labels
-        labels = []
-        labels_parts = response.split('<labels>')
-        if len(labels_parts) >= 2:
-            labels_text = labels_parts[1].split('</labels>')[0].strip()
-            labels = [l.strip() for l in labels_text.split(',') if l.strip()]
-        
-        # If no labels found or invalid, infer from content
-        if not labels:
-            labels = infer_labels_from_content(title, body)
-        
-        # Validate parsed content
-        if not title:
-            raise ValueError("Empty title")
-        if not body:
-            raise ValueError("Empty body")
-        
-        return {
-            'title': title,
-            'body': body,
-            'labels': labels
-        }
-    except Exception as e:
-        raise ValueError(f"Failed to parse AI response: {str(e)}\nResponse:\n{response}")
+        data = parse_json_response(response)
+    except ValueError as e:
+        raise ValueError(f"Model did not return valid JSON: {str(e)}")
+    
+    title = str(data.get('title') or '').strip()
+    body = str(data.get('body') or '').strip()
+    if not title or not body:
+        raise ValueError("Model response is missing the title or body")
+    
+    change_type = str(data.get('change_type') or '').strip().lower()
+    if change_type not in CHANGE_TYPES:
+        change_type = next((t for t in CHANGE_TYPES if title.lower().startswith(t)), 'feat')
+    scope = str(data.get('scope') or '').strip()
+    breaking = data.get('breaking') is True or str(data.get('breaking')).lower() in ('true', 'yes')
+    
+    if not re.match(rf"^({'|'.join(CHANGE_TYPES)})(\(.*?\))?!?:", title):
+        title = f"{change_type}({scope}): {title}" if scope else f"{change_type}: {title}"
+    
+    labels = data.get('labels') or []
+    if isinstance(labels, str):
+        labels = labels.split(',')
+    labels = [str(label).strip().lower() for label in labels if str(label).strip().lower() in PR_LABELS]
+    if not labels:
+        labels = infer_labels_from_content(title, body)
+    
+    return {
+        'title': title,
+        'body': body,
+        'labels': labels,
+        'change_type': change_type,
+        'scope': scope,
+        'breaking': breaking
+    }
 
-def generate_pr_content(branch: str = None, progress: Progress = None) -> Dict[str, str]:
-    """Generate PR title, body, and labels using AI"""
+def generate_pr_content(branch: str = None, progress: Progress = None) -> Dict:
+    """Generate PR title, body, labels, change type, scope and breaking flag in one model call"""
     if not branch:
         branch = get_current_branch()
     
@@ -315,14 +440,13 @@ def generate_pr_content(branch: str = None, progress: Progress = None) -> Dict[s
     
     try:
         # Get base branch
-        base_branch = 'main' if run_git_command(['rev-parse', '--verify', 'main'], check=False).returncode == 0 else 'master'
+        base_branch = get_base_branch()
         
         # Get changes
         merge_base = run_git_command(['merge-base', base_branch, branch]).stdout.strip()
-        diff = run_git_command(['diff', merge_base, branch]).stdout
-        commits = run_git_command(['log', '--oneline', f'{merge_base}..{branch}']).stdout
+        commits = get_branch_commits(merge_base, branch)
         
-        if not commits.strip():
+        if not commits:
             if task:
                 progress.update(task, visible=False)
             console.print(Panel(
@@ -339,203 +463,30 @@ def generate_pr_content(branch: str = None, progress: Progress = None) -> Dict[s
             ))
             sys.exit(1)
         
-        provider = settings.get_provider()
         model = settings.get_model()
         
-        # First, generate a high-level understanding of the changes
-        analysis_prompt = f"""Analyze these changes and provide a high-level understanding:
-
-Commits:
-{commits}
-
-Changes:
-{diff}
-
-Respond in this format:
-1. Main purpose (one line):
-2. Type of changes (feat/fix/refactor/etc):
-3. Scope of changes:
-4. Breaking changes (yes/no):
-5. Key files/components affected:"""
-
         try:
-            if provider == 'openai':
-                api_key = settings.get_openai_api_key()
-                ai = OpenAIProvider(api_key)
-            else:
-                ai = OllamaProvider()
-            
-            analysis = ai.generate_commit_message(analysis_prompt, model)
-            
-            # Extract key information from analysis
-            change_type = 'feat'  # default
-            if 'Type of changes:' in analysis:
-                type_line = analysis.split('Type of changes:')[1].split('\n')[0].strip().lower()
-                if any(t in type_line for t in ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore']):
-                    for t in ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore']:
-                        if t in type_line:
-                            change_type = t
-                            break
-            
-            main_purpose = ""
-            if 'Main purpose:' in analysis:
-                main_purpose = analysis.split('Main purpose:')[1].split('\n')[0].strip()
-            
-            scope = ""
-            if 'Scope of changes:' in analysis:
-                scope = analysis.split('Scope of changes:')[1].split('\n')[0].strip()
-            
-            is_breaking = False
-            if 'Breaking changes:' in analysis:
-                is_breaking = 'yes' in analysis.split('Breaking changes:')[1].split('\n')[0].strip().lower()
-            
-            # Create the format string for the title format requirement
-            title_format = f"{change_type}({scope if scope else 'scope'}): description"
-            
-            # Now use this analysis to generate the PR content
-            pr_prompt = f"""Based on this analysis of the changes, generate a pull request:
-
-Analysis:
-{analysis}
-
-Commits:
-{commits}
-
-Changes:
-{diff}
-
-Requirements:
-1. Title must be clear and follow conventional commit format: {title_format}
-2. Description must be detailed but concise
-3. Include specific testing instructions
-4. {"Highlight breaking changes and" if is_breaking else "Include any"} dependencies
-5. Focus on what reviewers need to know
-
-Format the response EXACTLY like this:
-
-Title: {change_type}(scope): brief description
-
-## Overview
-{main_purpose or "(2-3 sentences about the main changes and their purpose)"}
-
-## Changes
-- (bullet points of specific changes)
-- (focus on what and why, not how)
-
-## Testing
-- (specific steps to test the changes)
-- (expected outcomes)
-- (any test data or setup needed)
-
-## Notes
-- Breaking Changes: {"Yes - " if is_breaking else "None"}
-- Dependencies: (if any)
-- Migration: (if needed)
-
-Labels: feature, bug, documentation, enhancement, refactor, performance, testing, maintenance (comma-separated, choose relevant ones only)"""
-
-            response = ai.generate_commit_message(pr_prompt, model)
-            
-            # Parse response with improved error handling
-            try:
-                # Extract title
-                title = None
-                body_lines = []
-                labels = []
-                
-                lines = [l for l in response.split('\n') if l.strip()]
-                
-                # Find title
-                for line in lines:
-                    if line.startswith('Title:'):
-                        title = line.replace('Title:', '').strip()
-                        break
-                    elif any(line.startswith(f"{t}(") for t in ['feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test', 'chore']):
-                        title = line.strip()
-                        break
-                
-                # If no title found, construct one from analysis
-                if not title:
-                    scope_text = scope if scope else "general"
-                    title = f"{change_type}({scope_text}): {main_purpose or 'update codebase'}"
-                
-                # Extract body and labels
-                in_body = False
-                for line in lines:
-                    line = line.strip()
-                    if line.lower().startswith('labels:'):
-                        # Extract labels
-                        labels_text = line.split(':', 1)[1].strip()
-                        labels = [l.strip() for l in labels_text.split(',') if l.strip()]
-                        break
-                    elif line.startswith('##') or in_body:
-                        in_body = True
-                        body_lines.append(line)
-                
-                # Clean up body
-                body = '\n'.join(body_lines).strip()
-                if not body:
-                    # Construct a basic body from analysis
-                    body = '\n'.join([
-                        "## Overview",
-                        main_purpose or "Updates to the codebase",
-                        "",
-                        "## Changes",
-                        "- " + "\n- ".join(commits.split('\n')[:5]),
-                        "",
-                        "## Testing",
-                        "- Please verify the changes work as expected"
-                    ])
-                    if is_breaking:
-                        body += "\n\n## Notes\n- Breaking Changes: Yes - please review carefully"
-                
-                # If no labels found or invalid, infer from content
-                if not labels:
-                    labels = infer_labels_from_content(title, body)
-                
-                if task:
-                    progress.update(task, completed=True)
-                
-                return {
-                    'title': title,
-                    'body': body,
-                    'labels': labels
-                }
-            except Exception as e:
-                # If parsing fails, create a basic PR from analysis
-                if task:
-                    progress.update(task, visible=False)
-                scope_text = scope if scope else "general"
-                title = f"{change_type}({scope_text}): {main_purpose or 'update codebase'}"
-                
-                # Create body using list join instead of f-string with newlines
-                body_parts = [
-                    "## Overview",
-                    main_purpose or "Updates to the codebase",
-                    "",
-                    "## Changes",
-                    "- " + "\n- ".join(commits.split('\n')[:5]),
-                    "",
-                    "## Testing",
-                    "- Please verify the changes work as expected"
-                ]
-                
-                if is_breaking:
-                    body_parts.extend(["", "## Notes", "- Breaking Changes: Yes - please review carefully"])
-                
-                body = '\n'.join(body_parts)
-                labels = infer_labels_from_content(title, body)
-                
-                return {
-                    'title': title,
-                    'body': body,
-                    'labels': labels
-                }
+            # Describe the branch from per-commit summaries plus a bounded diff excerpt,
+            # so the prompt stays small however long the branch is
+            listed = select_pr_commits(commits)
+            if task:
+                progress.update(task, description=f"Summarizing {len(listed)} commits...")
+            summaries = run_sync(get_commit_summaries(listed))
+            commit_lines = format_pr_commits(listed, summaries, len(commits))
+            changes = get_pr_diff_excerpt(merge_base, branch)
             
-        except Exception as e:
             if task:
-                progress.update(task, visible=False)
+                progress.update(task, description="Writing pull request...")
+            ai = create_provider()
+            response = ai.generate(get_pr_prompt(commit_lines, changes), model, system=PR_SYSTEM_PROMPT,
+                                   temperature=0.3, json_mode=True)
+            content = parse_pr_response(response)
+        except Exception as e:
             raise ValueError(f"Failed to generate PR content: {str(e)}")
+        
+        if task:
+            progress.update(task, completed=True)
+        return content
             
     except Exception as e:
         if task:
@@ -593,6 +544,8 @@ def create_pr(base: str = None, show_details: bool = False, auto_push: bool = Tr
     console.print(Panel(
         "\n".join([
             f"[bold cyan]Title:[/bold cyan] {content['title']}",
+            f"[bold cyan]Type:[/bold cyan] {content['change_type']}" + (f" ({content['scope']})" if content['scope'] else "")
+            + (" [bold red]BREAKING[/bold red]" if content['breaking'] else ""),
             "",
             f"[bold cyan]Body:[/bold cyan]",
             content['body'],
@@ -696,7 +649,16 @@ def list_prs(show_details: bool = False) -> None:
             if show_details:
                 table.add_column("AI Insights", style="blue", min_width=40)
             
-            for pr in prs[:10]:  # Limit to 10 PRs
+            prs = prs[:10]  # Limit to 10 PRs
+            insights = []
+            if show_details:
+                # Generate AI insights for all PRs concurrently
+                task_insight = progress.add_task(f"Analyzing {len(prs)} pull requests...", total=None)
+                with deadline(settings.get_command_deadline()):
+                    insights = run_sync(generate_prs_insights(prs))
+                progress.update(task_insight, completed=True)
+            
+            for i, pr in enumerate(prs):
                 row = [
                     str(pr['number']),
                     pr['title'][:50] + ('...' if len(pr['title']) > 50 else ''),
@@ -705,15 +667,8 @@ def list_prs(show_details: bool = False) -> None:
                 ]
                 
                 if show_details:
-                    # Generate AI insights for the PR
-                    task_insight = progress.add_task(f"Analyzing PR #{pr['number']}...", total=None)
-                    try:
-                        insights = generate_pr_insights(pr)
-                        progress.update(task_insight, completed=True)
-                        row.append(insights)
-                    except Exception:
-                        progress.update(task_insight, visible=False)
-                        row.append("[dim]Unable to generate insights[/dim]")
+                    insight = insights[i]
+                    row.append(insight if isinstance(insight, str) else "[dim]Unable to generate insights[/dim]")
                 
                 table.add_row(*row)
             
@@ -727,11 +682,15 @@ def list_prs(show_details: bool = False) -> None:
                 border_style="red"
             ))
 
-def generate_pr_insights(pr: Dict) -> str:
+def parse_insight(response: str) -> Optional[str]:
+    """Get the one-line insight from a model response, or None if it is empty"""
+    lines = [line.strip() for line in response.strip().splitlines() if line.strip()]
+    return lines[0] if lines else None
+
+async def agenerate_pr_insights(pr: Dict, ai=None, models: List[str] = None) -> str:
     """Generate quick AI insights about a PR"""
     try:
-        provider = settings.get_provider()
-        model = settings.get_model()
+        models = models or settings.get_task_models('pr_insights')
         
         # Get basic PR info
         title = pr['title']
@@ -744,19 +703,55 @@ Description: {body[:200]}...
 
 Focus on the main purpose and potential impact. Keep it under 50 characters."""
 
-        if provider == 'openai':
-            api_key = settings.get_openai_api_key()
-            ai = OpenAIProvider(api_key)
-        else:
-            ai = OllamaProvider()
+        if ai is None:
+            ai = create_provider()
         
-        insight = ai.generate_commit_message(prompt, model).strip()
+        insight = await ai.acascade(prompt, models, parse_insight)
+        if not insight:
+            return "No insights available"
         return insight[:50] + ('...' if len(insight) > 50 else '')
     except Exception:
         return "No insights available"
 
-def generate_code_review(diff: str, files_changed: List[str] = None, pr_context: Dict = None) -> Dict[str, str]:
-    """Generate AI-powered code review"""
+async def generate_prs_insights(prs: List[Dict]) -> List[str]:
+    """Generate insights for several PRs concurrently with one shared provider"""
+    ai = create_provider()
+    models = settings.get_task_models('pr_insights')
+    
+    return await gather_limited(
+        [agenerate_pr_insights(pr, ai, models) for pr in prs],
+        limit=settings.get_llm_max_concurrency()
+    )
+
+def generate_pr_insights(pr: Dict) -> str:
+    """Generate quick AI insights about a PR"""
+    return run_sync(agenerate_pr_insights(pr))
+
+def assess_review(review: str) -> str:
+    """Determine the review event from the review's sentiment"""
+    review_lower = review.lower()
+    if any(word in review_lower for word in ['looks good', 'solid', 'clean', 'confident', 'nice', 'well done', 'great']):
+        if not any(word in review_lower for word in ['but', 'however', 'though', 'issue', 'problem', 'concern']):
+            return "APPROVE"
+    elif any(word in review_lower for word in ['issue', 'problem', 'concern', 'fix', 'before merge', 'needs']):
+        return "REQUEST_CHANGES"
+    return "COMMENT"
+
+def summarize_review(review: str, assessment: str, comments: List[Dict], earlier_points: List[str] = None) -> Dict:
+    """Get a bounded summary of a review to build the next incremental review on"""
+    if len(review) > REVIEW_SUMMARY_CHARS:
+        review = review[:REVIEW_SUMMARY_CHARS].rsplit('\n', 1)[0] + "\n..."
+    points = [f"{comment['path']}:{comment['line']}: {comment['body'][:200]}" for comment in comments or []]
+    # Newest points first, so the oldest ones are dropped once there are too many
+    points = list(dict.fromkeys(points + (earlier_points or [])))[:REVIEW_SUMMARY_POINTS]
+    text = f"Assessment: {assessment}\n{review}"
+    if points:
+        text += "\n\nOpen points:\n" + "\n".join(f"- {point}" for point in points)
+    return {'text': text, 'points': points}
+
+def generate_code_review(diff: str, files_changed: List[str] = None, pr_context: Dict = None,
+                         on_token=None) -> Dict:
+    """Generate AI-powered code review, reviewing the diff file by file in parallel"""
     provider = settings.get_provider()
     model = settings.get_model()
     
@@ -767,59 +762,30 @@ def generate_code_review(diff: str, files_changed: List[str] = None, pr_context:
         context += f"PR Description: {pr_context.get('body', '')[:300]}...\n\n"
     
     if files_changed:
-        context += f"Files Changed: {', '.join(files_changed[:10])}\n\n"
-    
-    # Truncate diff if too large (using the existing logic from ai_providers)
-    from .ai_providers import AIProvider
-    estimated_tokens = AIProvider.estimate_tokens(diff)
-    
-    if estimated_tokens > 60000:  # Leave room for prompt and response
-        console.print(f"[yellow]Large diff detected ({estimated_tokens:,} estimated tokens). Using intelligent analysis...[/yellow]")
-        if estimated_tokens > 150000:
-            diff_summary = AIProvider.get_diff_summary(diff)
-            diff = f"SUMMARY OF CHANGES:\n{diff_summary}\n\nFIRST 100 LINES OF DIFF:\n" + '\n'.join(diff.split('\n')[:100])
-        else:
-            diff = AIProvider.truncate_diff_intelligently(diff, max_tokens=60000)
-    
-    prompt = f"""You are reviewing a teammate's pull request. Give me your honest thoughts in exactly one conversational sentence.
-
-CRITICAL: Do NOT repeat the commit message or PR title. Do NOT use any formatting. Write like you're casually talking to a colleague.
+        more = f" (and {len(files_changed) - 50} more)" if len(files_changed) > 50 else ""
+        context += f"Files Changed: {', '.join(files_changed[:50])}{more}\n\n"
 
-{context}
+    if pr_context and pr_context.get('previous_review'):
+        context += (
+            "You already reviewed an earlier version of this PR. A summary of your previous review:\n"
+            f"{pr_context['previous_review']}\n\n"
+            "The code changes below are ONLY the new commits pushed since that review. "
+            "Focus on what changed since then and whether earlier concerns were addressed.\n\n"
+        )
 
-CODE CHANGES:
-{diff}
-
-You are a colleague doing a casual + thorough code review. First, explain thoroughly what was implemented, what was done, that sort of stuff. Then you can proceed to explain the codechanges, Respond with  natural VERY short pargraphs  giving your honest thoughts about the code changes made, Once was made basically catching someone up to date, like what was done and why, Jin just made the connotations of potential logics, but I want you to be very dynamic in the way you write this, think and reason properly and naturally. . DO NOT repeat commit messages or use any formatting. Talk like you're sitting next to a teammate.
-Remember, keep it concise so you can read it with a couple of glances. 
-WRITE IN A CONVERSATIONAL LANGUAGE, LIKE YOU'RE SITTING NEXT TO A TEAMMATE. AND WRITE WITH INSANE CLARITY 
-Your casual review:"""
+    max_workers = settings.get_review_concurrency()
 
     try:
-        if provider == 'openai':
-            api_key = settings.get_openai_api_key()
-            ai = OpenAIProvider(api_key)
-        else:
-            ai = OllamaProvider()
+        ai = create_provider()
         
         # Generate the review
-        review = ai.generate_commit_message(prompt, model)
+        result = run_chunked_review(ai, model, diff, context, max_workers=max_workers, on_token=on_token)
+        review = result['review']
         
         # Check if review was generated
         if not review or not review.strip():
             raise Exception(f"AI provider {provider} returned empty response")
         
-        # For single sentence reviews, determine assessment from sentiment
-        assessment = "COMMENT"  # default for single sentence reviews
-        
-        # Simple sentiment analysis for assessment
-        review_lower = review.lower()
-        if any(word in review_lower for word in ['looks good', 'solid', 'clean', 'confident', 'nice', 'well done', 'great']):
-            if not any(word in review_lower for word in ['but', 'however', 'though', 'issue', 'problem', 'concern']):
-                assessment = "APPROVE"
-        elif any(word in review_lower for word in ['issue', 'problem', 'concern', 'fix', 'before merge', 'needs']):
-            assessment = "REQUEST_CHANGES"
-        
         # Clean up the review (remove any extra formatting)
         clean_review = review.strip()
         if clean_review.startswith('"') and clean_review.endswith('"'):
@@ -827,28 +793,34 @@ Your casual review:"""
         
         return {
             'review': clean_review,
-            'assessment': assessment
+            'assessment': assess_review(clean_review),
+            'comments': result['comments']
         }
         
     except Exception as e:
-        error_msg = str(e)
-        
-        # Try fallback to Ollama if OpenAI fails
-        if provider == 'openai' and ("token" in error_msg.lower() or "limit" in error_msg.lower() or "context" in error_msg.lower()):
-            try:
-                fallback_ai = OllamaProvider()
-                review = fallback_ai.generate_commit_message(prompt, "llama2")
-                if review and review.strip():
-                    return {
-                        'review': review,
-                        'assessment': "COMMENT"
-                    }
-                else:
-                    raise Exception("Ollama also returned empty response")
-            except Exception as fallback_error:
-                raise Exception(f"Both AI providers failed. OpenAI: {error_msg}, Ollama: {str(fallback_error)}")
-        
-        raise Exception(f"Review generation failed with {provider}: {error_msg}")
+        # Provider fallback already happened in the router
+        raise Exception(f"Review generation failed with {provider}: {str(e)}")
+
+def stream_code_review(progress: Progress, *args) -> Dict:
+    """Generate a code review while streaming it into a live panel"""
+    # Only one live display can run at a time, so pause the spinners meanwhile
+    progress.stop()
+    try:
+        with LivePanel("AI Code Review", border_style="cyan", transient=True) as panel:
+            return generate_code_review(*args, on_token=panel)
+    finally:
+        progress.start()
+
+def show_review_comments(comments: List[Dict]) -> None:
+    """Display inline review comments"""
+    if not comments:
+        return
+    table = Table(title="Inline Comments", show_header=True, header_style="bold cyan")
+    table.add_column("Location", style="yellow")
+    table.add_column("Comment", style="white")
+    for comment in comments:
+        table.add_row(f"{comment['path']}:{comment['line']}", comment['body'])
+    console.print(table)
 
 def review_current_branch(auto_comment: bool = False) -> None:
     """Review changes in the current branch"""
@@ -872,7 +844,7 @@ def review_current_branch(auto_comment: bool = False) -> None:
             current_branch = get_current_branch()
             
             # Find base branch
-            base_branch = 'main' if run_git_command(['rev-parse', '--verify', 'main'], check=False).returncode == 0 else 'master'
+            base_branch = get_base_branch()
             
             # Get changes between base and current branch
             try:
@@ -903,7 +875,7 @@ def review_current_branch(auto_comment: bool = False) -> None:
             
             # Generate review
             task_review = progress.add_task("Generating AI code review...", total=None)
-            review_result = generate_code_review(diff, files_changed)
+            review_result = stream_code_review(progress, diff, files_changed)
             progress.update(task_review, completed=True)
             
             # Display review
@@ -913,6 +885,7 @@ def review_current_branch(auto_comment: bool = False) -> None:
                 border_style="cyan",
                 padding=(1, 2)
             ))
+            show_review_comments(review_result.get('comments'))
             
             if current_pr and not auto_comment:
                 console.print(f"\n[blue]💡 This branch has PR #{current_pr['number']}. To post this review:[/blue]")
@@ -927,87 +900,193 @@ def review_current_branch(auto_comment: bool = False) -> None:
                 border_style="red"
             ))
 
-def review_pr(pr_number: int, auto_comment: bool = False) -> None:
-    """Review a specific PR"""
+def get_incremental_changes(github_api: GitHubAPI, previous_sha: str, head_sha: str) -> Optional[Dict]:
+    """Get the changes pushed since a previously reviewed commit, if they can be reviewed on their own"""
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            comparison_future = executor.submit(github_api.get_compare, previous_sha, head_sha)
+            diff_future = executor.submit(github_api.get_compare_diff, previous_sha, head_sha)
+            comparison = comparison_future.result()
+            # A force push or rebase means the old review no longer describes a prefix of the PR
+            if comparison.get('status') != 'ahead':
+                return None
+            return {
+                'diff': diff_future.result(),
+                'files': [f['filename'] for f in comparison.get('files', [])]
+            }
+    except Exception:
+        return None
+
+def review_pr(pr_number: int, auto_comment: bool = False, full: bool = False) -> None:
+    """Review a specific PR, only reviewing commits pushed since the last review"""
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         console=console
     ) as progress:
+        executor = ThreadPoolExecutor(max_workers=3)
         try:
             github_api = GitHubAPI()
             
-            # Get PR info
+            # Look up earlier reviews of this PR
+            cache_key = make_key(github_api.owner, github_api.repo, pr_number)
+            history = {} if full else review_cache.get(cache_key, {})
+            reviews = history.get('reviews', {})
+            previous_sha = history.get('last_sha')
+            
+            # Fetch PR info, diff and files concurrently; the diff is only needed up front
+            # when there is no earlier review to build on
             task = progress.add_task(f"Getting PR #{pr_number} details...", total=None)
-            pr = github_api.get_pr_by_number(pr_number)
+            pr_future = executor.submit(github_api.get_pr_by_number, pr_number)
+            diff_future = files_future = None
+            if previous_sha not in reviews:
+                diff_future = executor.submit(github_api.get_pr_diff, pr_number)
+                files_future = executor.submit(github_api.get_pr_files, pr_number)
+            pr = pr_future.result()
             progress.update(task, completed=True)
             
-            # Get PR diff and files
-            task_diff = progress.add_task("Getting PR changes...", total=None)
-            diff = github_api.get_pr_diff(pr_number)
-            files = github_api.get_pr_files(pr_number)
-            files_changed = [f['filename'] for f in files]
-            progress.update(task_diff, completed=True)
-            
-            # Generate review
-            task_review = progress.add_task("Generating AI code review...", total=None)
+            head_sha = pr['head']['sha']
             pr_context = {
                 'title': pr['title'],
                 'body': pr.get('body', '') or '',
                 'author': pr['user']['login']
             }
+            update_text = None
             
-            try:
-                review_result = generate_code_review(diff, files_changed, pr_context)
-                progress.update(task_review, completed=True)
+            if head_sha in reviews:
+                review_result = reviews[head_sha]
+                files_changed = review_result.get('files', [])
+                console.print(f"[dim]Reusing review of {head_sha[:7]} (no new commits)[/dim]")
+            else:
+                # Get the PR diff, or only what changed since the last review
+                task_diff = progress.add_task("Getting PR changes...", total=None)
+                changes = None
+                if previous_sha in reviews:
+                    progress.update(task_diff, description=f"Getting changes since {previous_sha[:7]}...")
+                    changes = get_incremental_changes(github_api, previous_sha, head_sha)
                 
-                # Debug: Check if review is complete
-                if not review_result or not review_result.get('review'):
-                    raise Exception("AI generated empty review")
+                if changes:
+                    diff = changes['diff']
+                    files_changed = changes['files']
+                    previous = reviews[previous_sha]
+                    # Only a bounded summary, so the prompt doesn't grow with every push
+                    pr_context['previous_review'] = previous['summary']['text'] if previous.get('summary') else \
+                        summarize_review(previous['review'], previous.get('assessment', 'COMMENT'), [])['text']
+                else:
+                    if diff_future is None:
+                        diff_future = executor.submit(github_api.get_pr_diff, pr_number)
+                        files_future = executor.submit(github_api.get_pr_files, pr_number)
+                    # Start reviewing as soon as the diff arrives; the file list can follow
+                    diff = diff_future.result()
+                    files_changed = [f['path'] for f in split_diff_by_file(diff)]
+                progress.update(task_diff, completed=True)
                 
-                review_text = review_result['review']
+                # Generate review
+                task_review = progress.add_task("Generating AI code review...", total=None)
                 
-                # Display review
-                console.print(Panel(
-                    f"**PR #{pr_number}: {pr['title']}**\n"
-                    f"Author: {pr['user']['login']}\n"
-                    f"Branch: `{pr['head']['ref']}` → `{pr['base']['ref']}`\n\n"
-                    f"{review_text}",
-                    title="[cyan]AI Code Review[/cyan]",
-                    border_style="cyan",
-                    padding=(1, 2)
-                ))
+                try:
+                    review_result = stream_code_review(progress, diff, files_changed, pr_context)
+                    progress.update(task_review, completed=True)
+                    
+                    # Debug: Check if review is complete
+                    if not review_result or not review_result.get('review'):
+                        raise Exception("AI generated empty review")
+                    
+                    if files_future and not changes:
+                        try:
+                            files_changed = [f['filename'] for f in files_future.result()]
+                        except Exception:
+                            pass  # Keep the file list parsed from the diff
+                    
+                except Exception as review_error:
+                    progress.update(task_review, visible=False)
+                    
+                    # Fallback: show basic PR info and a simple analysis
+                    console.print(Panel(
+                        f"**PR #{pr_number}: {pr['title']}**\n"
+                        f"Author: {pr['user']['login']}\n"
+                        f"Branch: `{pr['head']['ref']}` → `{pr['base']['ref']}`\n\n"
+                        f"## Simple Analysis\n"
+                        f"This PR modifies {len(files_changed)} files:\n"
+                        f"• {', '.join(files_changed[:5])}\n"
+                        f"{'• ...' if len(files_changed) > 5 else ''}\n\n"
+                        f"AI review generation failed. Try again or check your AI provider configuration.",
+                        title="[yellow]Basic PR Info[/yellow]",
+                        border_style="yellow",
+                        padding=(1, 2)
+                    ))
+                    return
                 
-            except Exception as review_error:
-                progress.update(task_review, visible=False)
+                earlier_points = None
+                if 'previous_review' in pr_context:
+                    earlier_points = reviews[previous_sha].get('summary', {}).get('points')
+                summary = summarize_review(review_result['review'], review_result['assessment'],
+                                           review_result.get('comments'), earlier_points)
                 
-                # Fallback: show basic PR info and a simple analysis
-                console.print(Panel(
-                    f"**PR #{pr_number}: {pr['title']}**\n"
-                    f"Author: {pr['user']['login']}\n"
-                    f"Branch: `{pr['head']['ref']}` → `{pr['base']['ref']}`\n\n"
-                    f"## Simple Analysis\n"
-                    f"This PR modifies {len(files_changed)} files:\n"
-                    f"• {', '.join(files_changed[:5])}\n"
-                    f"{'• ...' if len(files_changed) > 5 else ''}\n\n"
-                    f"AI review generation failed. Try again or check your AI provider configuration.",
-                    title="[yellow]Basic PR Info[/yellow]",
-                    border_style="yellow",
-                    padding=(1, 2)
-                ))
-                return
+                # Merge the update into the earlier review for display
+                if 'previous_review' in pr_context:
+                    update_text = review_result['review']
+                    previous = reviews[previous_sha]
+                    files_changed = list(dict.fromkeys(previous.get('files', []) + files_changed))
+                    review_result = {
+                        'review': f"{previous['review']}\n\nUpdate since {previous_sha[:7]}:\n{update_text}",
+                        'assessment': review_result['assessment'],
+                        'comments': review_result.get('comments', [])
+                    }
+                
+                review_result = {**review_result, 'files': files_changed, 'summary': summary, 'posted': False}
+                reviews[head_sha] = review_result
+                # Keep only the most recent reviews of this PR
+                for sha in list(reviews)[:-REVIEW_HISTORY_LIMIT]:
+                    del reviews[sha]
+                review_cache.set(cache_key, {'last_sha': head_sha, 'reviews': reviews})
+            
+            review_text = review_result['review']
+            
+            # Display review
+            console.print(Panel(
+                f"**PR #{pr_number}: {pr['title']}**\n"
+                f"Author: {pr['user']['login']}\n"
+                f"Branch: `{pr['head']['ref']}` → `{pr['base']['ref']}`\n\n"
+                f"{review_text}",
+                title="[cyan]AI Code Review[/cyan]",
+                border_style="cyan",
+                padding=(1, 2)
+            ))
+            show_review_comments(review_result.get('comments'))
             
             if auto_comment:
+                if review_result.get('posted'):
+                    console.print(f"\n[blue]This review was already posted to PR #{pr_number}[/blue]")
+                    return
+                
                 # Post review to GitHub
                 task_post = progress.add_task("Posting review to GitHub...", total=None)
                 try:
-                    review_body = f"## 🤖 AI Code Review\n\n{review_result['review']}"
-                    github_api.post_pr_review(
-                        pr_number, 
-                        review_body, 
-                        event=review_result['assessment']
-                    )
+                    if update_text:
+                        review_body = f"## 🤖 AI Code Review (update since {previous_sha[:7]})\n\n{update_text}"
+                    else:
+                        review_body = f"## 🤖 AI Code Review\n\n{review_text}"
+                    try:
+                        github_api.post_pr_review(
+                            pr_number, 
+                            review_body, 
+                            event=review_result['assessment'],
+                            comments=review_result.get('comments')
+                        )
+                    except Exception:
+                        if not review_result.get('comments'):
+                            raise
+                        # GitHub rejects the whole review if one comment is outside the diff
+                        github_api.post_pr_review(
+                            pr_number, 
+                            review_body, 
+                            event=review_result['assessment']
+                        )
                     progress.update(task_post, completed=True)
+                    review_result['posted'] = True
+                    reviews[head_sha] = review_result
+                    review_cache.set(cache_key, {'last_sha': head_sha, 'reviews': reviews})
                     console.print(f"\n[green]✅ Review posted to PR #{pr_number}![/green]")
                     console.print(f"[blue]View at: {pr['html_url']}[/blue]")
                 except Exception as e:
@@ -1025,6 +1104,8 @@ def review_pr(pr_number: int, auto_comment: bool = False) -> None:
                 title="Error",
                 border_style="red"
             ))
+        finally:
+            executor.shutdown(wait=False)
 
 def review_with_auto_comment() -> None:
     """Review current branch and auto-post if PR exists"""
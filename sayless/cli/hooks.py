@@ -0,0 +1,136 @@
+"""
+Git hook integration for Sayless.
+Hooks written here carry a marker line so they can be recognized, updated
+and removed without touching hooks that other tools installed.
+
+The prepare-commit-msg hook fills in the message for a plain `git commit`
+within the `hook_timeout` budget. It uses a speculatively generated message
+when one is ready and otherwise asks the model; when the budget runs out it
+leaves git's template untouched, so committing never blocks for longer.
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from .config import NO_SETUP_ENV, get_config
+
+settings = get_config()
+
+HOOK_MARKER = "# Installed by sayless"
+COMMIT_MSG_HOOK = 'prepare-commit-msg'
+
+
+def hooks_dir() -> Path:
+    """Get the repository's hooks directory, honoring core.hooksPath"""
+    result = subprocess.run(['git', 'rev-parse', '--git-path', 'hooks'], capture_output=True, text=True, check=True)
+    return Path(result.stdout.strip()).resolve()
+
+
+def module_command(module: str) -> str:
+    """Get the shell command that runs a Sayless module with this installation's Python"""
+    # Hooks also run from GUIs and IDEs, where `sayless` may not be on PATH
+    return f'"{sys.executable}" -m {module}'
+
+
+def is_sayless_hook(path: Path) -> bool:
+    """Check whether a hook file was written by Sayless"""
+    try:
+        return HOOK_MARKER in path.read_text()
+    except OSError:
+        return False
+
+
+def install_hook(name: str, body: str, force: bool = False) -> Path:
+    """Write a hook script, refusing to replace another tool's hook unless forced"""
+    path = hooks_dir() / name
+    if path.exists() and not is_sayless_hook(path) and not force:
+        raise ValueError(f"{path} already exists and was not installed by sayless (use --force to replace it)")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"#!/bin/sh\n{HOOK_MARKER}\n{body.strip()}\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def uninstall_hook(name: str) -> Optional[Path]:
+    """Remove a hook if Sayless installed it"""
+    path = hooks_dir() / name
+    if path.exists() and is_sayless_hook(path):
+        os.unlink(path)
+        return path
+    return None
+
+
+def commit_msg_hook_body() -> str:
+    """Get the prepare-commit-msg hook script"""
+    # Only a plain `git commit` has no message source; -m, -F, -t, merges, squashes and amends keep theirs
+    return f"""[ -n "$2" ] && exit 0
+{module_command('sayless.cli.hooks')} "$1" </dev/null
+exit 0"""
+
+
+def generate_with_deadline(timeout: float) -> Optional[str]:
+    """Get a commit message for the staged changes, or None if it isn't ready within timeout seconds"""
+    from . import speculative
+
+    deadline = time.monotonic() + timeout
+    key = speculative.staged_key()
+    if key is None:
+        return None
+    message = speculative.take(key, wait=timeout)
+    if message or time.monotonic() >= deadline:
+        return message
+
+    diff = subprocess.run(['git', 'diff', '--cached', '--no-color'], capture_output=True, text=True).stdout
+    if not diff.strip():
+        return None
+    if settings.get_provider() == 'openai' and not settings.get_openai_api_key():
+        return None
+
+    result = {}
+
+    def worker():
+        from .router import create_provider
+        try:
+            result['message'] = speculative.generate_message(diff, create_provider(), settings.get_model())
+        except Exception as e:
+            result['error'] = e
+
+    # A daemon thread, so a request that outlives the budget doesn't hold up the commit
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    thread.join(max(0.0, deadline - time.monotonic()))
+    message = result.get('message')
+    if message:
+        speculative.store(key, message)
+    return message
+
+
+def prepare_commit_msg(message_file: str) -> bool:
+    """Fill in the commit message file above git's template; False when nothing was generated in time"""
+    message = generate_with_deadline(settings.get_hook_timeout())
+    if not message:
+        return False
+    path = Path(message_file)
+    template = path.read_text() if path.exists() else ''
+    path.write_text(f"{message}\n{template}")
+    return True
+
+
+if __name__ == "__main__":
+    # Never install, start or pull Ollama from a commit; anything it spawned would outlive os._exit
+    os.environ[NO_SETUP_ENV] = '1'
+    try:
+        filled = prepare_commit_msg(sys.argv[1])
+    except Exception:
+        filled = False
+    if not filled:
+        print("sayless: no commit message generated in time, leaving the template", file=sys.stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # Exit without waiting for a model request that outlived the budget
+    os._exit(0)
@@ -0,0 +1,174 @@
+"""
+Offline embedding backends for commit search.
+`hashing` turns text into signed feature-hashed term frequencies with NumPy:
+no model, no server and no network, fast enough to index thousands of
+commits per second. Document frequencies of the hash buckets are kept next
+to the index and applied to queries only, which ranks stored unit vectors
+like TF-IDF cosine similarity without re-embedding anything as the history
+grows. `onnx` runs a small sentence embedding model on the CPU when
+onnxruntime and tokenizers are installed.
+"""
+
+import re
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from .config import get_config
+
+settings = get_config()
+
+BACKENDS = ('provider', 'hashing', 'onnx')
+HASHING_DIMENSION = 1024
+MAX_TEXT = 200000  # characters of a commit embedded by the hashing backend
+ONNX_MAX_TOKENS = 512
+
+_WORD = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+_CAMEL = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+# Diff bookkeeping that appears in every commit and says nothing about it
+_DIFF_NOISE = re.compile(r'^(diff --git|index [0-9a-f]|--- |\+\+\+ |@@ ).*$', re.MULTILINE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words, also splitting camelCase and snake_case identifiers"""
+    tokens = []
+    for word in _WORD.findall(_DIFF_NOISE.sub('', text[:MAX_TEXT])):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = _CAMEL.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class HashingEmbedder:
+    name = "hashing"
+
+    def __init__(self, dimension: int = HASHING_DIMENSION, df_path: Optional[Path] = None):
+        """Initialize with the vector size and the file keeping bucket document frequencies"""
+        self.dimension = dimension
+        self.df_path = df_path
+        self.df = np.zeros(dimension, dtype=np.float64)
+        self.documents = 0
+        if df_path and df_path.exists():
+            try:
+                stored = np.load(df_path)
+                if stored.shape == (dimension + 1,):
+                    self.df, self.documents = stored[:-1], int(stored[-1])
+            except (OSError, ValueError):
+                pass
+
+    def _features(self, text: str) -> Counter:
+        """Count unigrams and adjacent bigrams"""
+        tokens = tokenize(text)
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Get the unit vector of sublinear term frequencies hashed into dimension buckets"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in features), dtype=np.int64,
+                             count=len(features))
+        weights = 1 + np.log(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+        # A sign bit independent of the bucket keeps collisions from only ever adding up
+        signs = np.where((hashes // self.dimension) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dimension, signs * weights)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def aembed(self, text: str, model: str = None) -> np.ndarray:
+        return self.embed(text)
+
+    def observe(self, vector: np.ndarray) -> None:
+        """Count an indexed document's buckets for the document frequencies"""
+        self.df += vector != 0
+        self.documents += 1
+
+    def weight_query(self, vector: np.ndarray) -> np.ndarray:
+        """Weight a query by squared IDF, so its dot product with stored vectors approximates TF-IDF similarity"""
+        idf = np.log((1 + self.documents) / (1 + self.df)) + 1
+        weighted = (vector * idf * idf).astype(np.float32)
+        norm = np.linalg.norm(weighted)
+        return weighted / norm if norm else weighted
+
+    def save(self) -> None:
+        """Write the document frequencies"""
+        if self.df_path:
+            np.save(self.df_path, np.append(self.df, self.documents))
+
+
+class OnnxEmbedder:
+    name = "onnx"
+
+    def __init__(self, model_dir: str):
+        """Initialize with a directory holding model.onnx and tokenizer.json"""
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError("The onnx embedding backend needs: pip install onnxruntime tokenizers")
+        path = Path(model_dir).expanduser()
+        self.tokenizer = Tokenizer.from_file(str(path / 'tokenizer.json'))
+        self.tokenizer.enable_truncation(ONNX_MAX_TOKENS)
+        self.session = onnxruntime.InferenceSession(str(path / 'model.onnx'), providers=['CPUExecutionProvider'])
+        self.inputs = {item.name for item in self.session.get_inputs()}
+        self.dimension = None  # known after the first embedding
+
+    def embed(self, text: str) -> np.ndarray:
+        """Get the mean-pooled, normalized sentence embedding of a text"""
+        encoding = self.tokenizer.encode(text)
+        feed = {
+            'input_ids': np.array([encoding.ids], dtype=np.int64),
+            'attention_mask': np.array([encoding.attention_mask], dtype=np.int64),
+            'token_type_ids': np.array([encoding.type_ids], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in feed.items() if name in self.inputs})[0][0]
+        mask = feed['attention_mask'][0][:, None].astype(np.float32)
+        vector = (hidden * mask).sum(axis=0) / max(float(mask.sum()), 1.0)
+        norm = np.linalg.norm(vector)
+        self.dimension = vector.shape[0]
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    async def aembed(self, text: str, model: str = None) -> np.ndarray:
+        import asyncio
+        # onnxruntime releases the GIL, so commits are embedded in parallel
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed, text)
+
+
+# Embedding models the providers use when none is given
+PROVIDER_EMBEDDING_MODELS = {'openai': 'text-embedding-3-large', 'ollama': 'llama2'}
+
+
+def embedding_identity() -> Dict:
+    """Get what the configured backend produces vectors with: backend, provider, model and dimension"""
+    backend = settings.get_embedding_backend()
+    provider = None
+    if backend == 'hashing':
+        model = 'hashing'
+    elif backend == 'onnx':
+        model = settings.get_onnx_model()
+    else:
+        provider = settings.get_provider()
+        model = PROVIDER_EMBEDDING_MODELS.get(provider) or settings.get_embedding_model() or settings.get_model()
+    identity = {'backend': backend, 'provider': provider, 'model': model, 'dimension': settings.get_embedding_dimension()}
+    granularity = settings.get_embedding_granularity()
+    if granularity != 'commit':
+        # Left out for whole commits, so indexes from before granularities keep their version
+        identity['granularity'] = granularity
+    return identity
+
+
+def create_embedder(identity: Dict, provider, cache_dir: Path):
+    """Create the embedding backend of an identity; 'provider' embeds with the model provider itself"""
+    if identity['backend'] == 'hashing':
+        return HashingEmbedder(identity['dimension'] or HASHING_DIMENSION, df_path=cache_dir / 'hashing_df.npy')
+    if identity['backend'] == 'onnx':
+        if not identity['model']:
+            raise RuntimeError("Set onnx_model to a directory with model.onnx and tokenizer.json")
+        return OnnxEmbedder(identity['model'])
+    return provider
@@ -6,6 +6,7 @@ import os
 import requests
 import time
 from rich.console import Console
+from .config import NO_SETUP_ENV
 
 console = Console()
 
@@ -62,10 +63,10 @@ class OllamaSetup:
             console.print(f"[red]Error installing Ollama: {str(e)}[/red]")
             return False
 
-    def is_ollama_running(self):
+    def is_ollama_running(self, timeout=None):
         """Check if Ollama service is running"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
+            response = requests.get(f"{self.ollama_url}/api/tags", timeout=timeout)
             return response.status_code == 200
         except requests.exceptions.RequestException:
             return False
@@ -118,6 +119,12 @@ def ensure_ollama_ready(model_name="llama2"):
     """Main function to ensure Ollama is installed, running and model is ready"""
     setup = OllamaSetup()
 
+    if os.environ.get(NO_SETUP_ENV):
+        # Nobody is watching: a silent install or multi-GB pull is worse than no result
+        if not setup.is_ollama_running(timeout=2):
+            sys.exit(1)
+        return True
+
     # Check if Ollama is installed
     if not setup.is_ollama_installed():
         console.print("[yellow]Ollama is not installed. Installing now...[/yellow]")
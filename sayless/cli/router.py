@@ -0,0 +1,391 @@
+"""
+Provider fallback routing with circuit breakers.
+Requests go to the configured provider first and fall back to local Ollama.
+A provider that keeps failing is skipped for a short cooldown, and that
+state is kept on disk so the next sayless invocation skips it too.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from rich.console import Console
+from .ai_providers import AIProvider, OllamaProvider, OpenAIProvider
+from .config import get_config
+
+console = Console()
+settings = get_config()
+
+FALLBACK_MODEL = "llama2"
+FAILURE_THRESHOLD = 2  # consecutive failures before a provider is skipped
+FAILURE_WINDOW = 600  # seconds after which old failures are forgotten
+LATENCY_SAMPLES = 50  # recent latencies kept per provider for hedging
+MIN_HEDGE_SAMPLES = 10
+PRIMARY_ATTEMPTS = 2  # fail over quickly instead of retrying a dying provider
+
+
+class CircuitBreakers:
+    def __init__(self, path: Path = None):
+        """Initialize breaker state stored in ~/.sayless/cache/circuit_breakers.json"""
+        self.path = path or Path.home() / '.sayless' / 'cache' / 'circuit_breakers.json'
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict:
+        """Load the shared state on first use"""
+        if self._state is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save(self) -> None:
+        """Write the state atomically; breakers are best effort, so errors are ignored"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def _entry(self, key: str) -> Dict:
+        """Get the state of one provider"""
+        entry = self._load().setdefault(key, {'failures': 0, 'open_until': 0, 'last_failure': 0, 'latencies': []})
+        if entry['failures'] and time.time() - entry['last_failure'] > FAILURE_WINDOW:
+            entry['failures'] = 0
+        return entry
+
+    def is_open(self, key: str) -> bool:
+        """Check whether a provider should be skipped right now"""
+        with self._lock:
+            return self._entry(key)['open_until'] > time.time()
+
+    def record_success(self, key: str, latency: float = None) -> None:
+        """Close the breaker and remember the request latency"""
+        with self._lock:
+            entry = self._entry(key)
+            changed = entry['failures'] or entry['open_until']
+            entry['failures'] = 0
+            entry['open_until'] = 0
+            if latency is not None:
+                entry['latencies'] = (entry['latencies'] + [round(latency, 3)])[-LATENCY_SAMPLES:]
+                changed = True
+            if changed:
+                self._save()
+
+    def record_failure(self, key: str) -> None:
+        """Count a failure and open the breaker once the threshold is reached"""
+        with self._lock:
+            entry = self._entry(key)
+            entry['failures'] += 1
+            entry['last_failure'] = time.time()
+            # Half-open after the cooldown: one more failure opens it again
+            if entry['failures'] >= FAILURE_THRESHOLD:
+                entry['open_until'] = time.time() + settings.get_circuit_cooldown()
+            self._save()
+
+    def latency_percentile(self, key: str, percentile: float) -> Optional[float]:
+        """Get a latency percentile for a provider, or None without enough samples"""
+        with self._lock:
+            samples = sorted(self._entry(key)['latencies'])
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+
+breakers = CircuitBreakers()
+
+
+class FallbackRouter(AIProvider):
+    """Sends requests to the first available route, skipping providers whose breaker is open"""
+    name = "AI providers"
+
+    def __init__(self, routes: List[Tuple[AIProvider, Optional[str]]], hedge_percentile: float = 0):
+        """Initialize with (provider, model) routes; a None model means the caller's model"""
+        self.routes = routes
+        self.hedge_percentile = hedge_percentile
+        if len(routes) > 1:
+            routes[0][0].max_attempts = PRIMARY_ATTEMPTS
+
+    @property
+    def primary(self) -> AIProvider:
+        return self.routes[0][0]
+
+    def _endpoint(self) -> str:
+        return self.primary._endpoint()
+
+    def _available(self, model: str) -> List[Tuple[AIProvider, str, str]]:
+        """Get the routes to try, in order, with their models and breaker keys"""
+        routes = [(provider, route_model or model, provider._endpoint()) for provider, route_model in self.routes]
+        available = [route for route in routes if not breakers.is_open(route[2])]
+        # If every provider looks down, try them all anyway
+        return available or routes
+
+    def _announce(self, provider: AIProvider, error: Exception, next_provider: AIProvider) -> None:
+        """Tell the user about a fallback"""
+        console.print(f"[yellow]{provider.name} failed, trying {next_provider.name} fallback...[/yellow]")
+
+    async def _agenerate(self, prompt: str, model: str, **options) -> str:
+        return await self.agenerate(prompt, model, **options)
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        return await self.aembed(text, model)
+
+    async def agenerate(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                        cache: bool = True, json_mode: bool = False) -> str:
+        from .concurrency import is_outage
+
+        options = {'system': system, 'max_tokens': max_tokens, 'temperature': temperature, 'cache': cache,
+                   'json_mode': json_mode}
+        routes = self._available(model)
+        if self.hedge_percentile and len(routes) > 1:
+            return await self._hedged(routes, prompt, options)
+
+        for i, (provider, route_model, key) in enumerate(routes):
+            start = time.monotonic()
+            try:
+                result = await provider.agenerate(prompt, route_model, **options)
+            except Exception as e:
+                # A rejected request would be rejected by the fallback too, and says nothing about the provider
+                if not is_outage(e):
+                    raise
+                breakers.record_failure(key)
+                if i == len(routes) - 1:
+                    raise
+                self._announce(provider, e, routes[i + 1][0])
+                continue
+            # Latencies are only kept when hedging needs them
+            breakers.record_success(key, time.monotonic() - start if self.hedge_percentile else None)
+            return result
+
+    async def _hedged(self, routes, prompt: str, options: Dict) -> str:
+        """Send to the primary, and also to the fallback if the primary is slower than usual"""
+        import asyncio
+        from .concurrency import is_outage
+
+        (primary, primary_model, primary_key), (backup, backup_model, backup_key) = routes[0], routes[1]
+        threshold = breakers.latency_percentile(primary_key, self.hedge_percentile)
+        start = time.monotonic()
+        first = asyncio.ensure_future(primary.agenerate(prompt, primary_model, **options))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=threshold)
+            if first in done and not first.exception():
+                breakers.record_success(primary_key, time.monotonic() - start)
+                return first.result()
+            if first in done:
+                if not is_outage(first.exception()):
+                    raise first.exception()
+                breakers.record_failure(primary_key)
+                self._announce(primary, first.exception(), backup)
+                try:
+                    result = await backup.agenerate(prompt, backup_model, **options)
+                except Exception as e:
+                    if is_outage(e):
+                        breakers.record_failure(backup_key)
+                    raise
+                breakers.record_success(backup_key)
+                return result
+
+            # The primary is past its usual latency: race it against the fallback
+            second = asyncio.ensure_future(backup.agenerate(prompt, backup_model, **options))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is first:
+                            breakers.record_success(primary_key, time.monotonic() - start)
+                        else:
+                            breakers.record_success(backup_key)
+                        return task.result()
+                    if is_outage(error):
+                        breakers.record_failure(primary_key if task is first else backup_key)
+                    elif task is first:
+                        # The request itself was rejected; don't wait for the fallback to answer it
+                        raise error
+            raise second.exception()
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def astream(self, prompt: str, model: str, system: str = None, max_tokens: int = None, temperature: float = 0.7,
+                      cache: bool = True) -> AsyncIterator[str]:
+        from .concurrency import is_outage
+
+        options = {'system': system, 'max_tokens': max_tokens, 'temperature': temperature, 'cache': cache}
+        routes = self._available(model)
+        for i, (provider, route_model, key) in enumerate(routes):
+            started = False
+            try:
+                async for chunk in provider.astream(prompt, route_model, **options):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if not is_outage(e):
+                    raise
+                breakers.record_failure(key)
+                # Once text is on screen, switching models would mix two answers
+                if started or i == len(routes) - 1:
+                    raise
+                self._announce(provider, e, routes[i + 1][0])
+                continue
+            breakers.record_success(key)
+            return
+
+    async def aembed(self, text: str, model: str = None) -> List[float]:
+        # No fallback: vectors from different models can't share an index
+        return await self.primary.aembed(text, model)
+
+
+class LoadBalancer(AIProvider):
+    """Spreads requests over equivalent servers, sending each to the one with the fewest outstanding requests"""
+    name = "OpenAI-compatible servers"
+
+    def __init__(self, providers: List[AIProvider]):
+        """Initialize with providers that serve the same models"""
+        self.providers = providers
+        self.outstanding = [0] * len(providers)
+        self._next = 0
+        self._announced = set()
+        for provider in providers:
+            provider.max_attempts = PRIMARY_ATTEMPTS
+            provider.quiet = True
+
+    def _endpoint(self) -> str:
+        return ','.join(provider._endpoint() for provider in self.providers)
+
+    def _order(self) -> List[int]:
+        """Get the providers to try, least loaded first, skipping those whose breaker is open"""
+        indices = list(range(len(self.providers)))
+        available = [i for i in indices if not breakers.is_open(self.providers[i]._endpoint())] or indices
+        # Rotate the start so idle servers take turns instead of the first always winning
+        self._next = (self._next + 1) % len(self.providers)
+        return sorted(available, key=lambda i: (self.outstanding[i], (i - self._next) % len(self.providers)))
+
+    def _announce(self, provider: AIProvider, next_index: int) -> None:
+        """Tell the user about a failover, once per server"""
+        if provider._endpoint() in self._announced:
+            return
+        self._announced.add(provider._endpoint())
+        console.print(f"[yellow]{provider._endpoint()} failed, trying {self.providers[next_index]._endpoint()}...[/yellow]")
+
+    async def _agenerate(self, prompt: str, model: str, **options) -> str:
+        return await self.agenerate(prompt, model, **options)
+
+    async def _aembed(self, text: str, model: str = None) -> List[float]:
+        return await self.aembed(text, model)
+
+    async def _call(self, method: str, *args, **options):
+        """Call a method on the least loaded provider, moving on to the next one when it fails"""
+        from .concurrency import is_outage
+
+        order = self._order()
+        for n, i in enumerate(order):
+            provider = self.providers[i]
+            self.outstanding[i] += 1
+            try:
+                result = await getattr(provider, method)(*args, **options)
+            except Exception as e:
+                if not is_outage(e):
+                    # Every server would reject the same request
+                    self._report(e)
+                    raise
+                breakers.record_failure(provider._endpoint())
+                if n == len(order) - 1:
+                    self._report(e)
+                    raise
+                self._announce(provider, order[n + 1])
+                continue
+            finally:
+                self.outstanding[i] -= 1
+            breakers.record_success(provider._endpoint())
+            return result
+
+    async def agenerate(self, prompt: str, model: str, **options) -> str:
+        return await self._call('agenerate', prompt, model, **options)
+
+    async def aembed(self, text: str, model: str = None) -> List[float]:
+        return await self._call('aembed', text, model)
+
+    async def astream(self, prompt: str, model: str, **options) -> AsyncIterator[str]:
+        from .concurrency import is_outage
+
+        order = self._order()
+        for n, i in enumerate(order):
+            provider = self.providers[i]
+            started = False
+            self.outstanding[i] += 1
+            try:
+                async for chunk in provider.astream(prompt, model, **options):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if not is_outage(e):
+                    self._report(e)
+                    raise
+                breakers.record_failure(provider._endpoint())
+                if started or n == len(order) - 1:
+                    self._report(e)
+                    raise
+                self._announce(provider, order[n + 1])
+                continue
+            finally:
+                self.outstanding[i] -= 1
+            breakers.record_success(provider._endpoint())
+            return
+
+
+def create_compatible_provider() -> AIProvider:
+    """Create the provider for the configured OpenAI-compatible servers"""
+    from .ai_providers import OpenAICompatibleProvider
+    
+    urls = settings.get_base_urls()
+    if not urls:
+        raise ValueError("No OpenAI-compatible server configured; set one with: sayless switch openai-compatible --url URL")
+    providers = [
+        OpenAICompatibleProvider(url, api_key=settings.get_compatible_api_key(),
+                                 slots=settings.get_endpoint_concurrency(url),
+                                 embedding_model=settings.get_embedding_model())
+        for url in urls
+    ]
+    return providers[0] if len(providers) == 1 else LoadBalancer(providers)
+
+
+def create_embedding_provider(name: str) -> AIProvider:
+    """Create a provider by name without fallbacks, to embed with a model other than the configured one"""
+    if name == 'openai':
+        return OpenAIProvider(settings.get_openai_api_key())
+    if name == 'openai-compatible':
+        return create_compatible_provider()
+    return OllamaProvider()
+
+
+def create_provider() -> AIProvider:
+    """Create the configured provider, served by the daemon when it is running"""
+    from . import daemon
+    
+    if daemon.is_enabled():
+        return daemon.DaemonProvider(create_local_provider)
+    return create_local_provider()
+
+
+def create_local_provider() -> AIProvider:
+    """Create the configured in-process provider, with local Ollama as the fallback for OpenAI"""
+    if settings.get_provider() == 'openai':
+        routes = [(OpenAIProvider(settings.get_openai_api_key()), None), (OllamaProvider(), FALLBACK_MODEL)]
+    elif settings.get_provider() == 'openai-compatible':
+        routes = [(create_compatible_provider(), None)]
+    else:
+        routes = [(OllamaProvider(), None)]
+    return FallbackRouter(routes, hedge_percentile=settings.get_hedge_percentile())
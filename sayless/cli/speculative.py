@@ -0,0 +1,237 @@
+"""
+Speculative commit message generation.
+When the staged tree changes (reported by a post-index-change hook or by
+`sayless speculate watch`), a background job generates the commit message
+right away and caches it by HEAD and the staged tree hash (`git write-tree`).
+`sl g` then shows the ready message instead of waiting for the model. A new
+job for a different tree cancels the running one, since its result would be
+stale anyway.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from .cache import DiskCache, make_key
+from .config import NO_SETUP_ENV, get_config
+
+settings = get_config()
+
+JOBS_DIR = Path.home() / '.sayless' / 'speculative'
+CACHE_TTL = 24 * 60 * 60  # speculative messages older than a day are regenerated
+CACHE_SIZE = 200
+JOB_TIMEOUT = 300  # seconds after which a job is assumed to be dead
+WAIT_TIMEOUT = 30  # seconds `sl g` waits for a job working on the current tree
+POLL_INTERVAL = 0.5  # seconds between checks of .git/index in watch mode
+DEBOUNCE = 1.0  # seconds the index must be unchanged before a job starts
+SPECULATING_ENV = 'SAYLESS_SPECULATING'
+HOOK_NAME = 'post-index-change'
+
+
+def _git(*args: str) -> Optional[str]:
+    """Run a git command and get its output, or None when it fails"""
+    try:
+        # `git write-tree` rewrites the index and fires post-index-change; the hook must not start a job for that
+        result = subprocess.run(['git', *args], capture_output=True, text=True,
+                                env={**os.environ, SPECULATING_ENV: '1'})
+    except OSError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _cache() -> DiskCache:
+    return DiskCache('speculative', ttl=CACHE_TTL, max_entries=CACHE_SIZE)
+
+
+def staged_key() -> Optional[str]:
+    """Get the cache key of the staged tree, or None when nothing can be speculated"""
+    toplevel = _git('rev-parse', '--show-toplevel')
+    # write-tree fails while there are unmerged entries
+    tree = _git('write-tree') if toplevel else None
+    if not tree:
+        return None
+    head = _git('rev-parse', '-q', '--verify', 'HEAD') or ''
+    return make_key(toplevel, head, tree, settings.get_provider(), settings.get_model())
+
+
+def _job_path() -> Optional[Path]:
+    """Get the job file of the current repository"""
+    git_dir = _git('rev-parse', '--absolute-git-dir')
+    if not git_dir:
+        return None
+    return JOBS_DIR / f"{hashlib.sha256(git_dir.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_job() -> Optional[Dict]:
+    """Get the running job of the current repository, if any"""
+    path = _job_path()
+    try:
+        with open(path, 'r') as f:
+            job = json.load(f)
+    except (OSError, TypeError, ValueError):
+        return None
+    if time.time() - job.get('started', 0) > JOB_TIMEOUT or not _is_alive(job['pid']):
+        return None
+    return job
+
+
+def cancel(job: Dict) -> None:
+    """Stop a running job"""
+    try:
+        os.kill(job['pid'], signal.SIGTERM)
+    except OSError:
+        pass
+
+
+def get_message(key: str) -> Optional[str]:
+    """Get the speculated message for a staged tree"""
+    return _cache().get(key)
+
+
+def store(key: str, message: str) -> None:
+    """Cache the message for a staged tree"""
+    _cache().set(key, message)
+
+
+def take(key: str, wait: float = WAIT_TIMEOUT) -> Optional[str]:
+    """Get the message for the staged tree, waiting for a job already generating it and cancelling stale ones"""
+    message = get_message(key)
+    if message:
+        return message
+    job = get_job()
+    if job is None:
+        return None
+    if job['key'] != key:
+        cancel(job)
+        return None
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline and get_job():
+        time.sleep(0.1)
+        message = get_message(key)
+        if message:
+            return message
+    return get_message(key)
+
+
+def generate_message(diff: str, provider, model: str) -> str:
+    """Generate a commit message the same way `sl g` does"""
+    from .file_summaries import should_summarize_files, stream_commit_message
+
+    if should_summarize_files(diff):
+        return ''.join(stream_commit_message(diff, provider, model)).strip()
+    return provider.generate_commit_message(diff, model).strip()
+
+
+def run() -> Optional[str]:
+    """Generate and cache the message for the staged tree unless it is cached or already being generated"""
+    key = staged_key()
+    if key is None:
+        return None
+    message = get_message(key)
+    if message:
+        return message
+    job = get_job()
+    if job is not None:
+        if job['key'] == key:
+            return None
+        cancel(job)
+
+    diff = _git('diff', '--cached', '--no-color')
+    if not diff:
+        return None
+    if settings.get_provider() == 'openai' and not settings.get_openai_api_key():
+        return None
+
+    path = _job_path()
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'pid': os.getpid(), 'key': key, 'started': time.time()}))
+    try:
+        from .router import create_provider
+        message = generate_message(diff, create_provider(), settings.get_model())
+        if message:
+            store(key, message)
+        return message
+    finally:
+        try:
+            # A newer job may have taken over the file
+            if json.loads(path.read_text()).get('pid') == os.getpid():
+                path.unlink()
+        except (OSError, ValueError):
+            pass
+
+
+def spawn() -> None:
+    """Start a job in a detached background process"""
+    subprocess.Popen(
+        [sys.executable, '-m', 'sayless.cli.speculative'],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        env={**os.environ, SPECULATING_ENV: '1', NO_SETUP_ENV: '1'}
+    )
+
+
+def watch(on_change=None) -> None:
+    """Start a job whenever .git/index changes, until interrupted"""
+    index = Path(_git('rev-parse', '--git-path', 'index') or '.git/index').resolve()
+
+    def mtime() -> Optional[float]:
+        try:
+            return index.stat().st_mtime
+        except OSError:
+            return None
+
+    seen = mtime()
+    spawn()
+    while True:
+        time.sleep(POLL_INTERVAL)
+        current = mtime()
+        if current == seen:
+            continue
+        # Wait until staging settles so `git add` of many files starts one job
+        while True:
+            time.sleep(DEBOUNCE)
+            settled = mtime()
+            if settled == current:
+                break
+            current = settled
+        seen = current
+        if on_change:
+            on_change()
+        spawn()
+
+
+def hook_body() -> str:
+    """Get the post-index-change hook script that starts a background job"""
+    from .hooks import module_command
+
+    command = module_command('sayless.cli.speculative')
+    # The job's own `git write-tree` may rewrite the index; don't start another job for that
+    return f"""[ -n "${SPECULATING_ENV}" ] && exit 0
+{SPECULATING_ENV}=1 {command} </dev/null >/dev/null 2>&1 &
+exit 0"""
+
+
+if __name__ == "__main__":
+    os.environ[SPECULATING_ENV] = '1'
+    os.environ[NO_SETUP_ENV] = '1'
+    try:
+        run()
+    except Exception:
+        # Speculation is best effort; `sl g` generates the message itself
+        sys.exit(1)
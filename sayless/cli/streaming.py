@@ -0,0 +1,61 @@
+"""
+Live rendering of streamed model output.
+Tokens are shown in a rich panel as they arrive instead of behind a spinner.
+"""
+
+from typing import Iterable
+from rich.console import Console
+from rich.live import Live
+from rich.panel import Panel
+from rich.text import Text
+
+console = Console()
+
+
+class LivePanel:
+    def __init__(self, title: str, border_style: str = "green", style: str = "", transient: bool = False,
+                 placeholder: str = "Thinking..."):
+        """Initialize a panel that grows as tokens are appended"""
+        self.title = title
+        self.border_style = border_style
+        self.style = style
+        self.placeholder = placeholder
+        self.text = ""
+        self.transient = transient
+        self._live = Live(self._render(), console=console, refresh_per_second=12, transient=transient)
+
+    def _render(self) -> Panel:
+        """Render the current text, or the placeholder before the first token"""
+        # Text (not markup) so brackets in model output are shown as-is
+        if self.text:
+            body = Text(self.text, style=self.style)
+        else:
+            body = Text(self.placeholder, style="dim")
+        return Panel(body, title=self.title, border_style=self.border_style)
+
+    def __call__(self, token: str) -> None:
+        """Append a token and refresh the panel"""
+        self.text += token
+        self._live.update(self._render())
+
+    def __enter__(self):
+        self._live.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._live.update(self._render())
+        self._live.stop()
+        if not console.is_terminal and not self.transient:
+            # Live only ends the line itself on a terminal
+            console.line()
+        return False
+
+
+def stream_to_panel(chunks: Iterable[str], title: str, border_style: str = "green", style: str = "",
+                    transient: bool = False) -> str:
+    """Render streamed chunks in a live panel and return the full text"""
+    with LivePanel(title, border_style=border_style, style=style, transient=transient) as panel:
+        for chunk in chunks:
+            panel(chunk)
+    return panel.text.strip()
+
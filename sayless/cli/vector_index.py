@@ -0,0 +1,127 @@
+"""
+Compact FAISS indexes for commit embeddings.
+Vectors can be stored as float32, float16, int8 (scalar quantization) or
+with product quantization, and reduced to fewer dimensions before storage:
+OpenAI text-embedding-3 vectors are truncated and renormalized (what the
+API's `dimensions` parameter does), other vectors use a fixed random
+projection. benchmarks/recall.py measures the recall each option keeps.
+
+Every precision but float32 stores unit vectors. The scalar quantizers rank
+them by inner product: int8 clips the large components of sparse vectors,
+and under L2 a shrunken vector would look closer to every query. search()
+still reports squared L2 distances, so scores mean the same for every
+precision.
+"""
+
+from typing import Optional
+import faiss
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8', 'pq')
+INT8_RANGE = 4.0  # int8 covers +-4 standard deviations of a unit vector's components
+PQ_MIN_TRAIN = 10000  # vectors needed before an index is converted to product quantization
+PQ_DIMS_PER_BYTE = 8  # dimensions encoded by each one-byte sub-quantizer
+PROJECTION_SEED = 1234
+
+
+def create_index(dimension: int, precision: str = 'float32') -> faiss.Index:
+    """Create an empty index storing vectors at the given precision"""
+    if precision == 'float16':
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    if precision in ('int8', 'pq'):
+        # Product quantization needs training data, so vectors are kept as int8 until there are enough
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit_uniform, faiss.METRIC_INNER_PRODUCT)
+        # Unit vectors have components of about 1/sqrt(d); a fixed range avoids training on real data
+        bound = INT8_RANGE / np.sqrt(dimension)
+        index.train(np.array([[-bound] * dimension, [bound] * dimension], dtype=np.float32))
+        return index
+    return faiss.IndexFlatL2(dimension)
+
+
+def index_precision(index: faiss.Index) -> str:
+    """Get the precision an index stores its vectors at"""
+    if isinstance(index, faiss.IndexPQ):
+        return 'pq'
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return 'float16' if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'int8'
+    return 'float32'
+
+
+def matches(index: faiss.Index, precision: str) -> bool:
+    """Check whether an index already stores vectors the configured way"""
+    current = index_precision(index)
+    if current in ('float16', 'int8') and index.metric_type != faiss.METRIC_INNER_PRODUCT:
+        # Quantized indexes from before inner product ranking are re-encoded
+        return False
+    # A pq index starts out as int8
+    return current == precision or (precision == 'pq' and current == 'int8')
+
+
+def convert(index: faiss.Index, precision: str) -> faiss.Index:
+    """Copy the vectors of an index into a new index of another precision, keeping their ids"""
+    converted = create_index(index.d, precision)
+    if index.ntotal:
+        vectors = index.reconstruct_n(0, index.ntotal)
+        if precision != 'float32':
+            vectors = normalize(vectors)
+        converted.add(vectors)
+    return compact(converted, precision)
+
+
+def compact(index: faiss.Index, precision: str) -> faiss.Index:
+    """Switch a pq index from int8 to product quantization once it has enough vectors to train on"""
+    if precision != 'pq' or isinstance(index, faiss.IndexPQ) or index.ntotal < PQ_MIN_TRAIN:
+        return index
+    if index.d % PQ_DIMS_PER_BYTE:
+        return index
+    # int8 may have clipped some components; renormalize so product quantization learns unit vectors
+    vectors = normalize(index.reconstruct_n(0, index.ntotal))
+    pq = faiss.IndexPQ(index.d, index.d // PQ_DIMS_PER_BYTE, 8, faiss.METRIC_L2)
+    pq.train(vectors)
+    pq.add(vectors)
+    return pq
+
+
+def search(index: faiss.Index, queries: np.ndarray, k: int):
+    """Search an index, returning squared L2 distances whatever its metric"""
+    D, I = index.search(queries, k)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        # For unit vectors, |q - x|^2 = 2 - 2 q.x
+        D = np.maximum(2 - 2 * D, 0)
+    return D, I
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors (one per row, or a single vector) to unit length"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+_projections = {}
+
+
+def reduce_dimension(vector: np.ndarray, dimension: int, truncate: bool = False) -> np.ndarray:
+    """Reduce a vector to dimension components and renormalize it"""
+    if vector.shape[0] <= dimension:
+        return vector
+    if truncate:
+        reduced = vector[:dimension]
+    else:
+        key = (vector.shape[0], dimension)
+        if key not in _projections:
+            # Seeded, so every process projects the same way
+            rng = np.random.default_rng(PROJECTION_SEED)
+            _projections[key] = (rng.standard_normal((vector.shape[0], dimension)) / np.sqrt(dimension)).astype(np.float32)
+        reduced = vector @ _projections[key]
+    return normalize(reduced)
+
+
+def bytes_per_vector(index: faiss.Index) -> Optional[int]:
+    """Get how many bytes an index stores per vector"""
+    if isinstance(index, faiss.IndexPQ):
+        return index.pq.code_size
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return index.code_size
+    if isinstance(index, faiss.IndexFlat):
+        return index.d * 4
+    return None